@@ -2,10 +2,22 @@
 
 from aws_cdk import core
 
-from cold_start_benchmark.cold_start_benchmark_stack import ColdStartBenchmarkStack
+from cold_start_benchmark.benchmark_matrix import expand_matrix
+from cold_start_benchmark.cold_start_benchmark_stack import (
+    ColdStartBenchmarkStack,
+    ColdStartTargetsStack,
+    load_configs
+)
 
 
 app = core.App()
-ColdStartBenchmarkStack(app, "cold-start-benchmark")
+configs = load_configs()
+targets = expand_matrix(configs)
+# CloudFormation allows 500 resources per stack
+targets_per_stack = configs['Matrix']['TargetsPerStack']
+ColdStartBenchmarkStack(app, "cold-start-benchmark", targets=targets[:targets_per_stack])
+for i in range(targets_per_stack, len(targets), targets_per_stack):
+    ColdStartTargetsStack(app, "cold-start-benchmark-targets-" + str(i // targets_per_stack),
+        targets=targets[i:i + targets_per_stack])
 
 app.synth()
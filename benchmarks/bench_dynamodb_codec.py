@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# Microbenchmark for cold_start_common/python/dynamodb_codec.py against boto3's
+# TypeSerializer/TypeDeserializer on synthetic RECORD items.
+#
+#   python benchmarks/bench_dynamodb_codec.py --items 20000 --repeat 5
+
+import argparse
+import decimal
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'cold_start_lambdas', 'cold_start_common', 'python'))
+
+from dynamodb_codec import marshal, unmarshal  # noqa: E402
+
+try:
+    from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+except ImportError:
+    TypeDeserializer = TypeSerializer = None
+
+PHASES = ('Initialization', 'Invocation', 'Overhead')
+
+
+def synthetic_item(index, rng):
+    # same shape as the items written by ColdStartCaller.store_data_to_dynamodb
+    start = 1606970000.0 + index + rng.random()
+    records = {
+        'AWS::X-Ray::Trace-id': '1-5fc8a3b0-%024x' % index,
+        'AWS::Lambda::start': start,
+        'AWS::Lambda::end': start + rng.uniform(0.1, 2.0),
+        'AWS::Lambda::Function::start': start + rng.uniform(0.0, 0.1),
+        'AWS::Lambda::Function::end': start + rng.uniform(0.1, 2.0)
+    }
+    for phase in PHASES:
+        records['AWS::Lambda::Function::' + phase + '::start'] = start + rng.uniform(0.0, 1.0)
+        records['AWS::Lambda::Function::' + phase + '::end'] = start + rng.uniform(1.0, 2.0)
+    for extra in range(6):
+        records['AWS::Lambda::Function::Extra%d::start' % extra] = start + rng.random()
+    return {
+        'PK': 'RECORD|AWS|python3.8|128',
+        'SK': start,
+        'Type': 'RECORD',
+        'Records': records,
+        'Configs': {
+            'FunctionArn': 'arn:aws:lambda:us-east-1:123456789012:function:bench-%d' % index,
+            'Runtime': 'python3.8',
+            'CodeSize': 299,
+            'MemorySize': 128
+        },
+        'Invocation': {'ClientLatency': rng.uniform(0.01, 3.0), 'Attempts': 1},
+        'TTL': start + 60 * 86400
+    }
+
+
+def to_decimals(value):
+    # TypeSerializer rejects floats
+    if isinstance(value, dict):
+        return {key: to_decimals(v) for key, v in value.items()}
+    if isinstance(value, float):
+        return decimal.Decimal(repr(value))
+    return value
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--items', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    items = [synthetic_item(i, rng) for i in range(args.items)]
+    marshalled = [marshal(item) for item in items]
+
+    # round trips must be exact before timing anything
+    for item, raw in zip(items[:1000], marshalled[:1000]):
+        assert unmarshal(raw) == item
+
+    cases = [
+        ('marshal', lambda: [marshal(item) for item in items]),
+        ('unmarshal', lambda: [unmarshal(raw) for raw in marshalled]),
+        ('unmarshal Decimal', lambda: [unmarshal(raw, number=decimal.Decimal) for raw in marshalled]),
+    ]
+    if TypeSerializer is not None:
+        serializer = TypeSerializer()
+        deserializer = TypeDeserializer()
+        decimal_items = [to_decimals(item) for item in items]
+        for item, raw in zip(decimal_items[:1000], marshalled[:1000]):
+            assert {key: deserializer.deserialize(value) for key, value in raw.items()} == item
+        cases += [
+            ('boto3 serialize', lambda: [{key: serializer.serialize(value) for key, value in item.items()} for item in decimal_items]),
+            ('boto3 deserialize', lambda: [{key: deserializer.deserialize(value) for key, value in raw.items()} for raw in marshalled]),
+        ]
+    else:
+        print('boto3 is not installed, skipping TypeSerializer/TypeDeserializer')
+
+    print('%d items, %d keys in Records, best of %d runs' % (args.items, len(items[0]['Records']), args.repeat))
+    for name, fn in cases:
+        best = min(timeit.repeat(fn, number=1, repeat=args.repeat))
+        print('%-20s %8.1f ms %8.2f us/item' % (name, best * 1000, best / args.items * 1e6))
+
+
+if __name__ == '__main__':
+    main()
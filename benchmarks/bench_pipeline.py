@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# End-to-end benchmark of ColdStartCaller -> ColdStartSummarizer against the in-process
+# stand-ins in local_aws.py, at growing benchmark matrix sizes. Reports the wall time of
+# every pipeline phase, API calls per operation and peak traced memory.
+#
+#   python benchmarks/bench_pipeline.py --functions 24,240,2400 --cold-ratio 0.1
+#
+# With --shard-size the caller runs through the sharded state machine. Invocations then
+# need --latency-scale to take wall time, otherwise there is nothing for shards to overlap:
+#
+#   python benchmarks/bench_pipeline.py --functions 2400 --latency-scale 0.05 --shard-size 2400,600,240
+#
+# With --emulator-functions the caller also benchmarks that many functions of a local
+# tools/function_emulator.py, concurrently with the Lambda stand-ins.
+
+import argparse
+import collections
+import contextlib
+import functools
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+LAMBDAS = os.path.join(BENCHMARKS, '..', 'cold_start_lambdas')
+sys.path.insert(0, os.path.join(LAMBDAS, 'cold_start_summarizer'))
+sys.path.insert(0, os.path.join(LAMBDAS, 'cold_start_caller'))
+sys.path.insert(0, os.path.join(LAMBDAS, 'cold_start_common', 'python'))
+sys.path.insert(0, os.path.join(BENCHMARKS, '..', 'tools'))
+
+TABLE_NAME = 'cold_start_benchmark_table'
+BUCKET_NAME = 'cold-start-benchmark-backup'
+MATRIX_NAME = 'cold-start-benchmark'
+
+# the handlers read their settings at import time
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ['TABLE_NAME'] = TABLE_NAME
+os.environ['BACKUP_BUCKET_NAME'] = BUCKET_NAME
+os.environ['BENCHMARK_MATRIX'] = MATRIX_NAME
+os.environ.setdefault('XRAY_INITIAL_DELAY_SECONDS', '0')
+os.environ.setdefault('XRAY_WAIT_SECONDS', '30')
+
+import ColdStartCaller  # noqa: E402
+import ColdStartSummarizer  # noqa: E402
+import providers  # noqa: E402
+from config_cache import ConfigCache  # noqa: E402
+from function_emulator import FunctionEmulator, emulated_functions, start_emulator  # noqa: E402
+from local_aws import LocalCallerStateMachine, LocalDynamoDB, LocalLambda, LocalS3, LocalTagging, LocalXRay, TimingModel  # noqa: E402
+
+RUNTIMES = {
+    'python3.8': 299,
+    'nodejs12.x': 291,
+    'java11': 1803,
+    'go1.x': 2486547,
+    'ruby2.7': 271,
+    'dotnetcore3.1': 138451
+}
+MEMORY_SIZES = (128, 512, 1024, 2048)
+
+# (module or class, function) timed as a phase. sample_functions runs for both providers, the other
+# provider steps are Lambda's only
+CALLER_PHASES = (
+    (ColdStartCaller, 'target_functions'),
+    (providers, 'sample_functions'),
+    (providers, 'collect_traces'),
+    (providers.AwsProvider, 'configs'),
+    (ColdStartCaller, 'store_data_to_dynamodb'),
+    (ColdStartCaller, 'store_data_to_aggregates'),
+    (ColdStartCaller, 'store_data_to_s3')
+)
+
+
+def synthetic_functions(count):
+    # every function gets its own runtime x memory size partition, as in the deployed stack
+    partitions = [(runtime, memory_size) for memory_size in MEMORY_SIZES for runtime in RUNTIMES]
+    memory_size = 10240
+    while len(partitions) < count:
+        partitions.extend((runtime, memory_size) for runtime in RUNTIMES)
+        memory_size -= 1
+    functions = {}
+    for runtime, memory_size in partitions[:count]:
+        functions['bench-%s-%d' % (runtime.replace('.', ''), memory_size)] = {
+            'Runtime': runtime, 'MemorySize': memory_size, 'CodeSize': RUNTIMES[runtime]}
+    return functions
+
+
+class PhaseTimer(object):
+    # replaces module functions with wrappers that add their wall time per phase,
+    # summed over shards when shards run concurrently
+    def __init__(self):
+        self.seconds = collections.Counter()
+        self.patched = []
+        self.lock = threading.Lock()
+
+    def patch(self, module, name):
+        original = getattr(module, name)
+
+        @functools.wraps(original)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                with self.lock:
+                    self.seconds[name] += elapsed
+
+        setattr(module, name, timed)
+        self.patched.append((module, name, original))
+
+    def restore(self):
+        for module, name, original in reversed(self.patched):
+            setattr(module, name, original)
+        self.patched = []
+
+
+def run_pipeline(function_count, caller_runs, timing, cold_ratio, ingestion_delay, seed, latency_scale=0.0,
+                 shard_size=0, shard_concurrency=20, cold_samples=0, warm_samples=1, emulator_functions=0, trace_memory=False):
+    functions = synthetic_functions(function_count)
+    xray = LocalXRay(ingestion_delay=ingestion_delay)
+    lambda_ = LocalLambda(functions, xray, timing=timing, cold_ratio=cold_ratio, seed=seed, latency_scale=latency_scale)
+    tagging = LocalTagging(lambda_, MATRIX_NAME)
+    dynamodb = LocalDynamoDB()
+    s3 = LocalS3()
+
+    ColdStartCaller.lambda_client = lambda_
+    ColdStartCaller.lambda_invoke_client = lambda_
+    ColdStartCaller.xray_client = xray
+    ColdStartCaller.tagging_client = tagging
+    ColdStartCaller.dynamodb_client = dynamodb
+    ColdStartCaller.s3_client = s3
+    # every pipeline lists its own functions
+    ColdStartCaller.config_cache = ConfigCache(ColdStartCaller.CONFIG_MANIFEST_KEY, ColdStartCaller.CONFIG_CACHE_TTL_SECONDS)
+    ColdStartSummarizer.dynamodb_client = dynamodb
+    ColdStartSummarizer.tagging_client = tagging
+    # shard_size 0 runs the caller the unsharded way, straight from the scheduled event
+    state_machine = LocalCallerStateMachine(ColdStartCaller.lambda_handler, shard_concurrency) if shard_size else None
+    defaults = (ColdStartCaller.SHARD_SIZE, ColdStartCaller.COLD_SAMPLES, ColdStartCaller.WARM_SAMPLES)
+    ColdStartCaller.SHARD_SIZE = shard_size or defaults[0]
+    ColdStartCaller.COLD_SAMPLES = cold_samples
+    ColdStartCaller.WARM_SAMPLES = warm_samples
+
+    timer = PhaseTimer()
+    for owner, name in CALLER_PHASES:
+        timer.patch(owner, name)
+    # emulated functions take no wall time, their environments are kept for the whole pipeline
+    server = None
+    if emulator_functions:
+        runtimes = sorted(RUNTIMES)
+        memory_sizes = [128 + 64 * index for index in range(-(-emulator_functions // len(runtimes)))]
+        hosted = dict(sorted(emulated_functions(runtimes, memory_sizes).items())[:emulator_functions])
+        server = start_emulator(FunctionEmulator(hosted, MATRIX_NAME, time_scale=0.0, seed=seed))
+        endpoint_url = 'http://%s:%d' % server.server_address
+        ColdStartCaller.EMULATOR_ENDPOINT_URL = ColdStartSummarizer.EMULATOR_ENDPOINT_URL = endpoint_url
+
+    peaks = {}
+    try:
+        if trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        for _ in range(caller_runs):
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                if state_machine is None:
+                    ColdStartCaller.lambda_handler({}, None)
+                else:
+                    state_machine.start_execution()
+        timer.seconds['caller'] = time.perf_counter() - start
+        if trace_memory:
+            peaks['caller'] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.reset_peak()
+
+        start = time.perf_counter()
+        # the summarizer logs its metrics line
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            ColdStartSummarizer.lambda_handler({}, None)
+        timer.seconds['summarizer'] = time.perf_counter() - start
+        if trace_memory:
+            peaks['summarizer'] = tracemalloc.get_traced_memory()[1]
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+        timer.restore()
+        ColdStartCaller.SHARD_SIZE, ColdStartCaller.COLD_SAMPLES, ColdStartCaller.WARM_SAMPLES = defaults
+        if server is not None:
+            server.shutdown()
+            ColdStartCaller.EMULATOR_ENDPOINT_URL = ColdStartSummarizer.EMULATOR_ENDPOINT_URL = None
+
+    calls = collections.Counter()
+    for service, client in (('lambda', lambda_), ('tagging', tagging), ('xray', xray), ('dynamodb', dynamodb), ('s3', s3)):
+        for operation, count in client.calls.items():
+            calls[service + ':' + operation] = count
+    return timer.seconds, calls, peaks, dynamodb
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--functions', default='24,240,2400', help='comma separated matrix sizes')
+    parser.add_argument('--caller-runs', type=int, default=2, help='caller runs before the summarizer, the first one is all cold')
+    parser.add_argument('--cold-ratio', type=float, default=0.0, help='chance that a later invocation is cold')
+    parser.add_argument('--init-median', type=float, default=0.4, help='median cold start initialization in seconds')
+    parser.add_argument('--init-sigma', type=float, default=0.6)
+    parser.add_argument('--ingestion-delay', type=float, default=0.0, help='seconds before a trace shows up in X-Ray')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--latency-scale', type=float, default=0.0, help='fraction of the synthetic invocation duration that invoke really sleeps')
+    parser.add_argument('--shard-size', default='0', help='comma separated functions per shard, 0 runs the caller unsharded')
+    parser.add_argument('--shard-concurrency', type=int, default=20, help='shards running at once, like the Map state\'s MaxConcurrency')
+    parser.add_argument('--cold-samples', type=int, default=0, help='forced cold samples per function and caller run')
+    parser.add_argument('--warm-samples', type=int, default=1, help='warm samples per function and caller run')
+    parser.add_argument('--emulator-functions', type=int, default=0, help='functions of a local function emulator benchmarked alongside')
+    args = parser.parse_args()
+
+    timing = TimingModel(init=(args.init_median, args.init_sigma))
+    for function_count in [int(size) for size in args.functions.split(',')]:
+        for shard_size in [int(size) for size in args.shard_size.split(',')]:
+            run_benchmark(function_count, shard_size, timing, args)
+
+
+def run_benchmark(function_count, shard_size, timing, args):
+    options = dict(latency_scale=args.latency_scale, shard_size=shard_size, shard_concurrency=args.shard_concurrency,
+                   cold_samples=args.cold_samples, warm_samples=args.warm_samples, emulator_functions=args.emulator_functions)
+    seconds, calls, _, dynamodb = run_pipeline(function_count, args.caller_runs, timing, args.cold_ratio, args.ingestion_delay, args.seed, **options)
+    # tracemalloc slows everything down, so memory is measured in a second, untimed pass.
+    # Peaks include the local stand-ins' own copies of the data.
+    _, _, peaks, _ = run_pipeline(function_count, args.caller_runs, timing, args.cold_ratio, args.ingestion_delay, args.seed, trace_memory=True, **options)
+    shards = -(-function_count // shard_size) if shard_size else 0
+    print('== %d functions, %d caller run(s), %s' % (function_count, args.caller_runs, '%d shard(s)' % shards if shards else 'unsharded'))
+    samples = (function_count + args.emulator_functions) * args.caller_runs * (args.cold_samples + args.warm_samples)
+    print('  %-26s %9.1f invocations/s' % ('caller throughput', samples / seconds['caller']))
+    for phase in ('caller',) + tuple(name for _, name in CALLER_PHASES) + ('summarizer',):
+        print('  %-26s %9.1f ms' % (phase, seconds[phase] * 1000))
+    for phase in ('caller', 'summarizer'):
+        print('  %-26s %9.1f MiB peak' % (phase, peaks[phase] / 1024.0 / 1024.0))
+    for operation in sorted(calls):
+        print('  %-26s %9d calls' % (operation, calls[operation]))
+    print('  %-26s %9.1f RCU' % ('dynamodb:QueryCapacity', dynamodb.consumed_capacity))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# Storage and read cost of a month of caller reports: the legacy one-JSON-object-per-run
+# backup against the compacted Parquet archive of cold_start_common/python/record_archive.py.
+# The query reads one runtime/memory size partition over the whole period.
+#
+#   python benchmarks/bench_record_archive.py --functions 24 --days 30 --samples 2
+
+import argparse
+import datetime
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'cold_start_lambdas', 'cold_start_common', 'python'))
+
+from bench_summary_stats import synthetic_records  # noqa: E402
+from record_archive import DAILY_FILE, partition_prefix, read_archive, report_rows, rows_to_table, table_to_bytes  # noqa: E402
+
+RUNTIMES = ('python3.8', 'nodejs12.x', 'java11', 'go1.x', 'ruby2.7', 'dotnetcore3.1')
+MEMORY_SIZES = (128, 512, 1024, 2048)
+
+
+def synthetic_report(functions, samples, run_index, rng):
+    report = {}
+    for i, (runtime, memory_size) in enumerate(functions):
+        arn = 'arn:aws:lambda:us-east-1:123456789012:function:bench-%s-%d' % (runtime.replace('.', ''), memory_size)
+        for sample in range(samples):
+            index = (run_index * len(functions) + i) * samples + sample
+            report[arn if sample == 0 else arn + '#' + str(sample)] = {
+                'Records': synthetic_records(index, sample == 0, rng),
+                'Configs': {'FunctionArn': arn, 'Runtime': runtime, 'CodeSize': 299, 'MemorySize': memory_size},
+                'Invocation': {'ClientLatency': rng.uniform(0.05, 2.0), 'Attempts': 1, 'Sample': sample, 'ForcedCold': sample == 0}
+            }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--functions', type=int, default=24)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--runs-per-day', type=int, default=24)
+    parser.add_argument('--samples', type=int, default=2, help='samples per function and run')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    # one runtime x memory size partition per function, as in bench_pipeline.py
+    functions = [(runtime, memory_size) for memory_size in MEMORY_SIZES for runtime in RUNTIMES]
+    memory_size = 10240
+    while len(functions) < args.functions:
+        functions.extend((runtime, memory_size) for runtime in RUNTIMES)
+        memory_size -= 1
+    functions = functions[:args.functions]
+    start = datetime.datetime(2020, 12, 1)
+
+    legacy = []
+    daily_rows = {}
+    for run_index in range(args.days * args.runs_per_day):
+        timestamp = start + datetime.timedelta(hours=run_index * 24.0 / args.runs_per_day)
+        report = synthetic_report(functions, args.samples, run_index, rng)
+        legacy.append(json.dumps(report).encode('UTF-8'))
+        for (provider, runtime, memory_size), rows in report_rows(report, timestamp.timestamp()).items():
+            daily_rows.setdefault(partition_prefix(provider, runtime, memory_size, timestamp.date()), []).extend(rows)
+
+    root = tempfile.mkdtemp()
+    try:
+        archive_bytes = 0
+        for prefix, rows in daily_rows.items():
+            data = table_to_bytes(rows_to_table(rows))
+            archive_bytes += len(data)
+            os.makedirs(os.path.join(root, prefix), exist_ok=True)
+            with open(os.path.join(root, prefix, DAILY_FILE), 'wb') as f:
+                f.write(data)
+
+        runtime, memory_size = functions[0]
+        query_start = time.perf_counter()
+        legacy_rows = 0
+        for blob in legacy:
+            for report in json.loads(blob).values():
+                if report['Configs']['Runtime'] == runtime and report['Configs']['MemorySize'] == memory_size:
+                    legacy_rows += 1
+        legacy_seconds = time.perf_counter() - query_start
+
+        query_start = time.perf_counter()
+        table = read_archive(os.path.join(root, 'archive'), filters=[('runtime', '=', runtime), ('memory', '=', memory_size)])
+        archive_seconds = time.perf_counter() - query_start
+        assert table.num_rows == legacy_rows, (table.num_rows, legacy_rows)
+        archive_read = sum(os.path.getsize(os.path.join(root, prefix, DAILY_FILE)) for prefix in daily_rows
+                           if '/runtime=%s/memory=%d/' % (runtime, memory_size) in prefix)
+    finally:
+        shutil.rmtree(root)
+
+    samples = args.functions * args.samples * args.days * args.runs_per_day
+    print('%d samples over %d days, query: %s %d MB (%d rows)' % (samples, args.days, runtime, memory_size, legacy_rows))
+    print('%-8s %9s %12s %12s %12s %10s' % ('', 'objects', 'stored KiB', 'B/sample', 'query GETs', 'query ms'))
+    print('%-8s %9d %12.1f %12.1f %12d %10.1f' % ('json', len(legacy), sum(map(len, legacy)) / 1024.0,
+                                                   sum(map(len, legacy)) / float(samples), len(legacy), legacy_seconds * 1000))
+    print('%-8s %9d %12.1f %12.1f %12d %10.1f' % ('parquet', len(daily_rows), archive_bytes / 1024.0,
+                                                   archive_bytes / float(samples), args.days, archive_seconds * 1000))
+    print('query bytes: json %.1f KiB, parquet %.1f KiB' % (sum(map(len, legacy)) / 1024.0, archive_read / 1024.0))
+
+
+if __name__ == '__main__':
+    main()
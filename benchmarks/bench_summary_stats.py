@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# Microbenchmark for cold_start_summarizer/summary_stats.py against the per-item
+# timedelta loop it replaced, on synthetic cold/warm Records maps.
+#
+#   python benchmarks/bench_summary_stats.py --records 20000 --repeat 5
+
+import argparse
+import datetime
+import math
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'cold_start_lambdas', 'cold_start_summarizer'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'cold_start_lambdas', 'cold_start_common', 'python'))
+
+from record_columns import TIMESTAMP_LABELS  # noqa: E402
+from summary_stats import summarize_records  # noqa: E402
+
+
+def synthetic_records(index, cold, rng):
+    start = 1606970000.0 + index * 1800 + rng.random()
+    queue = rng.uniform(0.005, 0.05)
+    init = rng.uniform(0.1, 1.5) if cold else 0.0
+    invoke = rng.uniform(0.001, 0.02)
+    overhead = rng.uniform(0.0005, 0.005)
+    network = rng.uniform(0.005, 0.05)
+    function_start = start + queue + init
+    records = {
+        'AWS::X-Ray::Trace-id': '1-5fc8a3b0-%024x' % index,
+        'AWS::Lambda::start': start,
+        'AWS::Lambda::Function::start': function_start - init,
+        'AWS::Lambda::Function::Invocation::start': function_start,
+        'AWS::Lambda::Function::Invocation::end': function_start + invoke,
+        'AWS::Lambda::Function::Overhead::start': function_start + invoke,
+        'AWS::Lambda::Function::Overhead::end': function_start + invoke + overhead,
+        'AWS::Lambda::Function::end': function_start + invoke + overhead,
+        'AWS::Lambda::end': function_start + invoke + overhead + 0.001,
+        'Client::Invoke::start': start - network / 2,
+        'Client::Invoke::end': function_start + invoke + overhead + 0.001 + network / 2
+    }
+    if cold:
+        records['AWS::Lambda::Function::Initialization::start'] = start + queue
+        records['AWS::Lambda::Function::Initialization::end'] = start + queue + init
+    return records
+
+
+# the implementation this module replaced, kept here as the baseline
+def legacy_means(records_list):
+    def timestamp_extract(records, key):
+        try:
+            return datetime.datetime.fromtimestamp(float(records[key]))
+        except:  # noqa: E722
+            return datetime.datetime.fromtimestamp(float(records['AWS::Lambda::start']))
+
+    cold_sum, warm_sum = {}, {}
+    cold_count = warm_count = 0
+    # the synthetic records have no SnapStart restores, which it predates
+    labels = [label for label in TIMESTAMP_LABELS if '::Restore::' not in label]
+    warm_labels = [label for label in labels if '::Initialization::' not in label]
+    for records in records_list:
+        start = timestamp_extract(records, 'AWS::Lambda::start')
+        if 'AWS::Lambda::Function::Initialization::start' in records:
+            cold_count += 1
+            for label in labels:
+                cold_sum[label] = cold_sum.get(label, datetime.timedelta(0)) + (timestamp_extract(records, label) - start)
+        else:
+            warm_count += 1
+            for label in warm_labels:
+                warm_sum[label] = warm_sum.get(label, datetime.timedelta(0)) + (timestamp_extract(records, label) - start)
+    return (
+        {label: (cold_sum[label] / cold_count).total_seconds() for label in cold_sum},
+        {label: (warm_sum[label] / warm_count).total_seconds() for label in warm_sum})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--records', type=int, default=20000)
+    parser.add_argument('--cold-ratio', type=float, default=0.5)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    records_list = [synthetic_records(i, rng.random() < args.cold_ratio, rng) for i in range(args.records)]
+
+    # means must agree with the legacy loop (which rounds to microseconds) before timing
+    stats = summarize_records(records_list)
+    for temperature, means in zip(('Cold', 'Warm'), legacy_means(records_list)):
+        for label, mean in means.items():
+            assert math.isclose(stats[temperature][label]['Mean'], mean, abs_tol=2e-6), (temperature, label)
+
+    print('%d records, best of %d runs' % (args.records, args.repeat))
+    baseline = None
+    for name, fn in (('legacy', lambda: legacy_means(records_list)), ('summarize_records', lambda: summarize_records(records_list))):
+        best = min(timeit.repeat(fn, number=1, repeat=args.repeat))
+        if baseline is None:
+            baseline = best
+        print('%-20s %8.1f ms %8.2f us/record %6.2fx' % (name, best * 1000, best / args.records * 1e6, baseline / best))
+
+
+if __name__ == '__main__':
+    main()
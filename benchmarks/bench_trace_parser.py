@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# Microbenchmark for cold_start_caller/trace_parser.py on synthetic X-Ray traces.
+#
+#   python benchmarks/bench_trace_parser.py --traces 20000 --repeat 5
+
+import argparse
+import json
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'cold_start_lambdas', 'cold_start_caller'))
+
+import trace_parser  # noqa: E402
+from trace_parser import parse_trace  # noqa: E402
+
+
+def synthetic_trace(index, cold, rng):
+    trace_id = '1-5fc8a3b0-%024x' % index
+    start = 1606970000.0 + index
+    init = rng.uniform(0.1, 1.5) if cold else 0.0
+    queue = rng.uniform(0.005, 0.05)
+    invoke = rng.uniform(0.001, 0.02)
+    overhead = rng.uniform(0.0005, 0.005)
+    function_start = start + queue + init
+    subsegments = []
+    if cold:
+        subsegments.append({'id': '%016x' % (index * 4 + 1), 'name': 'Initialization', 'start_time': start + queue, 'end_time': start + queue + init, 'aws': {'function_arn': 'arn:aws:lambda:us-east-1:123456789012:function:bench'}})
+    subsegments.append({'id': '%016x' % (index * 4 + 2), 'name': 'Invocation', 'start_time': function_start, 'end_time': function_start + invoke, 'aws': {'function_arn': 'arn:aws:lambda:us-east-1:123456789012:function:bench'}})
+    subsegments.append({'id': '%016x' % (index * 4 + 3), 'name': 'Overhead', 'start_time': function_start + invoke, 'end_time': function_start + invoke + overhead, 'aws': {'function_arn': 'arn:aws:lambda:us-east-1:123456789012:function:bench'}})
+    end = function_start + invoke + overhead
+    lambda_doc = {
+        'id': '%016x' % (index * 4), 'name': 'bench', 'start_time': start, 'end_time': end + 0.001,
+        'trace_id': trace_id, 'http': {'response': {'status': 200}},
+        'aws': {'request_id': '%032x' % index}, 'origin': 'AWS::Lambda',
+        'resource_arn': 'arn:aws:lambda:us-east-1:123456789012:function:bench'
+    }
+    function_doc = {
+        'id': '%016x' % (index * 4 + 4), 'name': 'bench', 'start_time': function_start - (init if cold else 0.0), 'end_time': end,
+        'trace_id': trace_id, 'parent_id': lambda_doc['id'],
+        'aws': {'account_id': '123456789012', 'function_arn': 'arn:aws:lambda:us-east-1:123456789012:function:bench', 'resource_names': ['bench']},
+        'origin': 'AWS::Lambda::Function', 'subsegments': subsegments
+    }
+    segments = [
+        {'Id': lambda_doc['id'], 'Document': json.dumps(lambda_doc, separators=(',', ':'))},
+        {'Id': function_doc['id'], 'Document': json.dumps(function_doc, separators=(',', ':'))}
+    ]
+    rng.shuffle(segments)
+    return trace_id, segments
+
+
+# the implementation this module replaced, kept here as the baseline
+def legacy_parse(trace_id, segments):
+    function_timestamp = {}
+    function_timestamp['AWS::X-Ray::Trace-id'] = trace_id
+    lambda_doc = json.loads([seg for seg in segments if '"AWS::Lambda"' in seg['Document']][0]['Document'])
+    function_timestamp['AWS::Lambda::start'] = lambda_doc["start_time"]
+    function_timestamp['AWS::Lambda::end'] = lambda_doc["end_time"]
+    lambda_function_doc = json.loads([seg for seg in segments if '"AWS::Lambda::Function"' in seg['Document']][0]['Document'])
+    function_timestamp['AWS::Lambda::Function::start'] = lambda_function_doc["start_time"]
+    function_timestamp['AWS::Lambda::Function::end'] = lambda_function_doc["end_time"]
+    if "subsegments" in lambda_function_doc:
+        for subsegment in lambda_function_doc["subsegments"]:
+            function_timestamp['AWS::Lambda::Function::' + subsegment['name'] + '::start'] = subsegment['start_time']
+            function_timestamp['AWS::Lambda::Function::' + subsegment['name'] + '::end'] = subsegment['end_time']
+    return function_timestamp
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--traces', type=int, default=20000)
+    parser.add_argument('--cold-ratio', type=float, default=0.5)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    traces = [synthetic_trace(i, rng.random() < args.cold_ratio, rng) for i in range(args.traces)]
+
+    # both implementations must agree before timing them
+    for trace_id, segments in traces[:1000]:
+        assert parse_trace(trace_id, segments).to_records() == legacy_parse(trace_id, segments)
+
+    def run_legacy():
+        for trace_id, segments in traces:
+            legacy_parse(trace_id, segments)
+
+    def run_parser():
+        for trace_id, segments in traces:
+            parse_trace(trace_id, segments)
+
+    def run_parser_to_records():
+        for trace_id, segments in traces:
+            parse_trace(trace_id, segments).to_records()
+
+    print('%d traces, best of %d runs, decoder %s.%s' % (args.traces, args.repeat, trace_parser.loads.__module__, trace_parser.loads.__name__))
+    baseline = None
+    for name, fn in (('legacy', run_legacy), ('parse_trace', run_parser), ('parse_trace+to_records', run_parser_to_records)):
+        best = min(timeit.repeat(fn, number=1, repeat=args.repeat))
+        if baseline is None:
+            baseline = best
+        print('%-24s %8.1f ms %8.2f us/trace %6.2fx' % (name, best * 1000, best / args.traces * 1e6, baseline / best))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,441 @@
+# In-process stand-ins for the Lambda, tagging, X-Ray, DynamoDB and S3 clients used by the
+# caller and the summarizer, and for the caller state machine, for running the pipeline
+# locally (see bench_pipeline.py).
+#
+# Only the calls and expression forms the pipeline actually makes are implemented.
+# Every client counts its calls per operation in `calls`.
+
+import base64
+import collections
+import concurrent.futures
+import hashlib
+import io
+import json
+import math
+import random
+import re
+import threading
+import time
+
+from botocore.exceptions import ClientError
+
+# DynamoDB returns at most 1 MB of items per Query page
+QUERY_PAGE_BYTES = 1024 * 1024
+
+
+class StubClient(object):
+
+    def __init__(self):
+        self.calls = collections.Counter()
+        self.lock = threading.Lock()
+
+    def count(self, operation):
+        with self.lock:
+            self.calls[operation] += 1
+
+
+class TimingModel(object):
+    # lognormal duration (median, sigma) in seconds of every phase of a synthetic invocation
+    def __init__(self, network=(0.01, 0.5), queue=(0.02, 0.5), init=(0.4, 0.6), invocation=(0.003, 0.8), overhead=(0.001, 0.5), restore=(0.15, 0.4)):
+        # request and response transfer between the caller and the service, split evenly
+        self.network = network
+        self.queue = queue
+        self.init = init
+        # in place of init for SnapStart functions
+        self.restore = restore
+        self.invocation = invocation
+        self.overhead = overhead
+
+    @staticmethod
+    def sample(rng, median_sigma):
+        median, sigma = median_sigma
+        return rng.lognormvariate(math.log(median), sigma)
+
+
+class LocalLambda(StubClient):
+    # functions is {name: {'Runtime': ..., 'MemorySize': ..., 'CodeSize': ...}}.
+    # Every function keeps a pool of idle execution environments: an invocation that finds
+    # none, or draws cold_ratio, is cold and brings up a new one, which goes back to the pool
+    # when it returns. With latency_scale > 0 invoke sleeps for that fraction of the synthetic
+    # duration, so concurrent invocations need environments of their own. A configuration
+    # update stays InProgress for update_delay seconds and retires every environment.
+    # LogType='Tail' returns a REPORT line like Lambda's. A function's optional
+    # 'ProvisionedConcurrency' starts its pool with that many environments, and with
+    # 'SnapStart' its cold invocations restore instead of initializing.
+    def __init__(self, functions, xray, timing=None, cold_ratio=0.0, seed=0, latency_scale=0.0, update_delay=0.0):
+        super().__init__()
+        self.functions = functions
+        self.xray = xray
+        self.timing = timing or TimingModel()
+        self.cold_ratio = cold_ratio
+        self.latency_scale = latency_scale
+        self.update_delay = update_delay
+        self.updates = {}
+        self.rng = random.Random(seed)
+        # {name: idle environments}, {name: configuration generation}
+        self.idle = collections.Counter({name: config.get('ProvisionedConcurrency', 0) for name, config in functions.items()})
+        self.generations = collections.Counter()
+        self.trace_count = 0
+
+    def get_function_configuration(self, FunctionName):
+        self.count('GetFunctionConfiguration')
+        arn = FunctionName if FunctionName.startswith('arn:') else function_arn(FunctionName)
+        FunctionName = function_name(FunctionName)
+        if FunctionName not in self.functions:
+            raise client_error('ResourceNotFoundException', 'GetFunctionConfiguration')
+        status = 'InProgress' if self.updates.get(FunctionName, 0.0) > time.monotonic() else 'Successful'
+        return dict(self.revision(FunctionName), FunctionArn=arn, LastUpdateStatus=status)
+
+    def list_functions(self, MaxItems=50, Marker=None):
+        self.count('ListFunctions')
+        names = sorted(self.functions)
+        start = int(Marker) if Marker else 0
+        response = {'Functions': [dict(self.revision(name), FunctionArn=function_arn(name)) for name in names[start:start + MaxItems]]}
+        if start + MaxItems < len(names):
+            response['NextMarker'] = str(start + MaxItems)
+        return response
+
+    def revision(self, name):
+        # a function's configuration with the code hash and a revision that changes with every update
+        return dict(self.functions[name], FunctionName=name,
+                    CodeSha256=hashlib.sha256(name.encode('UTF-8')).hexdigest(),
+                    RevisionId='{}-{}'.format(name, self.generations[name]))
+
+    def update_function_configuration(self, FunctionName, **kwargs):
+        self.count('UpdateFunctionConfiguration')
+        FunctionName = function_name(FunctionName)
+        with self.lock:
+            if self.updates.get(FunctionName, 0.0) > time.monotonic():
+                raise client_error('ResourceConflictException', 'UpdateFunctionConfiguration')
+            self.functions[FunctionName].update(kwargs)
+            self.updates[FunctionName] = time.monotonic() + self.update_delay
+            self.idle[FunctionName] = 0
+            self.generations[FunctionName] += 1
+        return dict(self.functions[FunctionName], FunctionName=FunctionName, FunctionArn=function_arn(FunctionName), LastUpdateStatus='InProgress')
+
+    def invoke(self, FunctionName, InvocationType='RequestResponse', Payload=None, LogType='None', **kwargs):
+        self.count('Invoke')
+        FunctionName = function_name(FunctionName)
+        with self.lock:
+            cold = self.idle[FunctionName] == 0 or self.rng.random() < self.cold_ratio
+            if self.idle[FunctionName] > 0:
+                self.idle[FunctionName] -= 1
+            generation = self.generations[FunctionName]
+            self.trace_count += 1
+            trace_id = '1-%08x-%024x' % (int(time.time()), self.trace_count)
+            network = TimingModel.sample(self.rng, self.timing.network)
+            snapstart = 'SnapStart' in self.functions[FunctionName]
+            durations = {
+                'queue': TimingModel.sample(self.rng, self.timing.queue),
+                'init': TimingModel.sample(self.rng, self.timing.init) if cold and not snapstart else None,
+                'restore': TimingModel.sample(self.rng, self.timing.restore) if cold and snapstart else None,
+                'invocation': TimingModel.sample(self.rng, self.timing.invocation),
+                'overhead': TimingModel.sample(self.rng, self.timing.overhead)
+            }
+        self.xray.record(trace_id, FunctionName, time.time() + network / 2, durations)
+        if self.latency_scale > 0:
+            time.sleep((network + sum(duration for duration in durations.values() if duration is not None)) * self.latency_scale)
+        with self.lock:
+            if self.generations[FunctionName] == generation:
+                self.idle[FunctionName] += 1
+        response = {
+            'StatusCode': 200,
+            'Payload': io.BytesIO(b'"Hello from Lambda!"'),
+            'ResponseMetadata': {'HTTPHeaders': {'x-amzn-trace-id': 'Root=' + trace_id + ';Sampled=1'}}
+        }
+        if LogType == 'Tail':
+            duration_ms = (durations['invocation'] + durations['overhead']) * 1000
+            report = 'REPORT RequestId: %s\tDuration: %.2f ms\tBilled Duration: %d ms\tMemory Size: %d MB\tMax Memory Used: 60 MB\t' % (
+                trace_id, duration_ms, math.ceil(duration_ms), self.functions[FunctionName]['MemorySize'])
+            if durations['init'] is not None:
+                report += 'Init Duration: %.2f ms\t' % (durations['init'] * 1000)
+            if durations['restore'] is not None:
+                report += 'Restore Duration: %.2f ms\tBilled Restore Duration: %d ms\t' % (durations['restore'] * 1000, math.ceil(durations['restore'] * 1000))
+            response['LogResult'] = base64.b64encode(('END RequestId: %s\n%s\n' % (trace_id, report)).encode('UTF-8')).decode('ascii')
+        return response
+
+
+def function_arn(name):
+    return 'arn:aws:lambda:us-east-1:123456789012:function:' + name
+
+
+def function_name(name_or_arn):
+    # the name in a plain or qualified function ARN
+    return name_or_arn.split(':')[6] if name_or_arn.startswith('arn:') else name_or_arn
+
+
+class LocalCallerStateMachine(object):
+    # the caller state machine of the CDK stack: plan, a Map over the shards with at most
+    # max_concurrency running at once, then finish. Like the Map's catch, a shard that
+    # raises is reported to the finish step instead of failing the execution.
+    def __init__(self, handler, max_concurrency=20):
+        self.handler = handler
+        self.max_concurrency = max_concurrency
+
+    def invoke(self, event):
+        # payloads go through JSON as they would through Step Functions
+        return json.loads(json.dumps(self.handler(json.loads(json.dumps(event)), None)))
+
+    def run_shard(self, shard):
+        try:
+            return self.invoke(shard)
+        except Exception as e:
+            return {'Index': shard['Index'], 'Error': {'Error': type(e).__name__, 'Cause': str(e)}}
+
+    def start_execution(self):
+        plan = self.invoke({'Action': 'Plan'})
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, min(self.max_concurrency, len(plan['Shards'])))) as executor:
+            results = list(executor.map(self.run_shard, plan['Shards']))
+        return self.invoke({'Action': 'Finish', 'RunTimestamp': plan['RunTimestamp'], 'Results': results})
+
+
+class LocalTagging(StubClient):
+    # resourcegroupstaggingapi over the functions of a LocalLambda, tagged like the CDK stack does.
+    # A function's optional 'Tags' map adds the workload variant tags
+    def __init__(self, lambda_, matrix_name, page_size=100):
+        super().__init__()
+        self.lambda_ = lambda_
+        self.matrix_name = matrix_name
+        self.page_size = page_size
+
+    def get_resources(self, TagFilters, ResourceTypeFilters=None, PaginationToken=None):
+        self.count('GetResources')
+        names = [] if TagFilters != [{'Key': 'cold-start-benchmark:matrix', 'Values': [self.matrix_name]}] else sorted(self.lambda_.functions)
+        start = int(PaginationToken or 0)
+        page = names[start:start + self.page_size]
+        mappings = []
+        for name in page:
+            config = self.lambda_.functions[name]
+            mappings.append({'ResourceARN': function_arn(name), 'Tags': [
+                {'Key': 'cold-start-benchmark:matrix', 'Value': self.matrix_name},
+                {'Key': 'cold-start-benchmark:provider', 'Value': 'AWS'},
+                {'Key': 'cold-start-benchmark:runtime', 'Value': config['Runtime']},
+                {'Key': 'cold-start-benchmark:memory-size', 'Value': str(config['MemorySize'])}] +
+                [{'Key': key, 'Value': value} for key, value in config.get('Tags', {}).items()]})
+        token = str(start + self.page_size) if start + self.page_size < len(names) else ''
+        return {'ResourceTagMappingList': mappings, 'PaginationToken': token}
+
+
+class LocalXRay(StubClient):
+    # traces become visible ingestion_delay seconds after the invocation
+    def __init__(self, ingestion_delay=0.0):
+        super().__init__()
+        self.ingestion_delay = ingestion_delay
+        self.traces = {}
+
+    def record(self, trace_id, function, start, durations):
+        with self.lock:
+            self.traces[trace_id] = (time.monotonic() + self.ingestion_delay, synthetic_segments(trace_id, function, start, durations))
+
+    def batch_get_traces(self, TraceIds, NextToken=None):
+        self.count('BatchGetTraces')
+        if len(TraceIds) > 5:
+            raise client_error('InvalidRequestException', 'BatchGetTraces')
+        now = time.monotonic()
+        traces = []
+        for trace_id in TraceIds:
+            visible_at, segments = self.traces.get(trace_id, (None, None))
+            if visible_at is not None and visible_at <= now:
+                traces.append({'Id': trace_id, 'Segments': segments})
+        return {'Traces': traces, 'UnprocessedTraceIds': []}
+
+
+def synthetic_segments(trace_id, function, start, durations):
+    arn = function_arn(function)
+    cursor = start + durations['queue']
+    function_start = cursor
+    subsegments = []
+    for name, key in (('Initialization', 'init'), ('Restore', 'restore')):
+        duration = durations[key]
+        if duration is not None:
+            subsegments.append({'id': '%016x' % random.getrandbits(64), 'name': name, 'start_time': cursor, 'end_time': cursor + duration})
+            cursor += duration
+    for name in ('Invocation', 'Overhead'):
+        duration = durations[name.lower()]
+        subsegments.append({'id': '%016x' % random.getrandbits(64), 'name': name, 'start_time': cursor, 'end_time': cursor + duration})
+        cursor += duration
+    lambda_doc = {'id': '%016x' % random.getrandbits(64), 'name': function, 'start_time': start, 'end_time': cursor + 0.0005,
+                  'trace_id': trace_id, 'origin': 'AWS::Lambda', 'resource_arn': arn}
+    function_doc = {'id': '%016x' % random.getrandbits(64), 'name': function, 'start_time': function_start, 'end_time': cursor,
+                    'trace_id': trace_id, 'parent_id': lambda_doc['id'], 'origin': 'AWS::Lambda::Function',
+                    'aws': {'function_arn': arn}, 'subsegments': subsegments}
+    return [
+        {'Id': lambda_doc['id'], 'Document': json.dumps(lambda_doc)},
+        {'Id': function_doc['id'], 'Document': json.dumps(function_doc)}
+    ]
+
+
+class LocalDynamoDB(StubClient):
+    # one table per name, items are kept marshalled as {PK: {SK: item}}. With batch_write_limit
+    # every BatchWriteItem call writes at most that many requests and returns the rest in
+    # UnprocessedItems, as a throttled table does
+    def __init__(self, batch_write_limit=None):
+        super().__init__()
+        self.tables = collections.defaultdict(lambda: collections.defaultdict(dict))
+        self.consumed_capacity = 0.0
+        self.batch_write_limit = batch_write_limit
+
+    def put_item(self, TableName, Item, ConditionExpression=None, ExpressionAttributeNames=None, ExpressionAttributeValues=None):
+        self.count('PutItem')
+        pk, sk = item_key(Item)
+        with self.lock:
+            partition = self.tables[TableName][pk]
+            if ConditionExpression is not None and not check_condition(partition.get(sk), ConditionExpression, ExpressionAttributeNames or {}, ExpressionAttributeValues or {}):
+                raise client_error('ConditionalCheckFailedException', 'PutItem')
+            partition[sk] = Item
+        return {}
+
+    def get_item(self, TableName, Key, ConsistentRead=False):
+        self.count('GetItem')
+        pk, sk = item_key(Key)
+        with self.lock:
+            item = self.tables[TableName][pk].get(sk)
+        return {} if item is None else {'Item': json.loads(json.dumps(item))}
+
+    def delete_item(self, TableName, Key):
+        self.count('DeleteItem')
+        pk, sk = item_key(Key)
+        with self.lock:
+            self.tables[TableName][pk].pop(sk, None)
+        return {}
+
+    def batch_write_item(self, RequestItems):
+        self.count('BatchWriteItem')
+        unprocessed = {}
+        with self.lock:
+            for table_name, requests in RequestItems.items():
+                if len(requests) > 25:
+                    raise client_error('ValidationException', 'BatchWriteItem')
+                if self.batch_write_limit is not None and len(requests) > self.batch_write_limit:
+                    unprocessed[table_name] = requests[self.batch_write_limit:]
+                    requests = requests[:self.batch_write_limit]
+                table = self.tables[table_name]
+                for request in requests:
+                    if 'PutRequest' in request:
+                        pk, sk = item_key(request['PutRequest']['Item'])
+                        table[pk][sk] = request['PutRequest']['Item']
+                    else:
+                        pk, sk = item_key(request['DeleteRequest']['Key'])
+                        table[pk].pop(sk, None)
+        return {'UnprocessedItems': unprocessed}
+
+    def query(self, TableName, KeyConditionExpression, ExpressionAttributeValues, ExpressionAttributeNames=None,
+              ProjectionExpression=None, ExclusiveStartKey=None, Limit=None, ScanIndexForward=True, ReturnConsumedCapacity=None):
+        self.count('Query')
+        names = ExpressionAttributeNames or {}
+        pk, sk_range = parse_key_condition(KeyConditionExpression, names, ExpressionAttributeValues)
+        with self.lock:
+            matches = list(self.tables[TableName][pk].values())
+        if sk_range is not None:
+            matches = [item for item in matches if sk_range[0] <= float(item['SK']['N']) <= sk_range[1]]
+        matches.sort(key=lambda item: float(item['SK']['N']), reverse=not ScanIndexForward)
+        if ExclusiveStartKey is not None:
+            start_key = item_key(ExclusiveStartKey)
+            position = [item_key(item) for item in matches].index(start_key)
+            matches = matches[position + 1:]
+        page = []
+        size = 0
+        for item in matches:
+            item_size = len(json.dumps(item))
+            if page and (size + item_size > QUERY_PAGE_BYTES or (Limit is not None and len(page) >= Limit)):
+                break
+            page.append(item)
+            size += item_size
+        # eventually consistent reads cost half a unit per 4 KB
+        capacity = math.ceil(size / 4096.0) * 0.5
+        with self.lock:
+            self.consumed_capacity += capacity
+        response = {'Items': [project(item, ProjectionExpression, names) for item in page], 'Count': len(page)}
+        if len(page) < len(matches):
+            response['LastEvaluatedKey'] = {'PK': page[-1]['PK'], 'SK': page[-1]['SK']}
+        if ReturnConsumedCapacity:
+            response['ConsumedCapacity'] = {'TableName': TableName, 'CapacityUnits': capacity}
+        return response
+
+
+def item_key(item):
+    return item['PK']['S'], float(item['SK']['N'])
+
+
+def resolve(token, names):
+    return names.get(token, token)
+
+
+def parse_key_condition(expression, names, values):
+    match = re.match(r'^\s*(\S+)\s*=\s*(:\w+)(?:\s+and\s+(\S+)\s+BETWEEN\s+(:\w+)\s+and\s+(:\w+))?\s*$', expression, re.IGNORECASE)
+    if match is None:
+        raise client_error('ValidationException', 'Query')
+    pk = values[match.group(2)]['S']
+    if match.group(3) is None:
+        return pk, None
+    return pk, (float(values[match.group(4)]['N']), float(values[match.group(5)]['N']))
+
+
+def check_condition(existing, expression, names, values):
+    match = re.match(r'^attribute_not_exists\((\S+)\)$', expression.strip())
+    if match is not None:
+        return existing is None
+    match = re.match(r'^(\S+)\s*=\s*(:\w+)$', expression.strip())
+    if match is not None:
+        return existing is not None and existing.get(resolve(match.group(1), names)) == values[match.group(2)]
+    raise client_error('ValidationException', 'PutItem')
+
+
+def project(item, expression, names):
+    if not expression:
+        return item
+    attributes = [resolve(token.strip(), names) for token in expression.split(',')]
+    return {name: item[name] for name in attributes if name in item}
+
+
+class LocalS3(StubClient):
+    def __init__(self):
+        super().__init__()
+        self.objects = {}
+
+    def put_object(self, Body, Bucket, Key, **kwargs):
+        self.count('PutObject')
+        with self.lock:
+            self.objects[(Bucket, Key)] = Body
+        return {}
+
+    def get_object(self, Bucket, Key):
+        self.count('GetObject')
+        if (Bucket, Key) not in self.objects:
+            raise client_error('NoSuchKey', 'GetObject')
+        return {'Body': io.BytesIO(self.objects[(Bucket, Key)])}
+
+    def list_objects_v2(self, Bucket, Prefix='', Delimiter=None, ContinuationToken=None, MaxKeys=1000):
+        self.count('ListObjectsV2')
+        with self.lock:
+            keys = sorted(key for bucket, key in self.objects if bucket == Bucket and key.startswith(Prefix))
+        # keys and common prefixes in one sorted listing, like S3
+        entries = []
+        for key in keys:
+            cut = key.find(Delimiter, len(Prefix)) if Delimiter else -1
+            entry = ('CommonPrefixes', key[:cut + len(Delimiter)]) if cut >= 0 else ('Contents', key)
+            if not entries or entries[-1] != entry:
+                entries.append(entry)
+        start = int(ContinuationToken or 0)
+        page = entries[start:start + MaxKeys]
+        response = {
+            'Contents': [{'Key': key, 'Size': len(self.objects[(Bucket, key)])} for kind, key in page if kind == 'Contents'],
+            'CommonPrefixes': [{'Prefix': prefix} for kind, prefix in page if kind == 'CommonPrefixes'],
+            'IsTruncated': start + MaxKeys < len(entries)
+        }
+        if response['IsTruncated']:
+            response['NextContinuationToken'] = str(start + MaxKeys)
+        return response
+
+    def delete_objects(self, Bucket, Delete):
+        self.count('DeleteObjects')
+        if len(Delete['Objects']) > 1000:
+            raise client_error('MalformedXML', 'DeleteObjects')
+        with self.lock:
+            for obj in Delete['Objects']:
+                self.objects.pop((Bucket, obj['Key']), None)
+        return {}
+
+
+def client_error(code, operation):
+    return ClientError({'Error': {'Code': code, 'Message': code}}, operation)
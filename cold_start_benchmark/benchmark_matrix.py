@@ -0,0 +1,152 @@
+import collections
+import re
+
+# tags on every benchmark target, the caller and the summarizer discover targets by them
+MATRIX_TAG = 'cold-start-benchmark:matrix'
+PROVIDER_TAG = 'cold-start-benchmark:provider'
+RUNTIME_TAG = 'cold-start-benchmark:runtime'
+MEMORY_SIZE_TAG = 'cold-start-benchmark:memory-size'
+# digest of the deployed code, the caller lists configurations again when it changes
+CODE_DIGEST_TAG = 'cold-start-benchmark:code-digest'
+# only on the workload variants
+WORKLOAD_TAG = 'cold-start-benchmark:workload'
+PAYLOAD_KB_TAG = 'cold-start-benchmark:payload-kb'
+# only on the mitigated twins, which are invoked through the alias named by the qualifier tag
+MITIGATION_TAG = 'cold-start-benchmark:mitigation'
+QUALIFIER_TAG = 'cold-start-benchmark:qualifier'
+
+# the pinned aws-cdk (1.75) cannot set a function's architecture yet
+SUPPORTED_ARCHITECTURES = ('x86_64',)
+
+# workload and mitigation are None for the hello-world functions
+BenchmarkTarget = collections.namedtuple('BenchmarkTarget', ['construct_id', 'runtime', 'handler', 'asset', 'memory_size', 'architecture', 'workload', 'mitigation'])
+
+# a hello-world function padded with padding_mb MB of incompressible files, importing
+# init_imports generated modules at init time, answering with a payload_kb KB response
+# and invoked with a payload_kb KB request
+Workload = collections.namedtuple('Workload', ['name', 'padding_mb', 'init_imports', 'payload_kb'])
+
+# a twin of a hello-world function behind an alias: with provisioned_concurrency environments
+# kept initialized (type ProvisionedConcurrency), or restored from a snapshot of the
+# initialized environment (type SnapStart, provisioned_concurrency is 0)
+Mitigation = collections.namedtuple('Mitigation', ['name', 'type', 'provisioned_concurrency'])
+PROVISIONED_CONCURRENCY = 'ProvisionedConcurrency'
+SNAPSTART = 'SnapStart'
+# runtimes Lambda can snapshot, the twins of other runtimes are left out
+SNAPSTART_RUNTIMES = ('JAVA_11',)
+MITIGATION_ALIAS = 'benchmark'
+# read by the caller into Configs.Mitigation, see cold_start_caller/ColdStartCaller.py
+MITIGATION_VARIABLES = {
+    'MITIGATION_NAME': lambda mitigation: mitigation.name,
+    'MITIGATION_TYPE': lambda mitigation: mitigation.type,
+    'MITIGATION_PROVISIONED_CONCURRENCY': lambda mitigation: str(mitigation.provisioned_concurrency)
+}
+
+# Lambda limits: 250 MB unzipped per function, 6 MB per synchronous request and response
+MAX_PADDING_MB = 200
+MAX_PAYLOAD_KB = 5120
+WORKLOAD_NAME_PATTERN = re.compile(r'^[a-z0-9-]{1,32}$')
+
+
+def memory_sizes(spec):
+    # "MemorySizeList": [128, 512] and/or "MemorySizeRange": {"Start": 128, "Stop": 10240, "Step": 64}
+    sizes = set(spec.get('MemorySizeList', []))
+    if 'MemorySizeRange' in spec:
+        size_range = spec['MemorySizeRange']
+        sizes.update(range(size_range['Start'], size_range['Stop'] + 1, size_range['Step']))
+    for size in sizes:
+        if not 128 <= size <= 10240:
+            raise ValueError("Memory size " + str(size) + " is outside 128-10240 MB")
+    return sorted(sizes)
+
+
+def has_memory_sizes(spec):
+    return 'MemorySizeList' in spec or 'MemorySizeRange' in spec
+
+
+def workload(spec):
+    # {"Name": "pad50mb", "PaddingMB": 50, "InitImports": 0, "PayloadKB": 0} of a "Workloads" entry
+    variant = Workload(spec['Name'], spec.get('PaddingMB', 0), spec.get('InitImports', 0), spec.get('PayloadKB', 0))
+    if not WORKLOAD_NAME_PATTERN.match(variant.name):
+        raise ValueError("Workload name " + variant.name + " must be 1-32 lowercase letters, digits and dashes")
+    if not 0 <= variant.padding_mb <= MAX_PADDING_MB:
+        raise ValueError("Workload " + variant.name + " pads outside 0-" + str(MAX_PADDING_MB) + " MB")
+    if not 0 <= variant.payload_kb <= MAX_PAYLOAD_KB:
+        raise ValueError("Workload " + variant.name + " has a payload outside 0-" + str(MAX_PAYLOAD_KB) + " KB")
+    if variant.init_imports < 0:
+        raise ValueError("Workload " + variant.name + " has a negative number of init imports")
+    return variant
+
+
+def mitigation(spec):
+    # {"Name": "provisioned", "Type": "ProvisionedConcurrency", "ProvisionedConcurrency": 1} or
+    # {"Name": "snapstart", "Type": "SnapStart"} of the "Mitigations" list
+    variant = Mitigation(spec['Name'], spec['Type'], spec.get('ProvisionedConcurrency', 0))
+    if not WORKLOAD_NAME_PATTERN.match(variant.name):
+        raise ValueError("Mitigation name " + variant.name + " must be 1-32 lowercase letters, digits and dashes")
+    if variant.type == PROVISIONED_CONCURRENCY:
+        if variant.provisioned_concurrency < 1:
+            raise ValueError("Mitigation " + variant.name + " needs a ProvisionedConcurrency of at least 1")
+    elif variant.type == SNAPSTART:
+        if variant.provisioned_concurrency:
+            raise ValueError("Mitigation " + variant.name + " cannot provision concurrency, it is a SnapStart twin")
+    else:
+        raise ValueError("Mitigation " + variant.name + " has an unknown type " + variant.type)
+    return variant
+
+
+def mitigation_environment(mitigation: Mitigation) -> dict:
+    return {name: value(mitigation) for name, value in MITIGATION_VARIABLES.items()}
+
+
+def expand_matrix(configs):
+    # one BenchmarkTarget per runtime x memory size x architecture of configs['Matrix'], plus one
+    # per memory size x architecture for every workload variant in a runtime's "Workloads" and
+    # every matrix-wide "Mitigations" entry the runtime supports
+    matrix = configs['Matrix']
+    mitigation_specs = matrix.get('Mitigations', [])
+    targets = []
+    for runtime_spec in matrix['Runtimes']:
+        # runtime entries may override the matrix-wide memory sizes and architectures
+        sizes = memory_sizes(runtime_spec if has_memory_sizes(runtime_spec) else matrix)
+        architectures = runtime_spec.get('Architectures', matrix.get('Architectures', ['x86_64']))
+        # the hello-world function first, so its construct ids stay as they were
+        variants = [(None, sizes)]
+        for workload_spec in runtime_spec.get('Workloads', []):
+            # and workload entries may override the runtime's memory sizes
+            variants.append((workload(workload_spec), memory_sizes(workload_spec) if has_memory_sizes(workload_spec) else sizes))
+        # the mitigated twins of the hello-world function, which share the partition key position of the workloads
+        twins = []
+        for mitigation_spec in mitigation_specs:
+            twin = mitigation(mitigation_spec)
+            if twin.type == SNAPSTART and runtime_spec['Runtime'] not in SNAPSTART_RUNTIMES:
+                continue
+            if any(variant is not None and variant.name == twin.name for variant, _ in variants):
+                raise ValueError("Mitigation " + twin.name + " has the name of a workload of " + runtime_spec['Runtime'])
+            twins.append((twin, [size for size in sizes if size in memory_sizes(mitigation_spec)] if has_memory_sizes(mitigation_spec) else sizes))
+        for architecture in architectures:
+            if architecture not in SUPPORTED_ARCHITECTURES:
+                raise ValueError("Architecture " + architecture + " is not supported by the pinned aws-cdk")
+            for variant, variant_sizes in variants:
+                for size in variant_sizes:
+                    targets.append(BenchmarkTarget(
+                        construct_id=runtime_spec['ConstructId'] + str(size) + '_' + (variant.name.replace('-', '_') + '_' if variant else ''),
+                        runtime=runtime_spec['Runtime'],
+                        handler=runtime_spec['Handler'],
+                        asset=runtime_spec['Asset'],
+                        memory_size=size,
+                        architecture=architecture,
+                        workload=variant,
+                        mitigation=None))
+            for twin, twin_sizes in twins:
+                for size in twin_sizes:
+                    targets.append(BenchmarkTarget(
+                        construct_id=runtime_spec['ConstructId'] + str(size) + '_' + twin.name.replace('-', '_') + '_',
+                        runtime=runtime_spec['Runtime'],
+                        handler=runtime_spec['Handler'],
+                        asset=runtime_spec['Asset'],
+                        memory_size=size,
+                        architecture=architecture,
+                        workload=None,
+                        mitigation=twin))
+    return targets
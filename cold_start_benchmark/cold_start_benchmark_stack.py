@@ -11,72 +11,175 @@ from aws_cdk import (
     aws_sns as sns_,
     aws_sns_subscriptions as sns_subs_,
     aws_appsync as appsync_,
-    aws_amplify as amplify_
+    aws_amplify as amplify_,
+    aws_stepfunctions as sfn_,
+    aws_stepfunctions_tasks as sfn_tasks_
 )
 import json
+import typing
+
+from .benchmark_matrix import (
+    BenchmarkTarget,
+    CODE_DIGEST_TAG,
+    MATRIX_TAG,
+    MEMORY_SIZE_TAG,
+    MITIGATION_ALIAS,
+    MITIGATION_TAG,
+    PAYLOAD_KB_TAG,
+    PROVIDER_TAG,
+    QUALIFIER_TAG,
+    RUNTIME_TAG,
+    SNAPSTART,
+    WORKLOAD_TAG,
+    mitigation_environment
+)
+from .workload_assets import build_workload_asset, code_digest, workload_environment
+
+# the caller's 600 s timeout, less room for the forced cold start of a load test
+LOAD_TEST_MAX_SECONDS = 480
+
+# Embedded Metric Format metrics of cold_start_common/python/pipeline_metrics.py, keep the two in sync
+PIPELINE_METRICS_NAMESPACE = 'ColdStartBenchmark'
+CALLER_PHASES = ('Discover', 'Invoke', 'XRayWait', 'ConfigFetch', 'DynamoDBWrite', 'AggregateWrite', 'S3Write')
+SUMMARIZER_PHASES = ('Discover', 'Summarize', 'LoadSummarize', 'DynamoDBWrite')
+API_COUNTS = ('ApiCalls', 'ApiRetries', 'ApiThrottles', 'ApiErrors')
+
+
+def pipeline_metric(function: str, action: str, name: str, statistic: str) -> cloudwatch_.Metric:
+    return cloudwatch_.Metric(
+        namespace=PIPELINE_METRICS_NAMESPACE,
+        metric_name=name,
+        dimensions={'Function': function, 'Action': action},
+        statistic=statistic,
+        period=core.Duration.hours(1))
+
+
+def load_configs():
+    with open("./configurations/config.json") as json_file:
+        return json.load(json_file)
+
+
+def add_benchmark_targets(scope: core.Construct, targets: typing.List[BenchmarkTarget], matrix_name: str) -> None:
+    # the targets share one role, so a stack holds roughly one resource per target
+    role = iam_.Role(scope, "cold_start_target_role",
+        assumed_by=iam_.ServicePrincipal("lambda.amazonaws.com"),
+        managed_policies=[
+            iam_.ManagedPolicy.from_aws_managed_policy_name("service-role/AWSLambdaBasicExecutionRole"),
+            iam_.ManagedPolicy.from_aws_managed_policy_name("AWSXRayDaemonWriteAccess")])
+    for target in targets:
+        runtime = getattr(lambda_.Runtime, target.runtime)
+        asset, handler, environment = target.asset, target.handler, None
+        if target.workload is not None:
+            # padded copy of the asset with a generated handler, see workload_assets.py
+            asset, handler = build_workload_asset(target)
+            environment = workload_environment(target.workload)
+        if target.mitigation is not None:
+            environment = mitigation_environment(target.mitigation)
+        function = lambda_.Function(scope, id=target.construct_id,
+            runtime=runtime, handler=handler, memory_size=target.memory_size,
+            tracing=lambda_.Tracing.ACTIVE, code=lambda_.Code.asset(asset), role=role,
+            environment=environment)
+        if target.mitigation is not None:
+            add_mitigation(scope, target, function)
+        core.Tags.of(function).add(MATRIX_TAG, matrix_name)
+        core.Tags.of(function).add(PROVIDER_TAG, 'AWS')
+        core.Tags.of(function).add(RUNTIME_TAG, runtime.name)
+        core.Tags.of(function).add(MEMORY_SIZE_TAG, str(target.memory_size))
+        core.Tags.of(function).add(CODE_DIGEST_TAG, code_digest(target))
+        if target.workload is not None:
+            core.Tags.of(function).add(WORKLOAD_TAG, target.workload.name)
+            if target.workload.payload_kb:
+                core.Tags.of(function).add(PAYLOAD_KB_TAG, str(target.workload.payload_kb))
+        if target.mitigation is not None:
+            core.Tags.of(function).add(MITIGATION_TAG, target.mitigation.name)
+            core.Tags.of(function).add(QUALIFIER_TAG, MITIGATION_ALIAS)
+
+
+def add_mitigation(scope: core.Construct, target: BenchmarkTarget, function: lambda_.Function) -> None:
+    # the twin is invoked through an alias on its current version, which either keeps
+    # environments provisioned or, with SnapStart, is published from a snapshot
+    if target.mitigation.type == SNAPSTART:
+        # the pinned aws-cdk has no SnapStart property yet
+        function.node.default_child.add_property_override('SnapStart', {'ApplyOn': 'PublishedVersions'})
+    lambda_.Alias(scope, id=target.construct_id + 'alias',
+        alias_name=MITIGATION_ALIAS,
+        version=function.current_version,
+        provisioned_concurrent_executions=target.mitigation.provisioned_concurrency or None)
+
+
+class ColdStartTargetsStack(core.Stack):
+    # benchmark targets that do not fit next to the pipeline in ColdStartBenchmarkStack
+
+    def __init__(self, scope: core.Construct, construct_id: str, targets: typing.List[BenchmarkTarget], **kwargs) -> None:
+        super().__init__(scope, construct_id, **kwargs)
+        add_benchmark_targets(self, targets, load_configs()['Matrix']['Name'])
+
 
 class ColdStartBenchmarkStack(core.Stack):
 
-    def __init__(self, scope: core.Construct, construct_id: str, **kwargs) -> None:
+    def __init__(self, scope: core.Construct, construct_id: str, targets: typing.List[BenchmarkTarget], **kwargs) -> None:
         super().__init__(scope, construct_id, **kwargs)
 
         # load configs from "./comfigurations/config.json"
-        configs = {}
-        with open("./configurations/config.json") as json_file:
-            configs = json.load(json_file)
-
-        # Default lambdas for testing
-        mem_list = configs['MemorySizeList']
-        cold_start_lambdas = {}
-        for mem in mem_list:
-            python38_lambda = lambda_.Function(self, id="coldstart_python38_" + str(mem) + "_", 
-                runtime=lambda_.Runtime.PYTHON_3_8, handler="lambda_function.lambda_handler", memory_size=mem,
-                tracing=lambda_.Tracing.ACTIVE, code=lambda_.Code.asset("./cold_start_lambdas/python38"))
-            cold_start_lambdas['PYTHON38_' + str(mem)] = python38_lambda
-            
-        for mem in mem_list:
-            nodejs12x_lambda = lambda_.Function(self, id="coldstart_nodejs12x" + str(mem) + "_",
-                runtime=lambda_.Runtime.NODEJS_12_X, handler="index.handler", memory_size=mem,
-                tracing=lambda_.Tracing.ACTIVE, code=lambda_.Code.asset("./cold_start_lambdas/nodejs12x"))
-            cold_start_lambdas['NODEJS12X_' + str(mem)] = nodejs12x_lambda
-
-        for mem in mem_list:
-            go1x_lambda = lambda_.Function(self, id="coldstart_go1x" + str(mem) + "_",
-                runtime=lambda_.Runtime.GO_1_X, handler="hello", memory_size=mem,
-                tracing=lambda_.Tracing.ACTIVE, code=lambda_.Code.asset("./cold_start_lambdas/go1x"))
-            cold_start_lambdas['GO1X_' + str(mem)] = go1x_lambda
-
-        for mem in mem_list:
-            netcore31_lambda = lambda_.Function(self, id="coldstart_netcore31" + str(mem) + "_",
-                runtime=lambda_.Runtime.DOTNET_CORE_3_1, handler="LambdaTest::LambdaTest.LambdaHandler::handleRequest",
-                tracing=lambda_.Tracing.ACTIVE, code=lambda_.Code.asset("./cold_start_lambdas/netcore31"), memory_size=mem,)
-            cold_start_lambdas['NETCORE31_' + str(mem)] = netcore31_lambda
-
-        for mem in mem_list:
-            java11corretto_lambda = lambda_.Function(self, id="coldstart_java11corretto" + str(mem) + "_",
-                runtime=lambda_.Runtime.JAVA_11, handler="example.Hello::handleRequest", memory_size=mem,
-                tracing=lambda_.Tracing.ACTIVE, code=lambda_.Code.asset("./cold_start_lambdas/java11corretto"))
-            cold_start_lambdas['JAVA11_' + str(mem)] = java11corretto_lambda
-
-        for mem in mem_list:
-            ruby27_lambda = lambda_.Function(self, id="coldstart_ruby27" + str(mem) + "_",
-                runtime=lambda_.Runtime.RUBY_2_7, handler="lambda_function.lambda_handler", memory_size=mem,
-                tracing=lambda_.Tracing.ACTIVE, code=lambda_.Code.asset("./cold_start_lambdas/ruby27"))
-            cold_start_lambdas['RUBY27_' + str(mem)] = ruby27_lambda
+        configs = load_configs()
+
+        # benchmark targets generated from the "Matrix" section, app.py moves any
+        # targets beyond the first TargetsPerStack into ColdStartTargetsStacks
+        matrix_name = configs['Matrix']['Name']
+        add_benchmark_targets(self, targets, matrix_name)
+
+        # modules shared by caller and summarizer
+        cold_start_common_layer = lambda_.LayerVersion(self, id="cold_start_common_layer",
+            code=lambda_.Code.asset("./cold_start_lambdas/cold_start_common"),
+            compatible_runtimes=[lambda_.Runtime.PYTHON_3_8])
+        # NumPy for the summarizer, AWS publishes a SciPy/NumPy layer per region
+        numpy_layer = lambda_.LayerVersion.from_layer_version_arn(self, id="numpy_layer",
+            layer_version_arn=configs['NumpyLayerArn'])
+        # pyarrow for the Parquet archive, any layer with pyarrow >= 2.0 will do
+        pyarrow_layer = lambda_.LayerVersion.from_layer_version_arn(self, id="pyarrow_layer",
+            layer_version_arn=configs['PyArrowLayerArn'])
 
         # Caller
         cold_start_caller = lambda_.Function(self, id="cold_start_caller", 
             runtime=lambda_.Runtime.PYTHON_3_8, handler="ColdStartCaller.lambda_handler",
             code=lambda_.Code.asset("./cold_start_lambdas/cold_start_caller"),
-            timeout=core.Duration.seconds(180))
+            layers=[cold_start_common_layer, pyarrow_layer],
+            # pyarrow alone takes about 90 MB, and the invoke threads time every invocation on
+            # the client side, which a throttled CPU would skew. 1024 MB like the compactor
+            memory_size=1024,
+            # forced cold samples wait for a configuration update each
+            timeout=core.Duration.seconds(600))
         cold_start_caller.role.add_managed_policy(iam_.ManagedPolicy.from_aws_managed_policy_name("AWSXrayReadOnlyAccess"))
+        # configurations are listed in bulk, see cold_start_lambdas/cold_start_caller/config_cache.py
         cold_start_caller.role.add_to_policy(iam_.PolicyStatement(
             effect=iam_.Effect.ALLOW, 
-            actions=['lambda:GetFunctionConfiguration'],
+            actions=['lambda:GetFunctionConfiguration', 'lambda:ListFunctions', 'tag:GetResources'],
             resources=["*"]))
-        for lambda_name in cold_start_lambdas:
-            cold_start_caller.add_environment(lambda_name, cold_start_lambdas[lambda_name].function_arn)
-            cold_start_lambdas[lambda_name].grant_invoke(cold_start_caller)
+        # one statement for every target, whichever stack it is in. Cold samples are forced
+        # by updating the target's environment
+        cold_start_caller.role.add_to_policy(iam_.PolicyStatement(
+            effect=iam_.Effect.ALLOW,
+            actions=['lambda:InvokeFunction', 'lambda:UpdateFunctionConfiguration'],
+            resources=["*"],
+            conditions={"StringEquals": {"aws:ResourceTag/" + MATRIX_TAG: matrix_name}}))
+        cold_start_caller.add_environment('BENCHMARK_MATRIX', matrix_name)
+        cold_start_caller.add_environment('INVOKE_PARALLELISM', str(configs['InvokeParallelism']))
+        cold_start_caller.add_environment('INVOKE_TIMEOUT_SECONDS', str(configs['InvokeTimeoutSeconds']))
+        cold_start_caller.add_environment('INVOKE_MAX_ATTEMPTS', str(configs['InvokeMaxAttempts']))
+        cold_start_caller.add_environment('XRAY_WAIT_SECONDS', str(configs['XRayWaitSeconds']))
+        cold_start_caller.add_environment('SHARD_SIZE', str(configs['CallerShardSize']))
+        cold_start_caller.add_environment('COLD_SAMPLES', str(configs['ColdSamplesPerRun']))
+        cold_start_caller.add_environment('WARM_SAMPLES', str(configs['WarmSamplesPerRun']))
+        cold_start_caller.add_environment('CONFIG_CACHE_TTL_SECONDS', str(configs['ConfigCacheTtlSeconds']))
+        # optional: a function emulator (tools/function_emulator.py) benchmarked next to Lambda
+        if configs.get('EmulatorEndpointUrl'):
+            cold_start_caller.add_environment('EMULATOR_ENDPOINT_URL', configs['EmulatorEndpointUrl'])
+        load_test = configs['LoadTest']
+        # one load test is a single caller invocation, ramping every step after a forced cold start
+        if len(load_test['ConcurrencySteps']) * load_test['StepSeconds'] > LOAD_TEST_MAX_SECONDS:
+            raise ValueError("LoadTest steps take longer than the caller's " + str(LOAD_TEST_MAX_SECONDS) + " s budget")
+        cold_start_caller.add_environment('LOAD_CONCURRENCY_STEPS', ','.join(str(step) for step in load_test['ConcurrencySteps']))
+        cold_start_caller.add_environment('LOAD_STEP_SECONDS', str(load_test['StepSeconds']))
 
         # DynamoDB
         cold_start_table = dynamodb_.Table(self, 
@@ -84,23 +187,62 @@ class ColdStartBenchmarkStack(core.Stack):
             partition_key=dynamodb_.Attribute(name="PK", type=dynamodb_.AttributeType.STRING),
             sort_key=dynamodb_.Attribute(name="SK", type=dynamodb_.AttributeType.NUMBER),
             time_to_live_attribute="TTL")
-        cold_start_table.grant_write_data(cold_start_caller)
+        cold_start_table.grant_read_write_data(cold_start_caller)
         cold_start_caller.add_environment('TABLE_NAME', cold_start_table.table_name)
 
-        # S3
-        life_cycle_rule = s3_.LifecycleRule(transitions=[
+        # S3. Only the legacy per-run JSON backups under AWS/ move to S3-IA, the archive's
+        # daily Parquet files are far below the 128 KB that S3-IA bills per object
+        life_cycle_rule = s3_.LifecycleRule(prefix="AWS/", transitions=[
             s3_.Transition(storage_class=s3_.StorageClass.INFREQUENT_ACCESS, transition_after=core.Duration.days(30))])
         cold_start_backup_s3 = s3_.Bucket(self, "cold_start_benchmark_backup", lifecycle_rules=[life_cycle_rule])
-        cold_start_backup_s3.grant_write(cold_start_caller)
+        # the caller also reads back its function configuration manifest
+        cold_start_backup_s3.grant_read_write(cold_start_caller)
         cold_start_caller.add_environment('BACKUP_BUCKET_NAME', cold_start_backup_s3.bucket_name)
 
-        # CW event
+        # Caller state machine: plan the shards, run one caller per shard, then record the run status.
+        # A crashed shard is caught so that the finish step still runs and reports it.
+        plan_shards = sfn_tasks_.LambdaInvoke(self, "cold_start_caller_plan",
+            lambda_function=cold_start_caller,
+            payload=sfn_.TaskInput.from_object({"Action": "Plan"}),
+            payload_response_only=True)
+        run_shard = sfn_tasks_.LambdaInvoke(self, "cold_start_caller_shard",
+            lambda_function=cold_start_caller,
+            payload_response_only=True)
+        run_shard.add_catch(sfn_.Pass(self, "cold_start_caller_shard_failed",
+            parameters={"Index.$": "$.Index", "Error.$": "$.Error"}), result_path="$.Error")
+        run_shards = sfn_.Map(self, "cold_start_caller_shards",
+            items_path="$.Shards",
+            max_concurrency=configs['CallerShardConcurrency'],
+            result_path="$.Results")
+        run_shards.iterator(run_shard)
+        finish_shards = sfn_tasks_.LambdaInvoke(self, "cold_start_caller_finish",
+            lambda_function=cold_start_caller,
+            payload=sfn_.TaskInput.from_object({
+                "Action": "Finish",
+                "RunTimestamp": sfn_.JsonPath.number_at("$.RunTimestamp"),
+                "Results": sfn_.JsonPath.list_at("$.Results")}),
+            payload_response_only=True)
+        cold_start_caller_state_machine = sfn_.StateMachine(self, "cold_start_caller_state_machine",
+            definition=plan_shards.next(run_shards).next(finish_shards),
+            timeout=core.Duration.minutes(30))
+
+        # CW event. Forced cold samples do not depend on the hour of idle time before minute 0,
+        # without them the minute 1 run is the warm one
         cron_job = events_.Rule(self, "cold_start_caller_cron_job", 
-            description="Run cold start caller twice every 1 hour",
-            schedule=events_.Schedule.cron(minute="0,1"),
-            targets=[targets_.LambdaFunction(cold_start_caller)]
+            description="Run cold start caller every 1 hour" if configs['ColdSamplesPerRun'] > 0 else "Run cold start caller twice every 1 hour",
+            schedule=events_.Schedule.cron(minute="0" if configs['ColdSamplesPerRun'] > 0 else "0,1"),
+            targets=[targets_.SfnStateMachine(cold_start_caller_state_machine)]
         )
 
+        # Weekly load tests, one partition at a time so that their ramps do not share the account's concurrency
+        for index, partition in enumerate(load_test['Partitions']):
+            events_.Rule(self, "cold_start_caller_load_cron_job_" + str(index),
+                description="Load test " + partition + " every week",
+                schedule=events_.Schedule.cron(minute=str(10 + 10 * (index % 5)), hour=str(3 + index // 5), week_day='SUN'),
+                targets=[targets_.LambdaFunction(cold_start_caller,
+                    event=events_.RuleTargetInput.from_object({"Action": "Load", "Partition": partition}))]
+            )
+
         # alarm when caller failed, send email for notification
         errorAlarm = cloudwatch_.Alarm(self, "cold_start_caller_error_alarm",
             metric=cloudwatch_.Metric(
@@ -131,10 +273,21 @@ class ColdStartBenchmarkStack(core.Stack):
         cold_start_summarizer = lambda_.Function(self, id="cold_start_summarizer",
             runtime=lambda_.Runtime.PYTHON_3_8, handler="ColdStartSummarizer.lambda_handler",
             code=lambda_.Code.asset("./cold_start_lambdas/cold_start_summarizer"),
-            timeout=core.Duration.seconds(10)
+            layers=[cold_start_common_layer, numpy_layer],
+            timeout=core.Duration.seconds(60)
         )
         cold_start_table.grant_read_write_data(cold_start_summarizer)
+        cold_start_summarizer.role.add_to_policy(iam_.PolicyStatement(
+            effect=iam_.Effect.ALLOW,
+            actions=['tag:GetResources'],
+            resources=["*"]))
         cold_start_summarizer.add_environment('TABLE_NAME', cold_start_table.table_name)
+        cold_start_summarizer.add_environment('BENCHMARK_MATRIX', matrix_name)
+        cold_start_summarizer.add_environment('QUERY_PARALLELISM', str(configs['SummarizerQueryParallelism']))
+        cold_start_summarizer.add_environment('SUMMARY_SOURCE', configs['SummarySource'])
+        cold_start_summarizer.add_environment('PRICING', json.dumps(configs.get('Pricing', {})))
+        if configs.get('EmulatorEndpointUrl'):
+            cold_start_summarizer.add_environment('EMULATOR_ENDPOINT_URL', configs['EmulatorEndpointUrl'])
         
         # setup CW event for summarizer
         cron_job_summarizer = events_.Rule(self, "cold_start_summarizer_cron_job", 
@@ -142,6 +295,19 @@ class ColdStartBenchmarkStack(core.Stack):
             schedule=events_.Schedule.cron(minute='30', hour='0'),
             targets=[targets_.LambdaFunction(cold_start_summarizer)]
         )
+        # weekly and monthly summaries merge the hourly aggregates written by the caller
+        cron_job_summarizer_weekly = events_.Rule(self, "cold_start_summarizer_weekly_cron_job",
+            description="Run cold start summarizer for the past week every Monday",
+            schedule=events_.Schedule.cron(minute='40', hour='0', week_day='MON'),
+            targets=[targets_.LambdaFunction(cold_start_summarizer,
+                event=events_.RuleTargetInput.from_object({"Period": "week"}))]
+        )
+        cron_job_summarizer_monthly = events_.Rule(self, "cold_start_summarizer_monthly_cron_job",
+            description="Run cold start summarizer for the past 30 days on the first of every month",
+            schedule=events_.Schedule.cron(minute='50', hour='0', day='1'),
+            targets=[targets_.LambdaFunction(cold_start_summarizer,
+                event=events_.RuleTargetInput.from_object({"Period": "month"}))]
+        )
 
         # error alarm for summarizer
         errorAlarm_summarizer = cloudwatch_.Alarm(self, "cold_start_summarizer_error_alarm",
@@ -168,6 +334,79 @@ class ColdStartBenchmarkStack(core.Stack):
         errorAlarm_summarizer.add_alarm_action(
             cloudwatch_actions_.SnsAction(cold_start_summarizer_error_alarm_topic))
 
+        # Pipeline self-metrics: phase times and API call counts of every caller shard and summarizer run
+        pipeline_dashboard = cloudwatch_.Dashboard(self, "cold_start_pipeline_dashboard",
+            dashboard_name="ColdStartBenchmarkPipeline")
+        pipeline_dashboard.add_widgets(
+            cloudwatch_.GraphWidget(title="Caller shard phases (max s)", width=12, stacked=True,
+                left=[pipeline_metric('ColdStartCaller', 'Shard', phase + 'Time', 'Maximum') for phase in CALLER_PHASES]),
+            cloudwatch_.GraphWidget(title="Caller API calls (sum)", width=12,
+                left=[pipeline_metric('ColdStartCaller', 'Shard', name, 'Sum') for name in API_COUNTS]))
+        pipeline_dashboard.add_widgets(
+            cloudwatch_.GraphWidget(title="Caller samples (sum)", width=12,
+                left=[pipeline_metric('ColdStartCaller', 'Shard', name, 'Sum') for name in ('Samples', 'Collected', 'Pending', 'FailedInvocations')]),
+            cloudwatch_.GraphWidget(title="Summarizer phases (max s)", width=12, stacked=True,
+                left=[pipeline_metric('ColdStartSummarizer', 'day', phase + 'Time', 'Maximum') for phase in SUMMARIZER_PHASES],
+                right=[pipeline_metric('ColdStartSummarizer', 'day', name, 'Sum') for name in API_COUNTS]))
+
+        # latency budgets: a shard or a daily summary that runs long is caught before it hits its timeout
+        latency_budgets = configs['LatencyBudgets']
+        caller_budget_alarm = cloudwatch_.Alarm(self, "cold_start_caller_latency_budget_alarm",
+            metric=pipeline_metric('ColdStartCaller', 'Shard', 'TotalTime', 'Maximum'),
+            evaluation_periods=1,
+            datapoints_to_alarm=1,
+            threshold=latency_budgets['CallerShardSeconds'],
+            alarm_description="Alarm when a cold start caller shard runs over its latency budget",
+            alarm_name="cold_start_caller_latency_budget_alarm",
+            comparison_operator=cloudwatch_.ComparisonOperator.GREATER_THAN_THRESHOLD,
+            treat_missing_data=cloudwatch_.TreatMissingData.NOT_BREACHING)
+        caller_budget_alarm.add_alarm_action(cloudwatch_actions_.SnsAction(cold_start_caller_error_alarm_topic))
+        summarizer_budget_alarm = cloudwatch_.Alarm(self, "cold_start_summarizer_latency_budget_alarm",
+            metric=pipeline_metric('ColdStartSummarizer', 'day', 'TotalTime', 'Maximum'),
+            evaluation_periods=1,
+            datapoints_to_alarm=1,
+            threshold=latency_budgets['SummarizerSeconds'],
+            alarm_description="Alarm when the daily cold start summarizer runs over its latency budget",
+            alarm_name="cold_start_summarizer_latency_budget_alarm",
+            comparison_operator=cloudwatch_.ComparisonOperator.GREATER_THAN_THRESHOLD,
+            treat_missing_data=cloudwatch_.TreatMissingData.NOT_BREACHING)
+        summarizer_budget_alarm.add_alarm_action(cloudwatch_actions_.SnsAction(cold_start_summarizer_error_alarm_topic))
+
+        # Archive compactor, merges the caller's hourly Parquet files into daily ones
+        cold_start_compactor = lambda_.Function(self, id="cold_start_compactor",
+            runtime=lambda_.Runtime.PYTHON_3_8, handler="ArchiveCompactor.lambda_handler",
+            code=lambda_.Code.asset("./cold_start_lambdas/cold_start_compactor"),
+            layers=[cold_start_common_layer, pyarrow_layer],
+            memory_size=1024,
+            timeout=core.Duration.seconds(600))
+        cold_start_backup_s3.grant_read_write(cold_start_compactor)
+        cold_start_compactor.add_environment('BACKUP_BUCKET_NAME', cold_start_backup_s3.bucket_name)
+        cron_job_compactor = events_.Rule(self, "cold_start_compactor_cron_job",
+            description="Compact the archive of the past two days once every day",
+            schedule=events_.Schedule.cron(minute='15', hour='0'),
+            targets=[targets_.LambdaFunction(cold_start_compactor)]
+        )
+        # failures go to the summarizer's topic, both are daily jobs over stored data
+        errorAlarm_compactor = cloudwatch_.Alarm(self, "cold_start_compactor_error_alarm",
+            metric=cloudwatch_.Metric(
+                metric_name='Errors',
+                namespace='AWS/Lambda',
+                period=core.Duration.minutes(5),
+                statistic='Maximum',
+                dimensions={'FunctionName': cold_start_compactor.function_name}
+            ),
+            evaluation_periods=1,
+            datapoints_to_alarm=1,
+            threshold=1,
+            actions_enabled=True,
+            alarm_description="Alarm when cold start compactor failed",
+            alarm_name="cold_start_compactor_error_alarm",
+            comparison_operator=cloudwatch_.ComparisonOperator.GREATER_THAN_OR_EQUAL_TO_THRESHOLD,
+            treat_missing_data=cloudwatch_.TreatMissingData.MISSING
+        )
+        errorAlarm_compactor.add_alarm_action(
+            cloudwatch_actions_.SnsAction(cold_start_summarizer_error_alarm_topic))
+
         # GraphQL API
         graphql_api = appsync_.GraphqlApi(self, "cold_start_benchmark_graphql_api",
             name="cold_start_benchmark_graphql_api",
@@ -191,6 +430,11 @@ class ColdStartBenchmarkStack(core.Stack):
             type_name="Query",
             request_mapping_template=appsync_.MappingTemplate.from_file('./cold_start_benchmark/graphql_schema/request_mapping_template'),
             response_mapping_template=appsync_.MappingTemplate.from_file('./cold_start_benchmark/graphql_schema/response_mapping_template'))
+        dynamodb_data_source.create_resolver(
+            field_name="listDashboardSnapshots",
+            type_name="Query",
+            request_mapping_template=appsync_.MappingTemplate.from_file('./cold_start_benchmark/graphql_schema/dashboard_request_mapping_template'),
+            response_mapping_template=appsync_.MappingTemplate.from_file('./cold_start_benchmark/graphql_schema/dashboard_response_mapping_template'))
 
         front_end_amplify_app = amplify_.App(self, "cold-start-front-end",
             app_name="cold_start_front_end",
@@ -0,0 +1,193 @@
+import hashlib
+import json
+import os
+import shutil
+import typing
+
+from .benchmark_matrix import BenchmarkTarget, Workload
+
+# generated assets, one directory per runtime and workload variant, shared by its memory sizes
+WORKLOAD_ROOT = './build/workloads'
+STAMP_FILE = '.workload.json'
+# bump when the generated files change, so existing directories are rebuilt
+GENERATOR_VERSION = 1
+PADDING_DIR = 'workload_padding'
+PADDING_FILE_MB = 16
+MODULES_DIR = 'workload_modules'
+# room for the {"statusCode": 200, "body": "..."} around the response body
+RESPONSE_ENVELOPE_BYTES = 32
+# {asset directory: asset_digest}
+asset_digests = {}
+
+# read by the caller into Configs.Workload, see cold_start_caller/ColdStartCaller.py
+WORKLOAD_VARIABLES = {
+    'WORKLOAD_NAME': lambda workload: workload.name,
+    'WORKLOAD_PADDING_MB': lambda workload: str(workload.padding_mb),
+    'WORKLOAD_INIT_IMPORTS': lambda workload: str(workload.init_imports),
+    'WORKLOAD_PAYLOAD_KB': lambda workload: str(workload.payload_kb)
+}
+
+
+def python_module(index):
+    return (
+        '# generated init-time import\n'
+        'TABLE = {key: key * key for key in range(200)}\n\n\n'
+        'class Transform%(i)d(object):\n'
+        '    def __init__(self, value):\n'
+        '        self.value = value\n\n'
+        '    def apply(self, data):\n'
+        '        return [self.value + item for item in data]\n\n\n'
+        'def transform_%(i)d(data):\n'
+        '    return Transform%(i)d(len(data)).apply(data)\n') % {'i': index}
+
+
+def python_handler(workload):
+    return (
+        '# generated by cold_start_benchmark/workload_assets.py for workload %(name)s\n'
+        'import %(modules)s  # noqa: F401\n\n'
+        'BODY = "x" * %(body)d\n\n\n'
+        'def lambda_handler(event, context):\n'
+        '    return {"statusCode": 200, "body": BODY}\n') % {
+            'name': workload.name, 'modules': MODULES_DIR, 'body': response_body_bytes(workload)}
+
+
+def node_module(index):
+    return (
+        '// generated init-time import\n'
+        'const table = {};\n'
+        'for (let key = 0; key < 200; key++) table[key] = key * key;\n'
+        'class Transform%(i)d {\n'
+        '    constructor(value) { this.value = value; }\n'
+        '    apply(data) { return data.map(item => this.value + item); }\n'
+        '}\n'
+        'module.exports = { table, transform: data => new Transform%(i)d(data.length).apply(data) };\n') % {'i': index}
+
+
+def node_handler(workload):
+    return (
+        '// generated by cold_start_benchmark/workload_assets.py for workload %(name)s\n'
+        "require('./%(modules)s');\n"
+        "const body = 'x'.repeat(%(body)d);\n"
+        'exports.handler = async (event) => ({ statusCode: 200, body: body });\n') % {
+            'name': workload.name, 'modules': MODULES_DIR, 'body': response_body_bytes(workload)}
+
+
+def ruby_module(index):
+    return (
+        '# generated init-time import\n'
+        'module Transform%(i)d\n'
+        '  TABLE = (0...200).map { |key| [key, key * key] }.to_h\n\n'
+        '  def self.apply(data)\n'
+        '    data.map { |item| data.length + item }\n'
+        '  end\n'
+        'end\n') % {'i': index}
+
+
+def ruby_handler(workload):
+    return (
+        '# generated by cold_start_benchmark/workload_assets.py for workload %(name)s\n'
+        "require_relative '%(modules)s'\n\n"
+        "BODY = 'x' * %(body)d\n\n"
+        'def lambda_handler(event:, context:)\n'
+        '  { statusCode: 200, body: BODY }\n'
+        'end\n') % {'name': workload.name, 'modules': MODULES_DIR, 'body': response_body_bytes(workload)}
+
+
+# runtimes whose handler can be generated: (handler, handler file, module file pattern,
+# module index file, module index line pattern, module source, handler source). The compiled
+# runtimes can only be padded.
+HANDLER_RUNTIMES = {
+    'PYTHON_3_8': ('workload_handler.lambda_handler', 'workload_handler.py', 'm%04d.py',
+                   os.path.join(MODULES_DIR, '__init__.py'), 'from . import m%04d  # noqa: F401\n', python_module, python_handler),
+    'NODEJS_12_X': ('workload_handler.handler', 'workload_handler.js', 'm%04d.js',
+                    os.path.join(MODULES_DIR, 'index.js'), "require('./m%04d');\n", node_module, node_handler),
+    'RUBY_2_7': ('workload_handler.lambda_handler', 'workload_handler.rb', 'm%04d.rb',
+                 MODULES_DIR + '.rb', "require_relative '" + MODULES_DIR + "/m%04d'\n", ruby_module, ruby_handler)
+}
+
+
+def response_body_bytes(workload):
+    return max(0, workload.payload_kb * 1024 - RESPONSE_ENVELOPE_BYTES)
+
+
+def workload_environment(workload: Workload) -> dict:
+    return {name: value(workload) for name, value in WORKLOAD_VARIABLES.items()}
+
+
+def build_workload_asset(target: BenchmarkTarget) -> typing.Tuple[str, str]:
+    # (asset directory, handler) of a workload variant: a copy of the target's asset with the
+    # padding, the generated modules and a generated handler. Everything is deterministic, so
+    # the asset hash only changes with the workload, and a directory whose stamp still
+    # matches is reused instead of rewriting hundreds of MB on every synth.
+    workload = target.workload
+    spec = HANDLER_RUNTIMES.get(target.runtime)
+    if spec is None and (workload.init_imports or workload.payload_kb):
+        raise ValueError("Workload " + workload.name + " needs a generated handler, which " + target.runtime + " does not have; it can only pad")
+    path = os.path.join(WORKLOAD_ROOT, target.runtime.lower() + '-' + workload.name)
+    stamp = workload_stamp(target)
+    handler = spec[0] if spec else target.handler
+    stamp_path = os.path.join(path, STAMP_FILE)
+    if os.path.exists(stamp_path):
+        with open(stamp_path) as stamp_file:
+            if stamp_file.read() == stamp:
+                return path, handler
+
+    shutil.rmtree(path, ignore_errors=True)
+    shutil.copytree(target.asset, path, ignore=shutil.ignore_patterns('__pycache__'))
+    write_padding(os.path.join(path, PADDING_DIR), workload)
+    if spec is not None:
+        _, handler_file, module_file, index_file, index_line, module_source, handler_source = spec
+        os.makedirs(os.path.join(path, MODULES_DIR))
+        for index in range(workload.init_imports):
+            write_file(os.path.join(path, MODULES_DIR, module_file % index), module_source(index))
+        write_file(os.path.join(path, index_file), ''.join(index_line % index for index in range(workload.init_imports)))
+        write_file(os.path.join(path, handler_file), handler_source(workload))
+    write_file(stamp_path, stamp)
+    return path, handler
+
+
+def workload_stamp(target: BenchmarkTarget) -> str:
+    # everything a workload variant's generated directory is made from
+    return json.dumps({'Version': GENERATOR_VERSION, 'Asset': asset_digest(target.asset), 'Workload': target.workload._asdict()}, sort_keys=True)
+
+
+def code_digest(target: BenchmarkTarget) -> str:
+    # digest of the code a target is deployed with, tagged on the function so the caller can
+    # tell a configuration listed before the last deployment. A workload variant's directory
+    # is generated from its stamp, so the stamp stands in for hundreds of MB of padding
+    if target.workload is not None:
+        return hashlib.sha256(workload_stamp(target).encode('UTF-8')).hexdigest()
+    return asset_digest(target.asset)
+
+
+def write_padding(path, workload):
+    # incompressible, so the padding makes it into the deployment package at full size
+    os.makedirs(path)
+    remaining = workload.padding_mb
+    index = 0
+    while remaining > 0:
+        size = min(PADDING_FILE_MB, remaining)
+        with open(os.path.join(path, 'p%03d.bin' % index), 'wb') as padding_file:
+            padding_file.write(hashlib.shake_256((workload.name + '/' + str(index)).encode('UTF-8')).digest(size << 20))
+        remaining -= size
+        index += 1
+
+
+def write_file(path, content):
+    with open(path, 'w') as output:
+        output.write(content)
+
+
+def asset_digest(asset):
+    # every target of a runtime shares its asset, hash each one once per synth
+    if asset in asset_digests:
+        return asset_digests[asset]
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(asset):
+        dirs[:] = sorted(directory for directory in dirs if directory != '__pycache__')
+        for name in sorted(files):
+            digest.update(os.path.relpath(os.path.join(root, name), asset).encode('UTF-8'))
+            with open(os.path.join(root, name), 'rb') as asset_file:
+                digest.update(asset_file.read())
+    asset_digests[asset] = digest.hexdigest()
+    return asset_digests[asset]
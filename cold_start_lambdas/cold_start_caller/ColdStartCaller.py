@@ -1,155 +1,480 @@
+import concurrent.futures
 import json
 import boto3
-import re
-import time
 import datetime
 import os
+from botocore.config import Config
+
+from aggregate_store import aggregate_pk, bucket_start, fold_records
+from config_cache import ConfigCache
+from benchmark_targets import DEFAULT_PROVIDER, configs_partition_suffix, partition_suffix, request_payload, target_order
+from dynamodb_codec import marshal
+from dynamodb_writer import batch_write_items
+from invoker import anchor_clock
+from load_runner import run_load
+from load_stats import LOAD_TYPE
+from pipeline_metrics import PipelineMetrics
+from providers import AwsProvider, EmulatorProvider
+from record_archive import write_report
+from record_columns import CLIENT_END_LABEL, CLIENT_START_LABEL
+from sampler import UPDATE_MAX_ATTEMPTS, force_cold_start
+from table_items import SAMPLE_SK_STEP, record_items
+
+INVOKE_PARALLELISM = int(os.environ.get('INVOKE_PARALLELISM', '32'))
+INVOKE_TIMEOUT_SECONDS = int(os.environ.get('INVOKE_TIMEOUT_SECONDS', '30'))
+INVOKE_MAX_ATTEMPTS = int(os.environ.get('INVOKE_MAX_ATTEMPTS', '3'))
+XRAY_WAIT_SECONDS = int(os.environ.get('XRAY_WAIT_SECONDS', '60'))
+# X-Ray needs a moment to index new traces, no point polling before that
+XRAY_INITIAL_DELAY_SECONDS = float(os.environ.get('XRAY_INITIAL_DELAY_SECONDS', '1'))
+DYNAMODB_WRITE_PARALLELISM = int(os.environ.get('DYNAMODB_WRITE_PARALLELISM', '4'))
+# the archive gets one object per runtime/memory size partition and run
+S3_WRITE_PARALLELISM = int(os.environ.get('S3_WRITE_PARALLELISM', '8'))
+# long enough for the monthly summary to merge a month of hourly aggregates
+AGGREGATE_RETENTION_DAYS = int(os.environ.get('AGGREGATE_RETENTION_DAYS', '62'))
+# functions per shard worker when the caller state machine splits the matrix
+SHARD_SIZE = int(os.environ.get('SHARD_SIZE', '200'))
+# samples per function and run, every cold sample gets a freshly forced execution environment
+COLD_SAMPLES = int(os.environ.get('COLD_SAMPLES', '0'))
+WARM_SAMPLES = int(os.environ.get('WARM_SAMPLES', '1'))
+COLD_START_UPDATE_TIMEOUT_SECONDS = float(os.environ.get('COLD_START_UPDATE_TIMEOUT_SECONDS', '60'))
+# attempts at each configuration update that forces a cold start, apart from the invokes'
+COLD_START_UPDATE_MAX_ATTEMPTS = int(os.environ.get('COLD_START_UPDATE_MAX_ATTEMPTS', str(UPDATE_MAX_ATTEMPTS)))
+# load mode: in-flight invocations of each step, and how long each step lasts
+LOAD_CONCURRENCY_STEPS = [int(concurrency) for concurrency in os.environ.get('LOAD_CONCURRENCY_STEPS', '1,10,50,100').split(',')]
+LOAD_STEP_SECONDS = float(os.environ.get('LOAD_STEP_SECONDS', '20'))
+LOAD_RETENTION_DAYS = int(os.environ.get('LOAD_RETENTION_DAYS', '400'))
+# function configurations come from one ListFunctions listing, made again after this long
+CONFIG_CACHE_TTL_SECONDS = float(os.environ.get('CONFIG_CACHE_TTL_SECONDS', '21600'))
+# a function emulator benchmarked next to Lambda, see tools/function_emulator.py
+EMULATOR_ENDPOINT_URL = os.environ.get('EMULATOR_ENDPOINT_URL')
+# set on the workload variants by the stack, see cold_start_benchmark/workload_assets.py
+WORKLOAD_VARIABLES = {
+    "Name": 'WORKLOAD_NAME',
+    "PaddingMB": 'WORKLOAD_PADDING_MB',
+    "InitImports": 'WORKLOAD_INIT_IMPORTS',
+    "PayloadKB": 'WORKLOAD_PAYLOAD_KB'
+}
+# environment of the mitigated twins, see cold_start_benchmark/benchmark_matrix.py
+MITIGATION_VARIABLES = {
+    "Name": 'MITIGATION_NAME',
+    "Type": 'MITIGATION_TYPE',
+    "ProvisionedConcurrency": 'MITIGATION_PROVISIONED_CONCURRENCY'
+}
 
 lambda_client = boto3.client('lambda')
+# retries are handled by the invoker so that every attempt is timed and counted
+lambda_invoke_client = boto3.client('lambda', config=Config(
+    read_timeout=INVOKE_TIMEOUT_SECONDS,
+    connect_timeout=5,
+    max_pool_connections=INVOKE_PARALLELISM,
+    retries={'max_attempts': 0}))
+# load mode keeps up to max(LOAD_CONCURRENCY_STEPS) invocations of one function in flight
+load_invoke_client = boto3.client('lambda', config=Config(
+    read_timeout=INVOKE_TIMEOUT_SECONDS,
+    connect_timeout=5,
+    max_pool_connections=max(LOAD_CONCURRENCY_STEPS),
+    retries={'max_attempts': 0}))
 xray_client = boto3.client('xray')
-dynamodb_client = boto3.client('dynamodb')
+tagging_client = boto3.client('resourcegroupstaggingapi')
+# DYNAMODB_ENDPOINT_URL points the client at DynamoDB Local for testing
+dynamodb_client = boto3.client('dynamodb', endpoint_url=os.environ.get('DYNAMODB_ENDPOINT_URL'))
 s3_client = boto3.client('s3')
+# phase timings and API call counts, one Embedded Metric Format line per invocation
+metrics = PipelineMetrics('ColdStartCaller')
+metrics.instrument(lambda_client, lambda_invoke_client, load_invoke_client, xray_client, tagging_client, dynamodb_client, s3_client)
+# kept across the runs of a warm caller, persisted next to the archive, see config_cache.py
+CONFIG_MANIFEST_KEY = 'config/functions.json'
+config_cache = ConfigCache(CONFIG_MANIFEST_KEY, CONFIG_CACHE_TTL_SECONDS)
+
+# runs keep their incomplete traces under DEFERRED|<provider>, shard workers under DEFERRED|<provider>|<shard index>
+DEFERRED_PK_PREFIX = 'DEFERRED|'
+# X-Ray keeps traces for 30 days, give up on a deferred run after a day
+DEFERRED_MAX_AGE = datetime.timedelta(days=1)
+# one status per provider and sharded run under RUN|<provider>
+RUN_STATUS_PK_PREFIX = 'RUN|'
 
 def lambda_handler(event, context):
-    memory_size_list = ["128", "512", "1024", "2048"]
-    runtime_list = ['PYTHON38', 'NODEJS12X', 'JAVA11', 'GO1X', 'RUBY27', 'NETCORE31']
-    functions = []
-    for mem in memory_size_list:
-        for runtime in runtime_list:
-            functions.append(os.environ[runtime + '_' + mem])
-    
-    xray_trace_id_dict = invoke_lambda_return_xray_id(functions)
-
-    # wait for 5 mins to allow xray to polulated
-    time.sleep(5)
-    
-    lambda_configs_dict = get_lambda_configs(functions)
-    
-    timestamp_dict = get_timestamp_from_xray(xray_trace_id_dict)
-
-    report_artifect_dict = merge_timestamp_configs(lambda_configs_dict, timestamp_dict)
-
-    # report data to destinations
-    store_data_to_dynamodb(report_artifect_dict)
-    store_data_to_s3(report_artifect_dict)
-
-
-def invoke_lambda_return_xray_id(functions):
-    xray_trace_id_dict = {}
-    for function in functions:
-        response = lambda_client.invoke(
-            FunctionName = function,
-            InvocationType = 'RequestResponse'
-        )
-        xray_trace_id = re.match(r'root=(.*);.*', response['ResponseMetadata']['HTTPHeaders']['x-amzn-trace-id']).groups()[0]
-        xray_trace_id_dict[function] = xray_trace_id
-    return xray_trace_id_dict
-
-def get_lambda_configs(functions):
-    lambda_configs_dict = {}
-    for function in functions:
-        response = lambda_client.get_function_configuration(
-            FunctionName=function
-        )
-        lambda_configs_dict[function] = response
-    return lambda_configs_dict
-
-def merge_timestamp_configs(lambda_configs_dict, timestamp_dict):
+    # failed invocations get their metrics line too
+    metrics.reset(event.get('Action') or 'Run')
+    try:
+        return dispatch(event)
+    finally:
+        metrics.emit()
+
+def dispatch(event):
+    # the caller state machine passes an Action, a plain scheduled event runs the whole matrix here
+    action = event.get('Action')
+    if action == 'Plan':
+        return plan_shards()
+    if action == 'Shard':
+        return run_shard(event)
+    if action == 'Finish':
+        return finish_shards(event)
+    if action == 'Load':
+        return run_load_test(event)
+
+    status = run_benchmark(target_functions(), datetime.datetime.now())
+    raise_on_failed_invocations(status["Failed"])
+
+def benchmark_providers():
+    # AWS Lambda, plus the function emulator when EMULATOR_ENDPOINT_URL is set, see providers.py
+    providers = [AwsProvider(lambda_client, lambda_invoke_client, xray_client, tagging_client, s3_client, os.environ['BACKUP_BUCKET_NAME'], config_cache)]
+    if EMULATOR_ENDPOINT_URL:
+        providers.append(EmulatorProvider(EMULATOR_ENDPOINT_URL, timeout=INVOKE_TIMEOUT_SECONDS))
+    return providers
+
+def plan_shards():
+    targets = target_functions()
+    with metrics.phase('ConfigFetch'):
+        for provider in benchmark_providers():
+            provider.refresh([target for target in targets if target.provider == provider.name])
+    run_timestamp = datetime.datetime.now().timestamp()
+    shard_count = max(1, -(-len(targets) // SHARD_SIZE))
+    return {
+        "RunTimestamp": run_timestamp,
+        "Shards": [{"Action": "Shard", "Index": index, "Count": shard_count, "RunTimestamp": run_timestamp} for index in range(shard_count)]
+    }
+
+def run_shard(event):
+    # every worker discovers the same sorted target list and takes every Count-th function,
+    # so slow runtimes are spread over all shards instead of landing in one
+    index = event["Index"]
+    targets = target_functions()[index::event["Count"]]
+    with metrics.phase('ConfigFetch'):
+        for provider in benchmark_providers():
+            provider.sync()
+    status = run_benchmark(targets, datetime.datetime.fromtimestamp(event["RunTimestamp"]),
+        "|" + str(index), "-shard-" + str(index))
+    status["Index"] = index
+    return status
+
+def finish_shards(event):
+    # Results holds one status per shard, or the error the Map state caught for a crashed shard
+    run_timestamp = datetime.datetime.fromtimestamp(event["RunTimestamp"])
+    status = {"Shards": len(event["Results"]), "Functions": 0, "Collected": 0, "Pending": 0, "Failed": 0, "FailedShards": {}}
+    # every provider gets a status, even when all of its shards crashed
+    provider_statuses = {provider.name: {"Functions": 0, "Collected": 0, "Pending": 0, "Failed": 0} for provider in benchmark_providers()}
+    failed_invocations = {}
+    for result in event["Results"]:
+        if "Error" in result:
+            status["FailedShards"][str(result["Index"])] = result["Error"].get("Error", "Unknown")
+            continue
+        for key in ("Functions", "Collected", "Pending"):
+            status[key] += result[key]
+        failed_invocations.update(result["Failed"])
+        for name, result_status in result["Providers"].items():
+            totals = provider_statuses.setdefault(name, {"Functions": 0, "Collected": 0, "Pending": 0, "Failed": 0})
+            for key in totals:
+                totals[key] += result_status[key]
+    status["Failed"] = len(failed_invocations)
+    for name, totals in provider_statuses.items():
+        store_run_status(name, dict(totals, Shards=status["Shards"], FailedShards=status["FailedShards"]), run_timestamp)
+
+    if status["FailedShards"]:
+        raise RuntimeError("Shard(s) failed: " + json.dumps(status["FailedShards"]))
+    raise_on_failed_invocations(failed_invocations)
+    return status
+
+def run_load_test(event):
+    # {"Action": "Load", "Partition": "AWS|python3.8|1024"} ramps concurrency against the
+    # partition's targets one after another, each starting without a warm environment.
+    # Only Lambda functions are load tested
+    partition = event["Partition"]
+    aws = benchmark_providers()[0]
+    with metrics.phase('Discover'):
+        targets = [target for target in aws.discover(os.environ['BENCHMARK_MATRIX']) if partition_suffix(target) == partition]
+    current_timestamp = datetime.datetime.now()
+    expiration_timestamp = current_timestamp + datetime.timedelta(days=LOAD_RETENTION_DAYS)
+    items = []
+    status = {"Partition": partition, "Functions": len(targets), "Steps": {}}
+    for index, target in enumerate(targets):
+        # a mitigated twin is ramped from whatever its alias keeps ready
+        forced = not target.mitigation and force_cold_start(lambda_client, target.function_arn, COLD_START_UPDATE_MAX_ATTEMPTS, COLD_START_UPDATE_TIMEOUT_SECONDS) is None
+        with metrics.phase('Load'):
+            steps = run_load(load_invoke_client, target.function_arn, LOAD_CONCURRENCY_STEPS, LOAD_STEP_SECONDS, request_payload(target.payload_kb))
+        with metrics.phase('ConfigFetch'):
+            configs = report_configs(aws.configs([target.function_arn], {target.function_arn: target})[target.function_arn])
+        metrics.count('LoadInvocations', sum(step.invocations for step in steps))
+        metrics.count('LoadThrottles', sum(step.throttles for step in steps))
+        metrics.count('LoadErrors', sum(step.errors for step in steps))
+        metrics.count('LoadColdStarts', sum(step.cold_starts for step in steps))
+        items.append(marshal({
+            "PK": LOAD_TYPE + '|' + configs_partition_suffix(configs),
+            "SK": current_timestamp.timestamp() + index * SAMPLE_SK_STEP,
+            "Type": LOAD_TYPE,
+            "Configs": configs,
+            # the first step may have found warm environments when the forced cold start failed
+            "ForcedCold": forced,
+            "Steps": [step.to_dict() for step in steps],
+            "TTL": expiration_timestamp.timestamp()
+        }))
+        # [concurrency, invocations, cold starts, throttles, errors] per step
+        status["Steps"][target.function_arn] = [[step.concurrency, step.invocations, step.cold_starts, step.throttles, step.errors] for step in steps]
+    with metrics.phase('DynamoDBWrite'):
+        batch_write_items(dynamodb_client, os.environ['TABLE_NAME'], items)
+    return status
+
+def raise_on_failed_invocations(failed_invocations):
+    # fail the run (and trigger the error alarm) only after the successful samples are stored
+    if failed_invocations:
+        raise RuntimeError("Failed to invoke " + str(len(failed_invocations)) + " function(s): " + json.dumps(failed_invocations))
+
+def run_benchmark(targets, current_timestamp, deferred_suffix="", s3_suffix=""):
+    # every provider samples its targets at the same time, so that their results are taken
+    # under the same conditions and compare fairly. Providers without targets still collect
+    # their deferred runs
+    anchor_clock()
+    providers = benchmark_providers()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(providers)) as executor:
+        futures = [
+            executor.submit(run_provider_benchmark, provider, [target for target in targets if target.provider == provider.name],
+                current_timestamp, DEFERRED_PK_PREFIX + provider.name + deferred_suffix, s3_suffix)
+            for provider in providers
+        ]
+        statuses = [future.result() for future in futures]
+    # Providers holds each provider's totals, with the number of failed invocations
+    status = {"Functions": 0, "Collected": 0, "Pending": 0, "Failed": {}, "Providers": {}}
+    for provider, provider_status in zip(providers, statuses):
+        for key in ("Functions", "Collected", "Pending"):
+            status[key] += provider_status[key]
+        status["Failed"].update(provider_status["Failed"])
+        status["Providers"][provider.name] = dict(provider_status, Failed=len(provider_status["Failed"]))
+    return status
+
+def run_provider_benchmark(provider, targets, current_timestamp, deferred_pk, s3_suffix=""):
+    functions = [target.function_arn for target in targets]
+    # one shared request body per payload size of the workload variants
+    payloads = {payload_kb: request_payload(payload_kb) for payload_kb in {target.payload_kb for target in targets}}
+    with metrics.phase(provider_phase(provider, 'Invoke')):
+        samples = provider.sample(
+            functions,
+            payloads={target.function_arn: payloads[target.payload_kb] for target in targets if target.payload_kb},
+            cold_samples=COLD_SAMPLES,
+            warm_samples=WARM_SAMPLES,
+            max_workers=INVOKE_PARALLELISM,
+            max_attempts=INVOKE_MAX_ATTEMPTS,
+            update_timeout=COLD_START_UPDATE_TIMEOUT_SECONDS,
+            update_attempts=COLD_START_UPDATE_MAX_ATTEMPTS,
+            unforced={target.function_arn for target in targets if target.mitigation})
+    # keyed by sample, see sampler.sample_key
+    invocation_dict = {}
+    failed_invocations = {}
+    for key, sample in samples.items():
+        if sample.result.succeeded:
+            invocation_dict[key] = {
+                "Function": sample.function,
+                "Sample": sample.index,
+                "ForcedCold": sample.forced,
+                "TraceId": sample.result.trace_id,
+                "ClientLatency": sample.result.latency,
+                "Sent": sample.result.sent,
+                "Received": sample.result.received,
+                "Attempts": sample.result.attempts
+            }
+        else:
+            failed_invocations[key] = sample.result.error
+
+    # traces that were still incomplete at the end of earlier runs
+    deferred_runs = load_deferred_runs(deferred_pk)
+
+    trace_ids = [invocation_dict[key]["TraceId"] for key in invocation_dict]
+    for deferred_timestamp, deferred_invocation_dict in deferred_runs:
+        trace_ids.extend(deferred_invocation_dict[key]["TraceId"] for key in deferred_invocation_dict)
+    with metrics.phase(provider_phase(provider, 'XRayWait')):
+        traces, _ = provider.collect(trace_ids, timeout=XRAY_WAIT_SECONDS, initial_delay=XRAY_INITIAL_DELAY_SECONDS)
+
+    collected_count = 0
+    pending_count = 0
+    dropped_count = 0
+    runs = [(current_timestamp, invocation_dict, None)] + \
+        [(deferred_timestamp, deferred_invocation_dict, deferred_timestamp) for deferred_timestamp, deferred_invocation_dict in deferred_runs]
+    for timestamp, run_invocation_dict, deferred_timestamp in runs:
+        collected = {key: run_invocation_dict[key] for key in run_invocation_dict if run_invocation_dict[key]["TraceId"] in traces}
+        pending = {key: run_invocation_dict[key] for key in run_invocation_dict if key not in collected}
+
+        if collected:
+            with metrics.phase(provider_phase(provider, 'ConfigFetch')):
+                lambda_configs_dict = provider.configs(sorted({collected[key]["Function"] for key in collected}), {target.function_arn: target for target in targets})
+            # samples of functions deleted since they were taken have no configuration to be stored with
+            dropped_count += len(collected)
+            collected = {key: collected[key] for key in collected if collected[key]["Function"] in lambda_configs_dict}
+            dropped_count -= len(collected)
+        collected_count += len(collected)
+
+        if collected:
+            timestamp_dict = get_timestamp_from_xray(collected, traces)
+            report_artifect_dict = merge_timestamp_configs(lambda_configs_dict, timestamp_dict, collected)
+
+            # report data to destinations
+            with metrics.phase(provider_phase(provider, 'DynamoDBWrite')):
+                store_data_to_dynamodb(report_artifect_dict, timestamp)
+            with metrics.phase(provider_phase(provider, 'AggregateWrite')):
+                store_data_to_aggregates(report_artifect_dict, timestamp)
+            with metrics.phase(provider_phase(provider, 'S3Write')):
+                store_data_to_s3(report_artifect_dict, timestamp, s3_suffix + ("" if deferred_timestamp is None else "-deferred-" + str(int(current_timestamp.timestamp()))))
+
+        # keep whatever is still incomplete for the next run
+        if pending:
+            pending_count += len(pending)
+            store_deferred_run(deferred_pk, timestamp, pending)
+        elif deferred_timestamp is not None:
+            delete_deferred_run(deferred_pk, deferred_timestamp)
+
+    metrics.count('Samples', len(samples))
+    metrics.count('Collected', collected_count)
+    metrics.count('Pending', pending_count)
+    metrics.count('Dropped', dropped_count)
+    metrics.count('FailedInvocations', len(failed_invocations))
+    return {"Functions": len(functions), "Collected": collected_count, "Pending": pending_count, "Failed": failed_invocations}
+
+def provider_phase(provider, phase):
+    # the provider threads of a run overlap, so each provider's phases are timed on their own.
+    # Lambda's keep the plain names the pipeline dashboard charts
+    return phase if provider.name == DEFAULT_PROVIDER else provider.name + phase
+
+def target_functions():
+    # every benchmark target of every provider, as benchmark_targets.BenchmarkTarget
+    with metrics.phase('Discover'):
+        return sorted((target for provider in benchmark_providers() for target in provider.discover(os.environ['BENCHMARK_MATRIX'])), key=target_order)
+
+def merge_timestamp_configs(lambda_configs_dict, timestamp_dict, invocation_dict):
     report_artifect_dict = {}
-    for function in timestamp_dict:
-        report_artifect_dict[function] = {
-            "Records": timestamp_dict[function],
-            "Configs": {
-                "FunctionArn": lambda_configs_dict[function]["FunctionArn"],
-                "Runtime": lambda_configs_dict[function]["Runtime"],
-                "CodeSize": lambda_configs_dict[function]["CodeSize"],
-                "MemorySize": lambda_configs_dict[function]["MemorySize"]
+    for key in timestamp_dict:
+        report_artifect_dict[key] = {
+            "Records": timestamp_dict[key],
+            "Configs": report_configs(lambda_configs_dict[invocation_dict[key]["Function"]]),
+            "Invocation": {
+                "ClientLatency": invocation_dict[key]["ClientLatency"],
+                "Attempts": invocation_dict[key]["Attempts"],
+                "Sample": invocation_dict[key]["Sample"],
+                "ForcedCold": invocation_dict[key]["ForcedCold"]
             }
         }
-    return report_artifect_dict 
-        
+    return report_artifect_dict
 
-def get_timestamp_from_xray(xray_trace_id_dict):
+def report_configs(lambda_configs):
+    # the Configs stored with every result, from a function configuration, see config_cache.py
+    configs = {
+        "FunctionArn": lambda_configs["FunctionArn"],
+        "Runtime": lambda_configs["Runtime"],
+        "CodeSize": lambda_configs["CodeSize"],
+        "MemorySize": lambda_configs["MemorySize"]
+    }
+    # left out for Lambda, as in every result stored before other providers
+    if lambda_configs.get("Provider", DEFAULT_PROVIDER) != DEFAULT_PROVIDER:
+        configs["Provider"] = lambda_configs["Provider"]
+    workload = workload_configs(lambda_configs)
+    if workload is not None:
+        configs["Workload"] = workload
+    mitigation = mitigation_configs(lambda_configs)
+    if mitigation is not None:
+        configs["Mitigation"] = mitigation
+    return configs
+
+def workload_configs(lambda_configs):
+    # dimensions of a workload variant from its environment, None for the hello-world functions
+    variables = lambda_configs.get("Environment", {}).get("Variables", {})
+    if WORKLOAD_VARIABLES["Name"] not in variables:
+        return None
+    workload = {"Name": variables[WORKLOAD_VARIABLES["Name"]]}
+    for key in ("PaddingMB", "InitImports", "PayloadKB"):
+        workload[key] = int(variables.get(WORKLOAD_VARIABLES[key], '0'))
+    return workload
+
+def mitigation_configs(lambda_configs):
+    # the cold start mitigation of a twin from its environment, None for every other function
+    variables = lambda_configs.get("Environment", {}).get("Variables", {})
+    if MITIGATION_VARIABLES["Name"] not in variables:
+        return None
+    return {
+        "Name": variables[MITIGATION_VARIABLES["Name"]],
+        "Type": variables[MITIGATION_VARIABLES["Type"]],
+        "ProvisionedConcurrency": int(variables.get(MITIGATION_VARIABLES["ProvisionedConcurrency"], '0'))
+    }
+
+
+def get_timestamp_from_xray(invocation_dict, traces):
     timestamp_dict = {}
-    for function in xray_trace_id_dict:
-        function_timestamp = {}
-        function_timestamp['AWS::X-Ray::Trace-id'] = xray_trace_id_dict[function]
-
-        xray_record = xray_client.batch_get_traces(
-            TraceIds=[xray_trace_id_dict[function]]
-        )
-        lambda_doc = json.loads([seg for seg in xray_record["Traces"][0]['Segments'] if '"AWS::Lambda"' in seg['Document']][0]['Document'])
-        function_timestamp['AWS::Lambda::start'] = lambda_doc["start_time"]
-        function_timestamp['AWS::Lambda::end'] = lambda_doc["end_time"]
-
-        lambda_function_doc = json.loads([seg for seg in xray_record["Traces"][0]['Segments'] if '"AWS::Lambda::Function"' in seg['Document']][0]['Document'])
-        function_timestamp['AWS::Lambda::Function::start'] = lambda_function_doc["start_time"]
-        function_timestamp['AWS::Lambda::Function::end'] = lambda_function_doc["end_time"]
-        if "subsegments" in lambda_function_doc:
-            for subsegment in lambda_function_doc["subsegments"]:
-                function_timestamp['AWS::Lambda::Function::' + subsegment['name'] + '::start'] = subsegment['start_time']
-                function_timestamp['AWS::Lambda::Function::' + subsegment['name'] + '::end'] = subsegment['end_time']
-        timestamp_dict[function] = function_timestamp
-    return timestamp_dict       
-
-def store_data_to_dynamodb(report_artifect_dict):
-    current_timestamp = datetime.datetime.now()
-    expiration_timestamp = current_timestamp + datetime.timedelta(days=60)
+    for key in invocation_dict:
+        timestamp_dict[key] = traces[invocation_dict[key]["TraceId"]].to_records()
+        # runs deferred before the caller kept its own timestamps have none
+        if invocation_dict[key].get("Sent") is not None:
+            timestamp_dict[key][CLIENT_START_LABEL] = invocation_dict[key]["Sent"]
+            timestamp_dict[key][CLIENT_END_LABEL] = invocation_dict[key]["Received"]
+    return timestamp_dict
+
+def store_data_to_dynamodb(report_artifect_dict, current_timestamp):
+    batch_write_items(dynamodb_client, os.environ['TABLE_NAME'], record_items(report_artifect_dict, current_timestamp), max_workers=DYNAMODB_WRITE_PARALLELISM)
+
+def store_data_to_aggregates(report_artifect_dict, current_timestamp):
+    # fold the records into the hourly rolling aggregates read by the summarizer
+    expiration_timestamp = current_timestamp + datetime.timedelta(days=AGGREGATE_RETENTION_DAYS)
+    sk = bucket_start(current_timestamp.timestamp())
+    # one read-modify-write per partition, however many functions share it
+    groups = {}
     for function in report_artifect_dict:
-        item = {
-            "PK": 'RECORD|AWS|' + report_artifect_dict[function]["Configs"]["Runtime"]+"|"+str(report_artifect_dict[function]["Configs"]["MemorySize"]),
-            "SK": current_timestamp.timestamp(),
-            "Type": "RECORD",
-            "Records": report_artifect_dict[function]["Records"],
-            "Configs": report_artifect_dict[function]["Configs"],
-            "TTL": expiration_timestamp.timestamp()
-        }
-        dynamodb_client.put_item(
-            TableName=os.environ['TABLE_NAME'],
-            Item=dict_to_item(item)
-        )
+        configs = report_artifect_dict[function]["Configs"]
+        pk = aggregate_pk(configs_partition_suffix(configs))
+        if pk not in groups:
+            groups[pk] = (pk, sk, configs, [])
+        groups[pk][3].append(report_artifect_dict[function]["Records"])
+    fold_records(dynamodb_client, os.environ['TABLE_NAME'], list(groups.values()), expiration_timestamp.timestamp(), max_workers=DYNAMODB_WRITE_PARALLELISM)
 
-def store_data_to_s3(report_artifect_dict):
-    current_timestamp = datetime.datetime.now()
-    key =   "AWS/" + \
-            str(current_timestamp.year) + "/"  + \
-            str(current_timestamp.month) + "/" + \
-            str(current_timestamp.day) + "/" + \
-            str(current_timestamp.hour) + "/" + \
-            str(current_timestamp.minute) + ".json"
-    s3_client.put_object(
-        Body=(bytes(json.dumps(report_artifect_dict).encode('UTF-8'))),
-        Bucket=os.environ['BACKUP_BUCKET_NAME'],
-        Key=key
-    )
+def store_data_to_s3(report_artifect_dict, current_timestamp, suffix=""):
+    # hourly Parquet files under archive/provider=/runtime=/memory=/dt=, see record_archive.py
+    write_report(s3_client, os.environ['BACKUP_BUCKET_NAME'], report_artifect_dict, current_timestamp, suffix, max_workers=S3_WRITE_PARALLELISM)
 
+def load_deferred_runs(deferred_pk):
+    deferred_runs = []
+    request = {
+        "TableName": os.environ['TABLE_NAME'],
+        "KeyConditionExpression": "#pk = :pk",
+        "ExpressionAttributeNames": {"#pk": "PK"},
+        "ExpressionAttributeValues": {":pk": {"S": deferred_pk}}
+    }
+    while True:
+        result = dynamodb_client.query(**request)
+        for item in result['Items']:
+            run_timestamp = datetime.datetime.fromtimestamp(float(item['SK']['N']))
+            # TTL deletes are lazy, skip runs that are already expired
+            if run_timestamp + DEFERRED_MAX_AGE < datetime.datetime.now():
+                continue
+            invocation_dict = json.loads(item['Deferred']['S'])
+            # runs deferred before samples existed are keyed by function
+            for key, invocation in invocation_dict.items():
+                invocation.setdefault("Function", key)
+                invocation.setdefault("Sample", 0)
+                invocation.setdefault("ForcedCold", False)
+            deferred_runs.append((run_timestamp, invocation_dict))
+        if 'LastEvaluatedKey' not in result:
+            break
+        request['ExclusiveStartKey'] = result['LastEvaluatedKey']
+    return deferred_runs
 
-def dict_to_item(raw):
-    if type(raw) is dict:
-        resp = {}
-        for k,v in raw.items():
-            if type(v) is str:
-                resp[k] = {
-                    'S': v
-                }
-            elif type(v) is int or type(v) is float:
-                resp[k] = {
-                    'N': str(v)
-                }
-            elif type(v) is dict:
-                resp[k] = {
-                    'M': dict_to_item(v)
-                }
-            elif type(v) is list:
-                resp[k] = []
-                for i in v:
-                    resp[k].append(dict_to_item(i))
-        return resp
-    elif type(raw) is str:
-        return {
-            'S': raw
+def store_deferred_run(deferred_pk, run_timestamp, invocation_dict):
+    expiration_timestamp = run_timestamp + DEFERRED_MAX_AGE
+    dynamodb_client.put_item(
+        TableName=os.environ['TABLE_NAME'],
+        Item={
+            "PK": {"S": deferred_pk},
+            "SK": {"N": str(run_timestamp.timestamp())},
+            "Type": {"S": "DEFERRED"},
+            "Deferred": {"S": json.dumps(invocation_dict)},
+            "TTL": {"N": str(expiration_timestamp.timestamp())}
         }
-    elif type(raw) is int or type(raw) is float:
-        return {
-            'N': str(raw)
-        }
\ No newline at end of file
+    )
+
+def delete_deferred_run(deferred_pk, run_timestamp):
+    dynamodb_client.delete_item(
+        TableName=os.environ['TABLE_NAME'],
+        Key={
+            "PK": {"S": deferred_pk},
+            "SK": {"N": str(run_timestamp.timestamp())}
+        }
+    )
+
+def store_run_status(provider_name, status, run_timestamp):
+    # completion status of a provider's part of a sharded run, one item per provider and run
+    expiration_timestamp = run_timestamp + datetime.timedelta(days=60)
+    item = dict(status, PK=RUN_STATUS_PK_PREFIX + provider_name, SK=run_timestamp.timestamp(), Type="RUN", TTL=expiration_timestamp.timestamp())
+    dynamodb_client.put_item(TableName=os.environ['TABLE_NAME'], Item=marshal(item))
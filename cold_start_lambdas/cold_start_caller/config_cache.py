@@ -0,0 +1,141 @@
+import json
+import time
+
+from botocore.exceptions import ClientError
+
+# the fields of a function configuration the caller reads, see ColdStartCaller.report_configs
+CACHED_FIELDS = ('FunctionArn', 'Runtime', 'CodeSize', 'MemorySize', 'CodeSha256', 'RevisionId')
+# of the environment only the variables of workload variants and mitigated twins, see
+# ColdStartCaller.WORKLOAD_VARIABLES and MITIGATION_VARIABLES. Anything else in a function's
+# environment stays out of the manifest
+CACHED_VARIABLE_PREFIXES = ('WORKLOAD_', 'MITIGATION_')
+# ListFunctions returns at most 50 functions per page
+LIST_PAGE_SIZE = 50
+# manifests of other versions are ignored, earlier ones held every function of the account
+MANIFEST_VERSION = 2
+
+
+class ConfigCache(object):
+    # configurations of the benchmark targets keyed by unqualified function ARN, filled in bulk
+    # by ListFunctions rather than one GetFunctionConfiguration per function. Kept in module
+    # scope, so a warm caller reuses it across runs, and persisted as a JSON manifest under key
+    # in the backup bucket, so cold callers and the shards of a run share one listing. Each
+    # entry keeps the CodeDigest tag of its target as discovered when it was listed. A listing
+    # older than ttl seconds, or one that predates a target's deployment, is made again
+    __slots__ = ('key', 'ttl', 'configs', 'missing', 'refreshed')
+
+    def __init__(self, key, ttl=21600.0):
+        self.key = key
+        self.ttl = ttl
+        self.configs = {}
+        # ARNs asked for but not in the listing, e.g. deleted functions
+        self.missing = set()
+        # epoch seconds of the listing the entries come from
+        self.refreshed = 0.0
+
+    def lookup(self, lambda_client, s3_client, bucket, functions, targets=None):
+        # {function: configuration} for plain or qualified function ARNs; FunctionArn is the
+        # ARN asked for, an alias shares the configuration of its function. A function that no
+        # longer exists is left out. targets is {function: benchmark_targets.BenchmarkTarget}
+        # as discovered by tag in this run
+        targets = targets or {}
+        if not self.covers(functions, targets):
+            self.load(s3_client, bucket)
+        if not self.covers(functions, targets):
+            self.refresh(lambda_client, s3_client, bucket, functions, targets)
+        result = {}
+        for function in functions:
+            arn = unqualified_arn(function)
+            config = self.configs.get(arn)
+            if config is None:
+                # marked missing by the listing, e.g. created since or deleted
+                target = targets.get(function)
+                try:
+                    config = entry(lambda_client.get_function_configuration(FunctionName=arn), target.code_digest if target is not None else '')
+                except ClientError as e:
+                    if e.response.get('Error', {}).get('Code') == 'ResourceNotFoundException':
+                        # deleted, it stays marked missing
+                        continue
+                    raise
+                self.configs[arn] = config
+                self.missing.discard(arn)
+            result[function] = dict(config, FunctionArn=function)
+        return result
+
+    def covers(self, functions, targets=None):
+        # the listing is recent and has every function, as deployed when its target was discovered
+        if time.time() - self.refreshed >= self.ttl:
+            return False
+        for function in functions:
+            arn = unqualified_arn(function)
+            if arn in self.missing:
+                continue
+            config = self.configs.get(arn)
+            if config is None:
+                return False
+            target = (targets or {}).get(function)
+            if target is not None and not deployed(config, target):
+                return False
+        return True
+
+    def refresh(self, lambda_client, s3_client, bucket, functions, targets=None):
+        # list the account's functions, keep those asked for and those held already, then
+        # persist the listing for other callers
+        targets = targets or {}
+        digests = {arn: config.get('CodeDigest', '') for arn, config in self.configs.items()}
+        digests.update((unqualified_arn(function), target.code_digest) for function, target in targets.items())
+        wanted = set(self.configs) | {unqualified_arn(function) for function in functions}
+        configs = {}
+        request = {'MaxItems': LIST_PAGE_SIZE}
+        while True:
+            response = lambda_client.list_functions(**request)
+            for function in response['Functions']:
+                if function['FunctionArn'] in wanted:
+                    configs[function['FunctionArn']] = entry(function, digests.get(function['FunctionArn'], ''))
+            if not response.get('NextMarker'):
+                break
+            request['Marker'] = response['NextMarker']
+        self.configs = configs
+        self.missing = wanted - set(configs)
+        self.refreshed = time.time()
+        manifest = {'Version': MANIFEST_VERSION, 'Refreshed': self.refreshed, 'Configs': configs, 'Missing': sorted(self.missing)}
+        s3_client.put_object(Body=json.dumps(manifest).encode('UTF-8'), Bucket=bucket, Key=self.key)
+
+    def load(self, s3_client, bucket):
+        # the persisted listing, when it is newer than the one held here
+        try:
+            manifest = json.loads(s3_client.get_object(Bucket=bucket, Key=self.key)['Body'].read())
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('NoSuchKey', '404'):
+                return
+            raise
+        if manifest.get('Version') == MANIFEST_VERSION and manifest['Refreshed'] > self.refreshed:
+            self.configs = manifest['Configs']
+            self.missing = set(manifest['Missing'])
+            self.refreshed = manifest['Refreshed']
+
+
+def trim(config):
+    trimmed = {field: config[field] for field in CACHED_FIELDS if field in config}
+    variables = {
+        name: value for name, value in config.get('Environment', {}).get('Variables', {}).items()
+        if name.startswith(CACHED_VARIABLE_PREFIXES)
+    }
+    if variables:
+        trimmed['Environment'] = {'Variables': variables}
+    return trimmed
+
+
+def entry(config, code_digest):
+    # a cache entry of a function configuration, with the code digest its target was discovered with
+    return dict(trim(config), CodeDigest=code_digest)
+
+
+def deployed(config, target):
+    # the entry was listed from the deployment the target was discovered in
+    return config['MemorySize'] == target.memory_size and config.get('CodeDigest', '') == target.code_digest
+
+
+def unqualified_arn(function):
+    # arn:aws:lambda:<region>:<account>:function:<name>[:<qualifier>]
+    return ':'.join(function.split(':')[:7])
@@ -0,0 +1,121 @@
+import re
+import time
+
+from botocore.exceptions import ClientError, ConnectionError, ReadTimeoutError
+
+from backoff import backoff_delay
+
+# error codes returned by lambda:Invoke that are worth another attempt
+RETRYABLE_ERROR_CODES = {
+    'TooManyRequestsException',
+    'ThrottlingException',
+    'ServiceException',
+    'EC2ThrottledException',
+    'ResourceNotReadyException',
+}
+
+TRACE_ID_PATTERN = re.compile(r'root=([^;]*)', re.IGNORECASE)
+
+# perf_counter_ns is monotonic and high resolution but has no epoch. One reading of both
+# clocks turns it into epoch time comparable with X-Ray's; re-anchored once per run, so a
+# long-lived execution environment does not drift away from the wall clock.
+clock_anchor_ns = time.time_ns() - time.perf_counter_ns()
+
+
+def anchor_clock():
+    global clock_anchor_ns
+    clock_anchor_ns = time.time_ns() - time.perf_counter_ns()
+
+
+def wall_clock(perf_ns):
+    # epoch seconds of a perf_counter_ns reading
+    return (clock_anchor_ns + perf_ns) / 1e9
+
+
+class InvocationResult(object):
+    __slots__ = ('function', 'trace_id', 'latency', 'sent', 'received', 'attempts', 'status_code', 'function_error', 'error')
+
+    def __init__(self, function):
+        self.function = function
+        self.trace_id = None
+        # client-side latency in seconds of the last attempt
+        self.latency = None
+        # epoch seconds just before the last attempt's request went out and once its response was read
+        self.sent = None
+        self.received = None
+        self.attempts = 0
+        self.status_code = None
+        self.function_error = None
+        self.error = None
+
+    @property
+    def succeeded(self):
+        return self.trace_id is not None and self.error is None
+
+
+def invoke_with_retry(lambda_client, function, max_attempts=3, base_delay=0.2, max_delay=5.0, payload=None):
+    request = {
+        'FunctionName': function,
+        'InvocationType': 'RequestResponse'
+    }
+    if payload is not None:
+        request['Payload'] = payload
+    return retry_invocation(lambda result: invoke_once(lambda_client, request, result), function, max_attempts, base_delay, max_delay)
+
+
+def retry_invocation(attempt, function, max_attempts=3, base_delay=0.2, max_delay=5.0):
+    # the retry loop of every provider: attempt(result) makes one timed attempt, fills in
+    # result and returns True when a failed attempt is worth another one
+    result = InvocationResult(function)
+    for attempt_number in range(1, max_attempts + 1):
+        result.attempts = attempt_number
+        result.error = None
+        if not attempt(result):
+            return result
+        if attempt_number < max_attempts:
+            time.sleep(backoff_delay(attempt_number, base_delay, max_delay))
+    return result
+
+
+def invoke_once(lambda_client, request, result):
+    start = time.perf_counter_ns()
+    try:
+        response = lambda_client.invoke(**request)
+        # drain the payload so the connection goes back to the pool, the response
+        # transfer counts towards the client-observed latency
+        if 'Payload' in response:
+            response['Payload'].read()
+    except ClientError as e:
+        set_timing(result, start, time.perf_counter_ns())
+        result.error = e.response.get('Error', {}).get('Code', 'ClientError')
+        return result.error in RETRYABLE_ERROR_CODES
+    except (ReadTimeoutError, ConnectionError) as e:
+        set_timing(result, start, time.perf_counter_ns())
+        result.error = type(e).__name__
+        return True
+    set_timing(result, start, time.perf_counter_ns())
+    result.status_code = response.get('StatusCode')
+    result.function_error = response.get('FunctionError')
+    result.trace_id = extract_trace_id(response)
+    if result.function_error is not None:
+        # the function failed (FunctionUnhandled, FunctionHandled), its timing is no sample
+        result.error = 'Function' + result.function_error
+    elif result.trace_id is None:
+        result.error = 'MissingTraceId'
+    return False
+
+
+def set_timing(result, start_ns, end_ns):
+    result.latency = (end_ns - start_ns) / 1e9
+    result.sent = wall_clock(start_ns)
+    result.received = wall_clock(end_ns)
+
+
+def extract_trace_id(response):
+    header = response['ResponseMetadata']['HTTPHeaders'].get('x-amzn-trace-id')
+    if header is None:
+        return None
+    match = TRACE_ID_PATTERN.search(header)
+    if match is None:
+        return None
+    return match.groups()[0]
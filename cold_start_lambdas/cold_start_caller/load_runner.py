@@ -0,0 +1,100 @@
+import base64
+import concurrent.futures
+import re
+import time
+
+from botocore.exceptions import ClientError, ConnectionError, ReadTimeoutError
+
+from backoff import backoff_delay
+from load_stats import LoadStep
+
+# Lambda ends every invocation's log with a REPORT line; Init Duration, or Restore Duration
+# for SnapStart, is only there when the invocation brought up a new execution environment
+DURATION_PATTERN = re.compile(r'\tDuration: ([0-9.]+) ms')
+INIT_DURATION_PATTERN = re.compile(r'(?:Init|\tRestore) Duration: ([0-9.]+) ms')
+
+# error codes returned by lambda:Invoke when the function or the account is out of concurrency
+THROTTLE_ERROR_CODES = {
+    'TooManyRequestsException',
+    'ThrottlingException',
+}
+
+
+def run_load(invoke_client, function, steps, step_seconds, payload=None):
+    # one LoadStep per concurrency in steps, in order, each keeping that many invocations
+    # of function in flight for step_seconds. invoke_client needs a connection pool of at
+    # least max(steps).
+    return [run_step(invoke_client, function, concurrency, step_seconds, payload) for concurrency in steps]
+
+
+def run_step(invoke_client, function, concurrency, step_seconds, payload=None):
+    request = {
+        'FunctionName': function,
+        'InvocationType': 'RequestResponse',
+        'LogType': 'Tail'
+    }
+    if payload is not None:
+        request['Payload'] = payload
+    start = time.perf_counter()
+    deadline = start + step_seconds
+    step = LoadStep(concurrency)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+        workers = [executor.submit(load_worker, invoke_client, request, concurrency, deadline) for _ in range(concurrency)]
+        # every worker keeps its own counts, no locking on the hot path
+        for worker in workers:
+            step.merge(worker.result())
+    step.seconds = time.perf_counter() - start
+    return step
+
+
+def load_worker(invoke_client, request, concurrency, deadline, base_delay=0.05, max_delay=1.0):
+    # invoke back to back until the deadline, backing off only after throttles and errors
+    step = LoadStep(concurrency)
+    failures = 0
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            response = invoke_client.invoke(**request)
+            # the response transfer counts towards the latency
+            if 'Payload' in response:
+                response['Payload'].read()
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in THROTTLE_ERROR_CODES:
+                step.throttles += 1
+            else:
+                step.errors += 1
+            failures += 1
+            time.sleep(backoff_delay(failures, base_delay, max_delay))
+            continue
+        except (ReadTimeoutError, ConnectionError):
+            step.errors += 1
+            failures += 1
+            time.sleep(backoff_delay(failures, base_delay, max_delay))
+            continue
+        latency = time.perf_counter() - start
+        failures = 0
+        if response.get('FunctionError'):
+            step.errors += 1
+            continue
+        step.invocations += 1
+        step.latency.add(latency)
+        report = report_line(response)
+        duration = DURATION_PATTERN.search(report)
+        if duration is not None:
+            step.duration.add(float(duration.group(1)) / 1000)
+        init_duration = INIT_DURATION_PATTERN.search(report)
+        if init_duration is not None:
+            step.cold_starts += 1
+            step.init_duration.add(float(init_duration.group(1)) / 1000)
+    return step
+
+
+def report_line(response):
+    # the REPORT line of the base64 log tail returned with LogType=Tail, '' when there is none
+    if 'LogResult' not in response:
+        return ''
+    log = base64.b64decode(response['LogResult']).decode('UTF-8', 'replace')
+    for line in reversed(log.splitlines()):
+        if line.startswith('REPORT'):
+            return line
+    return ''
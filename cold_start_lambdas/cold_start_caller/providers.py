@@ -0,0 +1,176 @@
+import json
+import socket
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from benchmark_targets import DEFAULT_PROVIDER, EMULATOR_PROVIDER, discover_emulator_targets, discover_targets
+from invoker import invoke_with_retry, retry_invocation, set_timing
+from sampler import UPDATE_MAX_ATTEMPTS, force_cold_start, sample_functions
+from trace_parser import TraceTimings
+from xray_collector import collect_traces
+
+# A provider adapter runs the provider-specific steps of a caller run for the targets of one
+# provider (BenchmarkTarget.provider == name):
+#   discover(matrix_name)  -> [BenchmarkTarget]
+#   sample(functions, ...) -> {sample_key: sampler.Sample}, each result carrying a trace id, from
+#                          sampler.sample_functions over the provider's invoke and force_cold_start
+#   collect(trace_ids, ...) -> ({trace_id: timings with to_records()}, trace ids still incomplete)
+#   configs(functions, targets) -> {function: configuration with FunctionArn, Runtime, CodeSize, MemorySize},
+#                          targets is {function: BenchmarkTarget} of the functions discovered in this run;
+#                          functions the provider no longer has are left out
+#   refresh(targets) once per sharded run before the shards start, sync() in every shard
+# Records use the labels of Lambda's X-Ray segments whichever provider they come from, see
+# record_columns.py, so every provider's results are summarized the same way.
+
+# the emulator answers a batch of trace ids per request
+EMULATOR_TRACES_PER_REQUEST = 100
+# emulator responses worth another attempt, like Lambda's throttling and service errors
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class AwsProvider(object):
+    # Lambda functions invoked with lambda:Invoke, timed by X-Ray active tracing, with their
+    # configurations from a config_cache.ConfigCache
+    __slots__ = ('lambda_client', 'invoke_client', 'xray_client', 'tagging_client', 's3_client', 'bucket', 'config_cache')
+
+    name = DEFAULT_PROVIDER
+
+    def __init__(self, lambda_client, invoke_client, xray_client, tagging_client, s3_client, bucket, config_cache):
+        self.lambda_client = lambda_client
+        self.invoke_client = invoke_client
+        self.xray_client = xray_client
+        self.tagging_client = tagging_client
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.config_cache = config_cache
+
+    def discover(self, matrix_name):
+        return discover_targets(self.tagging_client, matrix_name)
+
+    def sample(self, functions, cold_samples=0, warm_samples=1, max_workers=32, max_attempts=3, update_timeout=60.0, payloads=None, unforced=(),
+               update_attempts=UPDATE_MAX_ATTEMPTS):
+        return sample_functions(
+            lambda function, payload: invoke_with_retry(self.invoke_client, function, max_attempts, payload=payload),
+            lambda function: force_cold_start(self.lambda_client, function, update_attempts, update_timeout),
+            functions,
+            cold_samples=cold_samples,
+            warm_samples=warm_samples,
+            max_workers=max_workers,
+            payloads=payloads,
+            unforced=unforced)
+
+    def collect(self, trace_ids, timeout=60, initial_delay=1.0):
+        return collect_traces(self.xray_client, trace_ids, timeout=timeout, initial_delay=initial_delay)
+
+    def configs(self, functions, targets=None):
+        return self.config_cache.lookup(self.lambda_client, self.s3_client, self.bucket, functions, targets)
+
+    def refresh(self, targets):
+        # list the configurations once for all shards, so deployments since the last run show up
+        self.config_cache.refresh(self.lambda_client, self.s3_client, self.bucket,
+                                  [target.function_arn for target in targets], {target.function_arn: target for target in targets})
+
+    def sync(self):
+        # a warm worker picks up the listing the Plan step just made
+        self.config_cache.load(self.s3_client, self.bucket)
+
+
+class EmulatorProvider(object):
+    # functions hosted by a function emulator over plain HTTP, see tools/function_emulator.py.
+    # The emulator keeps execution environments warm between invocations like a provider
+    # would, and times every invocation's phases itself, so its traces are complete as soon
+    # as the invocation returns.
+    __slots__ = ('endpoint_url', 'timeout')
+
+    name = EMULATOR_PROVIDER
+
+    def __init__(self, endpoint_url, timeout=30):
+        self.endpoint_url = endpoint_url.rstrip('/')
+        self.timeout = timeout
+
+    def discover(self, matrix_name):
+        return discover_emulator_targets(self.endpoint_url, matrix_name, self.timeout)
+
+    def sample(self, functions, cold_samples=0, warm_samples=1, max_workers=32, max_attempts=3, update_timeout=60.0, payloads=None, unforced=(),
+               update_attempts=UPDATE_MAX_ATTEMPTS):
+        return sample_functions(
+            lambda function, payload: retry_invocation(lambda result: self.invoke_once(function, payload, result), function, max_attempts),
+            self.force_cold_start,
+            functions,
+            cold_samples=cold_samples,
+            warm_samples=warm_samples,
+            max_workers=max_workers,
+            payloads=payloads,
+            unforced=unforced)
+
+    def force_cold_start(self, function):
+        # retire the function's idle environments; returns None on success, otherwise an error code
+        try:
+            self.request('POST', '/functions/' + function_name(function) + '/recycle')
+        except urllib.error.HTTPError as e:
+            return 'HTTP' + str(e.code)
+        except (urllib.error.URLError, socket.timeout, ConnectionError) as e:
+            return type(e).__name__
+        return None
+
+    def invoke_once(self, function, payload, result):
+        # one attempt for invoker.retry_invocation, True when it is worth another one
+        start = time.perf_counter_ns()
+        try:
+            with self.open('POST', '/functions/' + function_name(function) + '/invocations', payload) as response:
+                response.read()
+                set_timing(result, start, time.perf_counter_ns())
+                result.status_code = response.status
+                result.trace_id = response.headers.get('X-Emulator-Trace-Id')
+        except urllib.error.HTTPError as e:
+            set_timing(result, start, time.perf_counter_ns())
+            result.error = 'HTTP' + str(e.code)
+            return e.code in RETRYABLE_STATUS_CODES
+        except (urllib.error.URLError, socket.timeout, ConnectionError) as e:
+            # unreachable, timed out, or the connection dropped before the response (RemoteDisconnected)
+            set_timing(result, start, time.perf_counter_ns())
+            result.error = type(e).__name__
+            return True
+        if result.trace_id is None:
+            result.error = 'MissingTraceId'
+        return False
+
+    def collect(self, trace_ids, timeout=60, initial_delay=1.0):
+        # one pass, the emulator stores a trace before the invocation returns
+        complete = {}
+        trace_ids = sorted(trace_ids)
+        for i in range(0, len(trace_ids), EMULATOR_TRACES_PER_REQUEST):
+            body = json.dumps({'TraceIds': trace_ids[i:i + EMULATOR_TRACES_PER_REQUEST]}).encode('UTF-8')
+            for trace in self.request('POST', '/traces', body)['Traces']:
+                complete[trace['Id']] = TraceTimings(
+                    trace['Id'], trace['Start'], trace['End'], trace['FunctionStart'], trace['FunctionEnd'],
+                    tuple((name, start, end) for name, start, end in trace['Phases']))
+        return complete, set(trace_ids) - set(complete)
+
+    def configs(self, functions, targets=None):
+        # functions the emulator no longer hosts, e.g. of deferred runs from before a restart, are left out
+        listed = {function['FunctionArn']: function for function in self.request('GET', '/functions')['Functions']}
+        return {function: dict(listed[function], Provider=self.name) for function in functions if function in listed}
+
+    def refresh(self, targets):
+        pass
+
+    def sync(self):
+        pass
+
+    def request(self, method, path, body=None):
+        with self.open(method, path, body) as response:
+            return json.loads(response.read() or b'{}')
+
+    def open(self, method, path, body=None):
+        request = urllib.request.Request(self.endpoint_url + path, data=body, method=method)
+        if body is not None:
+            request.add_header('Content-Type', 'application/json')
+        return urllib.request.urlopen(request, timeout=self.timeout)
+
+
+def function_name(function):
+    # the last part of an emulator function ARN, arn:emulator:function:<name>
+    return urllib.parse.quote(function.rsplit(':', 1)[-1])
@@ -0,0 +1,124 @@
+import concurrent.futures
+import time
+import uuid
+
+from botocore.exceptions import ClientError
+
+from backoff import backoff_delay
+from invoker import InvocationResult
+
+# changing this variable makes Lambda start a fresh execution environment on the next invoke
+COLD_START_NONCE_VARIABLE = 'COLD_START_NONCE'
+
+# attempts at lambda:UpdateFunctionConfiguration and the longest wait between two. The
+# control plane throttles far sooner than Invoke, and a forced cold start that gives up
+# costs a failed sample, so updates get a budget of their own, larger than the invokes'
+UPDATE_MAX_ATTEMPTS = 8
+UPDATE_MAX_DELAY = 20.0
+
+# error codes returned by lambda:UpdateFunctionConfiguration that are worth another attempt,
+# ResourceConflictException means the previous update is still in progress
+RETRYABLE_UPDATE_ERROR_CODES = {
+    'ResourceConflictException',
+    'TooManyRequestsException',
+    'ThrottlingException',
+    'ServiceException',
+}
+
+
+class Sample(object):
+    __slots__ = ('function', 'index', 'forced', 'result')
+
+    def __init__(self, function, index, forced, result):
+        self.function = function
+        # position of the sample in the function's sequence, cold samples come first
+        self.index = index
+        # a fresh execution environment was forced before the invocation
+        self.forced = forced
+        self.result = result
+
+
+def sample_key(function, index):
+    # the first sample keeps the plain function name, as runs without extra samples always did
+    return function if index == 0 else function + '#' + str(index)
+
+
+def sample_functions(invoke, force_cold_start, functions, cold_samples=0, warm_samples=1, max_workers=32, payloads=None, unforced=()):
+    # per function: cold_samples invocations each preceded by a forced cold start, then
+    # warm_samples invocations of the environment the last one left behind. Functions run
+    # in parallel, the samples of one function strictly in order so they share environments.
+    # The provider supplies the two primitives, see providers.py: invoke(function, payload)
+    # returns an InvocationResult, retries included, and force_cold_start(function) returns
+    # None on success, otherwise an error code.
+    # payloads is {function: request body} for the functions that take one. The functions in
+    # unforced take their cold samples without forcing anything: published versions cannot
+    # be updated, and what their first invocation finds is what a mitigation is measured by.
+    # returns {sample_key: Sample}
+    samples = {}
+    if not functions:
+        return samples
+    workers = max(1, min(max_workers, len(functions)))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(sample_function, invoke, force_cold_start, function, cold_samples, warm_samples,
+                            (payloads or {}).get(function), function not in unforced)
+            for function in functions
+        ]
+        for future in concurrent.futures.as_completed(futures):
+            for sample in future.result():
+                samples[sample_key(sample.function, sample.index)] = sample
+    return samples
+
+
+def sample_function(invoke, force_cold_start, function, cold_samples, warm_samples, payload=None, force=True):
+    samples = []
+    for index in range(cold_samples + warm_samples):
+        forced = force and index < cold_samples
+        if forced:
+            error = force_cold_start(function)
+            if error is not None:
+                # skip the invocation, it would not be a cold start
+                result = InvocationResult(function)
+                result.error = error
+                samples.append(Sample(function, index, forced, result))
+                continue
+        samples.append(Sample(function, index, forced, invoke(function, payload)))
+    return samples
+
+
+def force_cold_start(lambda_client, function, max_attempts=UPDATE_MAX_ATTEMPTS, update_timeout=60.0, poll_interval=0.5, base_delay=0.5, max_delay=UPDATE_MAX_DELAY):
+    # set a new nonce in the function's environment and wait until the update is live.
+    # returns None on success, otherwise an error code
+    try:
+        variables = lambda_client.get_function_configuration(FunctionName=function).get('Environment', {}).get('Variables', {})
+    except ClientError as e:
+        return e.response.get('Error', {}).get('Code', 'ClientError')
+    variables = dict(variables)
+    variables[COLD_START_NONCE_VARIABLE] = uuid.uuid4().hex
+    for attempt in range(1, max_attempts + 1):
+        try:
+            lambda_client.update_function_configuration(FunctionName=function, Environment={'Variables': variables})
+            break
+        except ClientError as e:
+            code = e.response.get('Error', {}).get('Code', 'ClientError')
+            if code not in RETRYABLE_UPDATE_ERROR_CODES or attempt == max_attempts:
+                return code
+        time.sleep(backoff_delay(attempt, base_delay, max_delay))
+    return wait_for_update(lambda_client, function, update_timeout, poll_interval)
+
+
+def wait_for_update(lambda_client, function, timeout=60.0, poll_interval=0.5):
+    # invocations only reach the new configuration once LastUpdateStatus is Successful
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            status = lambda_client.get_function_configuration(FunctionName=function).get('LastUpdateStatus', 'Successful')
+        except ClientError as e:
+            return e.response.get('Error', {}).get('Code', 'ClientError')
+        if status == 'Successful':
+            return None
+        if status == 'Failed':
+            return 'UpdateFailed'
+        if time.monotonic() + poll_interval > deadline:
+            return 'UpdateTimeout'
+        time.sleep(poll_interval)
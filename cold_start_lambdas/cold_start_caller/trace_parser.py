@@ -0,0 +1,95 @@
+import json
+
+try:
+    # optional, decodes segment documents several times faster when it is available
+    import orjson
+    loads = orjson.loads
+except ImportError:
+    loads = json.loads
+
+LAMBDA_ORIGIN = 'AWS::Lambda'
+FUNCTION_ORIGIN = 'AWS::Lambda::Function'
+
+# subsegments that only show up when a new execution environment was prepared
+COLD_PHASES = ('Initialization', 'Restore')
+
+# classify a segment from its raw document before deciding to decode it
+LAMBDA_MARKER = '"' + LAMBDA_ORIGIN + '"'
+FUNCTION_MARKER = '"' + FUNCTION_ORIGIN + '"'
+
+
+class TraceTimings(object):
+    # timestamps of one Lambda invocation trace, in epoch seconds
+    __slots__ = ('trace_id', 'lambda_start', 'lambda_end', 'function_start', 'function_end', 'phases')
+
+    def __init__(self, trace_id, lambda_start, lambda_end, function_start, function_end, phases):
+        self.trace_id = trace_id
+        self.lambda_start = lambda_start
+        self.lambda_end = lambda_end
+        self.function_start = function_start
+        self.function_end = function_end
+        # tuple of (name, start, end) for each subsegment of the function segment, in trace order
+        self.phases = phases
+
+    def phase(self, name):
+        for phase_name, start, end in self.phases:
+            if phase_name == name:
+                return start, end
+        return None
+
+    @property
+    def is_cold(self):
+        for phase_name, _, _ in self.phases:
+            if phase_name in COLD_PHASES:
+                return True
+        return False
+
+    def to_records(self):
+        # flat layout stored as "Records" in DynamoDB and S3
+        records = {
+            'AWS::X-Ray::Trace-id': self.trace_id,
+            'AWS::Lambda::start': self.lambda_start,
+            'AWS::Lambda::end': self.lambda_end,
+            'AWS::Lambda::Function::start': self.function_start,
+            'AWS::Lambda::Function::end': self.function_end
+        }
+        for name, start, end in self.phases:
+            records['AWS::Lambda::Function::' + name + '::start'] = start
+            records['AWS::Lambda::Function::' + name + '::end'] = end
+        return records
+
+
+def parse_trace(trace_id, segments):
+    # single pass over the segments; returns None while either Lambda segment is missing or in progress
+    lambda_doc = None
+    function_doc = None
+    for segment in segments:
+        raw = segment['Document']
+        if FUNCTION_MARKER in raw:
+            document = loads(raw)
+            if document.get('origin') == FUNCTION_ORIGIN:
+                function_doc = document
+        elif LAMBDA_MARKER in raw:
+            document = loads(raw)
+            if document.get('origin') == LAMBDA_ORIGIN:
+                lambda_doc = document
+    if not is_finished(lambda_doc) or not is_finished(function_doc):
+        return None
+
+    phases = []
+    for subsegment in function_doc.get('subsegments', ()):
+        if 'end_time' not in subsegment:
+            return None
+        phases.append((subsegment['name'], subsegment['start_time'], subsegment['end_time']))
+
+    return TraceTimings(
+        trace_id,
+        lambda_doc['start_time'],
+        lambda_doc['end_time'],
+        function_doc['start_time'],
+        function_doc['end_time'],
+        tuple(phases))
+
+
+def is_finished(document):
+    return document is not None and 'end_time' in document and not document.get('in_progress')
@@ -0,0 +1,41 @@
+import time
+
+from trace_parser import parse_trace
+
+# batch_get_traces accepts at most 5 trace ids per request
+MAX_TRACE_IDS_PER_REQUEST = 5
+
+
+def collect_traces(xray_client, trace_ids, timeout=60, initial_delay=1.0, max_delay=8.0, backoff=2.0):
+    # poll X-Ray until every trace has all of its Lambda segments or the deadline passes.
+    # returns ({trace_id: TraceTimings}, set of trace ids that are still incomplete)
+    pending = set(trace_ids)
+    complete = {}
+    deadline = time.monotonic() + timeout
+    delay = initial_delay
+    while pending:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        time.sleep(min(delay, remaining))
+        delay = min(delay * backoff, max_delay)
+        for trace in batch_get_traces(xray_client, sorted(pending)):
+            timings = parse_trace(trace['Id'], trace['Segments'])
+            if timings is not None:
+                complete[trace['Id']] = timings
+                pending.discard(trace['Id'])
+    return complete, pending
+
+
+def batch_get_traces(xray_client, trace_ids):
+    traces = []
+    for i in range(0, len(trace_ids), MAX_TRACE_IDS_PER_REQUEST):
+        request = {'TraceIds': trace_ids[i:i + MAX_TRACE_IDS_PER_REQUEST]}
+        while True:
+            response = xray_client.batch_get_traces(**request)
+            traces.extend(response.get('Traces', []))
+            if not response.get('NextToken'):
+                break
+            request['NextToken'] = response['NextToken']
+    return traces
+
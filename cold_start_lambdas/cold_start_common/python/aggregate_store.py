@@ -0,0 +1,92 @@
+import concurrent.futures
+import time
+
+from botocore.exceptions import ClientError
+
+from backoff import backoff_delay
+from dynamodb_codec import marshal, unmarshal
+from record_columns import TRACE_ID_LABEL
+from running_stats import PartitionAggregate
+
+AGGREGATE_TYPE = 'AGGREGATE'
+# one aggregate item per partition per hour
+BUCKET_SECONDS = 3600
+
+
+class AggregateConflictError(Exception):
+    def __init__(self, table_name, key):
+        super().__init__("Aggregate " + key['PK'] + " " + str(key['SK']) + " in " + table_name + " kept changing under concurrent updates")
+        self.table_name = table_name
+        self.key = key
+
+
+def aggregate_pk(partition):
+    # partition is benchmark_targets.partition_suffix
+    return AGGREGATE_TYPE + '|' + partition
+
+
+def bucket_start(timestamp):
+    return int(timestamp // BUCKET_SECONDS * BUCKET_SECONDS)
+
+
+def fold_records(dynamodb_client, table_name, groups, expiration_timestamp, max_workers=1, max_attempts=8, base_delay=0.05, max_delay=2.0):
+    # groups is [(pk, bucket sk, configs, [Records maps])]; returns the number of aggregates changed.
+    # Records whose trace id was already folded into the aggregate are skipped, so re-running is safe.
+    if not groups:
+        return 0
+    args = (dynamodb_client, table_name, expiration_timestamp, max_attempts, base_delay, max_delay)
+    if max_workers <= 1 or len(groups) == 1:
+        return sum(fold_group(*(args + (group,))) for group in groups)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(max_workers, len(groups))) as executor:
+        futures = [executor.submit(fold_group, *(args + (group,))) for group in groups]
+        return sum(future.result() for future in futures)
+
+
+def fold_group(dynamodb_client, table_name, expiration_timestamp, max_attempts, base_delay, max_delay, group):
+    pk, sk, configs, records_list = group
+    key = {'PK': pk, 'SK': sk}
+    for attempt in range(1, max_attempts + 1):
+        response = dynamodb_client.get_item(TableName=table_name, Key=marshal(key), ConsistentRead=True)
+        if 'Item' in response:
+            item = unmarshal(response['Item'])
+            aggregate = PartitionAggregate.from_dict(item)
+            trace_ids = item.get('TraceIds', set())
+            version = item['Version']
+        else:
+            aggregate = PartitionAggregate()
+            trace_ids = set()
+            version = 0
+        new_records = [records for records in records_list if records[TRACE_ID_LABEL] not in trace_ids]
+        if not new_records:
+            return 0
+        for records in new_records:
+            aggregate.add_records(records)
+            trace_ids.add(records[TRACE_ID_LABEL])
+        item = dict(key, Type=AGGREGATE_TYPE, Configs=configs, TraceIds=trace_ids,
+                    Version=version + 1, TTL=expiration_timestamp, **aggregate.to_dict())
+        # optimistic locking, concurrent caller runs may fold into the same hour
+        if version == 0:
+            condition = {'ConditionExpression': 'attribute_not_exists(PK)'}
+        else:
+            condition = {
+                'ConditionExpression': '#version = :version',
+                'ExpressionAttributeNames': {'#version': 'Version'},
+                'ExpressionAttributeValues': {':version': {'N': str(version)}}
+            }
+        try:
+            dynamodb_client.put_item(TableName=table_name, Item=marshal(item), **condition)
+            return 1
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') != 'ConditionalCheckFailedException':
+                raise
+        if attempt < max_attempts:
+            time.sleep(backoff_delay(attempt, base_delay, max_delay))
+    raise AggregateConflictError(table_name, key)
+
+
+def merge_aggregates(items):
+    # merge unmarshalled AGGREGATE items into one PartitionAggregate
+    merged = PartitionAggregate()
+    for item in items:
+        merged.merge(PartitionAggregate.from_dict(item))
+    return merged
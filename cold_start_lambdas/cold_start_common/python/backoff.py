@@ -0,0 +1,7 @@
+import random
+
+
+def backoff_delay(attempt, base_delay, max_delay):
+    # seconds to wait after failed attempt 1, 2, ...: exponential backoff with full jitter,
+    # shared by every retry loop of the caller and the summarizer
+    return random.uniform(0, min(max_delay, base_delay * (2 ** (attempt - 1))))
@@ -0,0 +1,105 @@
+import collections
+import json
+import urllib.request
+
+# set on every target by cold_start_benchmark/benchmark_matrix.py, keep the two in sync
+MATRIX_TAG = 'cold-start-benchmark:matrix'
+PROVIDER_TAG = 'cold-start-benchmark:provider'
+RUNTIME_TAG = 'cold-start-benchmark:runtime'
+MEMORY_SIZE_TAG = 'cold-start-benchmark:memory-size'
+# digest of the deployed code, '' on targets deployed before it was tagged
+CODE_DIGEST_TAG = 'cold-start-benchmark:code-digest'
+# only on the workload variants, the plain hello-world targets have neither
+WORKLOAD_TAG = 'cold-start-benchmark:workload'
+PAYLOAD_KB_TAG = 'cold-start-benchmark:payload-kb'
+# only on the mitigated twins, function_arn is then qualified with the alias of the qualifier tag
+MITIGATION_TAG = 'cold-start-benchmark:mitigation'
+QUALIFIER_TAG = 'cold-start-benchmark:qualifier'
+
+# results whose Configs name no Provider come from AWS Lambda, which every older result does
+DEFAULT_PROVIDER = 'AWS'
+# the provider of the functions hosted by tools/function_emulator.py
+EMULATOR_PROVIDER = 'Emulator'
+
+# the JSON around the padding of a workload target's event
+PAYLOAD_WRAPPER_BYTES = len(json.dumps({'padding': ''}))
+
+# workload and mitigation are '' for the hello-world targets
+BenchmarkTarget = collections.namedtuple('BenchmarkTarget', ['function_arn', 'provider', 'runtime', 'memory_size', 'workload', 'payload_kb', 'mitigation', 'code_digest'])
+
+
+def discover_targets(tagging_client, matrix_name):
+    # every Lambda function tagged as part of the matrix, sorted by provider, runtime and memory size
+    targets = []
+    request = {
+        'TagFilters': [{'Key': MATRIX_TAG, 'Values': [matrix_name]}],
+        'ResourceTypeFilters': ['lambda:function']
+    }
+    while True:
+        response = tagging_client.get_resources(**request)
+        for resource in response['ResourceTagMappingList']:
+            tags = {tag['Key']: tag['Value'] for tag in resource['Tags']}
+            qualifier = tags.get(QUALIFIER_TAG)
+            targets.append(BenchmarkTarget(
+                function_arn=resource['ResourceARN'] + (':' + qualifier if qualifier else ''),
+                provider=tags.get(PROVIDER_TAG, DEFAULT_PROVIDER),
+                runtime=tags[RUNTIME_TAG],
+                memory_size=int(tags[MEMORY_SIZE_TAG]),
+                workload=tags.get(WORKLOAD_TAG, ''),
+                payload_kb=int(tags.get(PAYLOAD_KB_TAG, '0')),
+                mitigation=tags.get(MITIGATION_TAG, ''),
+                code_digest=tags.get(CODE_DIGEST_TAG, '')))
+        if not response.get('PaginationToken'):
+            break
+        request['PaginationToken'] = response['PaginationToken']
+    targets.sort(key=target_order)
+    return targets
+
+
+def discover_emulator_targets(endpoint_url, matrix_name, timeout=10):
+    # every function a function emulator hosts for the matrix, sorted like discover_targets
+    with urllib.request.urlopen(endpoint_url.rstrip('/') + '/functions', timeout=timeout) as response:
+        functions = json.loads(response.read())['Functions']
+    targets = [
+        BenchmarkTarget(
+            function_arn=function['FunctionArn'],
+            provider=EMULATOR_PROVIDER,
+            runtime=function['Runtime'],
+            memory_size=int(function['MemorySize']),
+            workload='',
+            payload_kb=0,
+            mitigation='',
+            code_digest='')
+        for function in functions if function.get('Matrix') == matrix_name]
+    targets.sort(key=target_order)
+    return targets
+
+
+def target_order(target):
+    # by provider, runtime and memory size, so that the targets of every provider can be merged into one list
+    return (target.provider, target.runtime, target.memory_size, target.workload, target.mitigation, target.function_arn)
+
+
+def partition_suffix(target):
+    # provider|runtime|memory size[|workload or mitigation], the part of RECORD|... and AGGREGATE|... keys after the type
+    suffix = target.provider + '|' + target.runtime + '|' + str(target.memory_size)
+    variant = target.workload or target.mitigation
+    return suffix + '|' + variant if variant else suffix
+
+
+def configs_partition_suffix(configs):
+    # partition_suffix of the target a report's Configs were read from
+    suffix = configs_provider(configs) + '|' + configs['Runtime'] + '|' + str(configs['MemorySize'])
+    variant = configs.get('Workload') or configs.get('Mitigation')
+    return suffix + '|' + variant['Name'] if variant else suffix
+
+
+def configs_provider(configs):
+    return configs.get('Provider', DEFAULT_PROVIDER)
+
+
+def request_payload(payload_kb):
+    # JSON event of payload_kb KB for a workload target, the hello-world targets get none
+    if not payload_kb:
+        return None
+    return json.dumps({'padding': 'x' * max(0, payload_kb * 1024 - PAYLOAD_WRAPPER_BYTES)}).encode('UTF-8')
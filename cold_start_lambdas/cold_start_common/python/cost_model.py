@@ -0,0 +1,47 @@
+import math
+
+# Lambda prices in USD, x86 in us-east-1. The summarizer's PRICING variable overrides any of them
+PRICES = {
+    # per request
+    'RequestPrice': 0.0000002,
+    # per GB-second of billed duration, on demand and on provisioned environments
+    'ComputePrice': 0.0000166667,
+    'ProvisionedComputePrice': 0.0000097222,
+    # per GB-second an environment is kept provisioned, whether it is invoked or not
+    'ProvisionedPrice': 0.0000041667,
+    # phases of the function segment billed with every invocation. Init is billed on demand;
+    # a Java SnapStart restore is not
+    'BilledPhases': ['Initialization', 'Invocation'],
+    # traffic the provisioned environments are paid for by, it only matters to provisioned twins
+    'InvocationsPerHour': 3600
+}
+
+INVOCATION_COLUMN = 'AWS::Lambda::Function::Invocation::duration'
+
+
+def invocation_cost(column_stats, configs, prices=PRICES):
+    # USD per 1000 invocations like the mean of column_stats ({column: stats} of one temperature),
+    # None without an Invocation duration. The mean billed duration is rounded up to the
+    # millisecond, so this is close to but not exactly the mean of the billed costs
+    if INVOCATION_COLUMN not in column_stats:
+        return None
+    billed = 0.0
+    for phase in prices['BilledPhases']:
+        column = 'AWS::Lambda::Function::' + phase + '::duration'
+        if column in column_stats:
+            billed += column_stats[column]['Mean']
+    billed = math.ceil(billed * 1000) / 1000
+    gigabytes = configs['MemorySize'] / 1024
+    provisioned = (configs.get('Mitigation') or {}).get('ProvisionedConcurrency') or 0
+    cost = prices['RequestPrice'] + gigabytes * billed * (prices['ProvisionedComputePrice'] if provisioned else prices['ComputePrice'])
+    # the provisioned environments' hour, shared by the hour's invocations
+    cost += provisioned * gigabytes * 3600 * prices['ProvisionedPrice'] / prices['InvocationsPerHour']
+    return cost * 1000
+
+
+def partition_cost(stats, configs, prices=PRICES):
+    # {'Cold': USD per 1000 cold invocations, 'Warm': ... warm ones} of a partition's summary statistics
+    return {
+        'Cold': invocation_cost(stats['Cold'], configs, prices),
+        'Warm': invocation_cost(stats['Warm'], configs, prices)
+    }
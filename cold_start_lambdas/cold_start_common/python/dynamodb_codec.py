@@ -0,0 +1,168 @@
+import base64
+import decimal
+import math
+
+# Marshals plain Python values to DynamoDB low-level attribute values and back.
+#
+#   None -> NULL, bool -> BOOL, str -> S, int/float/Decimal -> N, bytes/bytearray -> B,
+#   dict -> M, list/tuple -> L, set/frozenset of str/numbers/bytes -> SS/NS/BS
+#
+# Floats are written with repr(), the shortest string that reads back to the same float,
+# and N values are read back as int when they have no fraction or exponent, else float.
+# Pass number=decimal.Decimal to unmarshal() to keep N values exactly as stored.
+
+
+def marshal(item):
+    # dict of plain values -> DynamoDB item
+    return {key: marshal_value(value) for key, value in item.items()}
+
+
+def marshal_value(value):
+    encoder = ENCODERS.get(type(value))
+    if encoder is None:
+        encoder = find_encoder(value)
+    return encoder(value)
+
+
+def unmarshal(item, number=None):
+    # DynamoDB item -> dict of plain values
+    if number is not None:
+        return {key: unmarshal_value(value, number) for key, value in item.items()}
+    decoders = DECODERS
+    result = {}
+    for key, value in item.items():
+        for tag, raw in value.items():
+            result[key] = decoders[tag](raw)
+    return result
+
+
+def unmarshal_value(value, number=None):
+    if number is not None:
+        return decode_with(value, number)
+    for tag, raw in value.items():
+        return DECODERS[tag](raw)
+    raise ValueError("Empty attribute value")
+
+
+def decode_with(value, number):
+    for tag, raw in value.items():
+        if tag == 'N':
+            return number(raw)
+        if tag == 'M':
+            return {key: decode_with(v, number) for key, v in raw.items()}
+        if tag == 'L':
+            return [decode_with(v, number) for v in raw]
+        if tag == 'NS':
+            return {number(v) for v in raw}
+        return DECODERS[tag](raw)
+    raise ValueError("Empty attribute value")
+
+
+def encode_number(value):
+    if value != value or value in (math.inf, -math.inf):
+        raise ValueError("DynamoDB does not support " + repr(value))
+    return {'N': repr(value)}
+
+
+def encode_int(value):
+    return {'N': str(int(value))}
+
+
+def encode_decimal(value):
+    if not value.is_finite():
+        raise ValueError("DynamoDB does not support " + str(value))
+    return {'N': str(value)}
+
+
+def encode_set(value):
+    if not value:
+        raise ValueError("DynamoDB does not support empty sets")
+    kinds = {set_tag(v) for v in value}
+    if len(kinds) != 1:
+        raise TypeError("Set members must all be strings, numbers or bytes")
+    tag = kinds.pop()
+    if tag == 'SS':
+        return {'SS': list(value)}
+    if tag == 'BS':
+        return {'BS': [bytes(v) for v in value]}
+    return {'NS': [marshal_value(v)['N'] for v in value]}
+
+
+def set_tag(value):
+    if isinstance(value, str):
+        return 'SS'
+    if isinstance(value, (bytes, bytearray)):
+        return 'BS'
+    if isinstance(value, (int, float, decimal.Decimal)) and not isinstance(value, bool):
+        return 'NS'
+    raise TypeError("Unsupported set member type: " + type(value).__name__)
+
+
+ENCODERS = {
+    str: lambda value: {'S': value},
+    float: encode_number,
+    int: encode_int,
+    bool: lambda value: {'BOOL': value},
+    type(None): lambda value: {'NULL': True},
+    decimal.Decimal: encode_decimal,
+    dict: lambda value: {'M': {key: marshal_value(v) for key, v in value.items()}},
+    list: lambda value: {'L': [marshal_value(v) for v in value]},
+    tuple: lambda value: {'L': [marshal_value(v) for v in value]},
+    bytes: lambda value: {'B': value},
+    bytearray: lambda value: {'B': bytes(value)},
+    set: encode_set,
+    frozenset: encode_set,
+}
+
+
+def find_encoder(value):
+    # subclasses (IntEnum, OrderedDict, ...) miss the exact-type lookup
+    for value_type, encoder in ENCODERS.items():
+        if value_type is not bool and isinstance(value, value_type):
+            return encoder
+    raise TypeError("Unsupported DynamoDB attribute type: " + type(value).__name__)
+
+
+def decode_number(raw):
+    if '.' in raw or 'e' in raw or 'E' in raw:
+        return float(raw)
+    return int(raw)
+
+
+def decode_binary(raw):
+    # boto3 returns bytes, raw JSON from the API and S3 backups carries base64
+    if isinstance(raw, str):
+        return base64.b64decode(raw)
+    return raw
+
+
+def decode_map(raw):
+    decoders = DECODERS
+    result = {}
+    for key, value in raw.items():
+        for tag, inner in value.items():
+            result[key] = decoders[tag](inner)
+    return result
+
+
+def decode_list(raw):
+    decoders = DECODERS
+    result = []
+    for value in raw:
+        for tag, inner in value.items():
+            result.append(decoders[tag](inner))
+    return result
+
+
+DECODERS = {
+    'S': lambda raw: raw,
+    'N': decode_number,
+    'BOOL': lambda raw: raw,
+    'NULL': lambda raw: None,
+    'B': decode_binary,
+    'M': decode_map,
+    'L': decode_list,
+    'SS': set,
+    'NS': lambda raw: {decode_number(v) for v in raw},
+    'BS': lambda raw: {decode_binary(v) for v in raw},
+}
@@ -0,0 +1,75 @@
+import concurrent.futures
+import time
+
+
+class PartitionResult(object):
+    __slots__ = ('pk', 'items', 'pages', 'consumed_capacity', 'latency')
+
+    def __init__(self, pk):
+        self.pk = pk
+        # raw (still marshalled) items, in sort key order
+        self.items = []
+        self.pages = 0
+        # read capacity units reported by DynamoDB over all pages
+        self.consumed_capacity = 0.0
+        # wall-clock seconds spent reading the whole partition
+        self.latency = None
+
+    def metrics(self):
+        return {
+            'PK': self.pk,
+            'Items': len(self.items),
+            'Pages': self.pages,
+            'ConsumedCapacity': self.consumed_capacity,
+            'Latency': self.latency
+        }
+
+
+def query_partitions(dynamodb_client, table_name, pks, sk_range=None, projection=None, max_workers=8):
+    # read every page of every partition, up to max_workers partitions at a time.
+    # sk_range is an inclusive (start, end) pair of numeric sort keys.
+    # returns {pk: PartitionResult}
+    results = {}
+    if not pks:
+        return results
+    workers = max(1, min(max_workers, len(pks)))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(query_partition, dynamodb_client, table_name, pk, sk_range, projection): pk
+            for pk in pks
+        }
+        for future in concurrent.futures.as_completed(futures):
+            results[futures[future]] = future.result()
+    return results
+
+
+def query_partition(dynamodb_client, table_name, pk, sk_range=None, projection=None):
+    result = PartitionResult(pk)
+    request = {
+        'TableName': table_name,
+        'KeyConditionExpression': '#pk = :pk',
+        'ExpressionAttributeNames': {'#pk': 'PK'},
+        'ExpressionAttributeValues': {':pk': {'S': pk}},
+        'ReturnConsumedCapacity': 'TOTAL'
+    }
+    if sk_range is not None:
+        request['KeyConditionExpression'] += ' and #sk BETWEEN :start and :end'
+        request['ExpressionAttributeNames']['#sk'] = 'SK'
+        request['ExpressionAttributeValues'][':start'] = {'N': repr(sk_range[0])}
+        request['ExpressionAttributeValues'][':end'] = {'N': repr(sk_range[1])}
+    if projection:
+        # placeholders keep reserved words such as Records usable
+        names = ['#p' + str(i) for i in range(len(projection))]
+        request['ProjectionExpression'] = ', '.join(names)
+        request['ExpressionAttributeNames'].update(zip(names, projection))
+    start = time.perf_counter()
+    while True:
+        response = dynamodb_client.query(**request)
+        result.pages += 1
+        result.items.extend(response['Items'])
+        result.consumed_capacity += response.get('ConsumedCapacity', {}).get('CapacityUnits', 0.0)
+        if 'LastEvaluatedKey' not in response:
+            break
+        request['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    result.latency = time.perf_counter() - start
+    return result
@@ -0,0 +1,98 @@
+import concurrent.futures
+import json
+import math
+import threading
+import time
+
+from backoff import backoff_delay
+
+# BatchWriteItem accepts at most 25 put/delete requests per call
+MAX_ITEMS_PER_BATCH = 25
+
+
+class WriteBudget(object):
+    # token bucket of write capacity units per second, shared by every writer thread.
+    # A caller that overdraws the bucket sleeps until its debt is paid back.
+    def __init__(self, units_per_second, burst=None):
+        self.units_per_second = float(units_per_second)
+        self.burst = float(burst if burst is not None else units_per_second)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, units):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.units_per_second)
+            self.updated = now
+            self.tokens -= units
+            wait = -self.tokens / self.units_per_second if self.tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+
+
+def request_write_units(request):
+    # one unit per started KB of the item, the marshalled JSON slightly overstates the size
+    # DynamoDB bills. Deletes are billed by the size of the deleted item but counted as one.
+    if 'DeleteRequest' in request:
+        return 1
+    return max(1, math.ceil(len(json.dumps(request['PutRequest']['Item'])) / 1024.0))
+
+
+class UnprocessedItemsError(Exception):
+    def __init__(self, table_name, unprocessed_items):
+        super().__init__(str(len(unprocessed_items)) + " item(s) were not written to " + table_name)
+        self.table_name = table_name
+        self.unprocessed_items = unprocessed_items
+
+
+def batch_write_items(dynamodb_client, table_name, items, max_workers=1, max_attempts=8, base_delay=0.05, max_delay=5.0, budget=None):
+    # write already-marshalled items with BatchWriteItem; returns the number of batch_write_item calls.
+    # Items left in UnprocessedItems after max_attempts raise UnprocessedItemsError. With a
+    # WriteBudget every call, retries included, first waits for its write units.
+    batches = [items[i:i + MAX_ITEMS_PER_BATCH] for i in range(0, len(items), MAX_ITEMS_PER_BATCH)]
+    if not batches:
+        return 0
+    requests = [[{'PutRequest': {'Item': item}} for item in batch] for batch in batches]
+    return write_requests(dynamodb_client, table_name, requests, max_workers, max_attempts, base_delay, max_delay, budget)
+
+
+def batch_delete_keys(dynamodb_client, table_name, keys, max_workers=1, max_attempts=8, base_delay=0.05, max_delay=5.0, budget=None):
+    batches = [keys[i:i + MAX_ITEMS_PER_BATCH] for i in range(0, len(keys), MAX_ITEMS_PER_BATCH)]
+    if not batches:
+        return 0
+    requests = [[{'DeleteRequest': {'Key': key}} for key in batch] for batch in batches]
+    return write_requests(dynamodb_client, table_name, requests, max_workers, max_attempts, base_delay, max_delay, budget)
+
+
+def write_requests(dynamodb_client, table_name, requests, max_workers, max_attempts, base_delay, max_delay, budget=None):
+    if max_workers <= 1 or len(requests) == 1:
+        return sum(write_batch(dynamodb_client, table_name, batch, max_attempts, base_delay, max_delay, budget) for batch in requests)
+    calls = 0
+    unprocessed = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(max_workers, len(requests))) as executor:
+        futures = [executor.submit(write_batch, dynamodb_client, table_name, batch, max_attempts, base_delay, max_delay, budget) for batch in requests]
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                calls += future.result()
+            except UnprocessedItemsError as e:
+                unprocessed.extend(e.unprocessed_items)
+    if unprocessed:
+        raise UnprocessedItemsError(table_name, unprocessed)
+    return calls
+
+
+def write_batch(dynamodb_client, table_name, batch, max_attempts, base_delay, max_delay, budget=None):
+    calls = 0
+    pending = batch
+    for attempt in range(1, max_attempts + 1):
+        if budget is not None:
+            budget.acquire(sum(request_write_units(request) for request in pending))
+        response = dynamodb_client.batch_write_item(RequestItems={table_name: pending})
+        calls += 1
+        pending = response.get('UnprocessedItems', {}).get(table_name, [])
+        if not pending:
+            return calls
+        if attempt < max_attempts:
+            time.sleep(backoff_delay(attempt, base_delay, max_delay))
+    raise UnprocessedItemsError(table_name, pending)
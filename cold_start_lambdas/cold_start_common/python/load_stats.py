@@ -0,0 +1,88 @@
+from running_stats import RunningStats
+
+LOAD_TYPE = 'LOAD'
+
+
+class LoadStep(object):
+    # results of keeping concurrency invocations of one function in flight for a while
+    __slots__ = ('concurrency', 'seconds', 'invocations', 'errors', 'throttles', 'cold_starts', 'latency', 'duration', 'init_duration')
+
+    def __init__(self, concurrency):
+        self.concurrency = concurrency
+        # wall-clock seconds from the first request to the last response
+        self.seconds = 0.0
+        # successful invocations, errors and throttles are counted apart
+        self.invocations = 0
+        self.errors = 0
+        self.throttles = 0
+        # invocations that brought up a new execution environment
+        self.cold_starts = 0
+        # seconds: client-observed latency, and Duration and Init (or Restore) Duration of the REPORT line
+        self.latency = RunningStats()
+        self.duration = RunningStats()
+        self.init_duration = RunningStats()
+
+    def merge(self, other):
+        # steps of the same concurrency, e.g. from different runs; seconds add up too, so
+        # the merged throughput is the invocation-weighted mean
+        self.seconds += other.seconds
+        self.invocations += other.invocations
+        self.errors += other.errors
+        self.throttles += other.throttles
+        self.cold_starts += other.cold_starts
+        self.latency.merge(other.latency)
+        self.duration.merge(other.duration)
+        self.init_duration.merge(other.init_duration)
+
+    def summary(self):
+        return {
+            'Concurrency': self.concurrency,
+            'Seconds': self.seconds,
+            'Invocations': self.invocations,
+            'Errors': self.errors,
+            'Throttles': self.throttles,
+            'ColdStarts': self.cold_starts,
+            'Throughput': self.invocations / self.seconds if self.seconds else None,
+            'ColdRatio': self.cold_starts / self.invocations if self.invocations else None,
+            'Latency': self.latency.stats() if self.latency.count else None,
+            'Duration': self.duration.stats() if self.duration.count else None,
+            'InitDuration': self.init_duration.stats() if self.init_duration.count else None
+        }
+
+    def to_dict(self):
+        # summary plus the sketches, so steps stay mergeable after they are stored
+        raw = self.summary()
+        raw['Sketches'] = {
+            'Latency': self.latency.to_dict(),
+            'Duration': self.duration.to_dict(),
+            'InitDuration': self.init_duration.to_dict()
+        }
+        return raw
+
+    @classmethod
+    def from_dict(cls, raw):
+        step = cls(int(raw['Concurrency']))
+        step.seconds = float(raw['Seconds'])
+        step.invocations = int(raw['Invocations'])
+        step.errors = int(raw['Errors'])
+        step.throttles = int(raw['Throttles'])
+        step.cold_starts = int(raw['ColdStarts'])
+        step.latency = RunningStats.from_dict(raw['Sketches']['Latency'])
+        step.duration = RunningStats.from_dict(raw['Sketches']['Duration'])
+        step.init_duration = RunningStats.from_dict(raw['Sketches']['InitDuration'])
+        return step
+
+
+def summarize_load(items):
+    # {concurrency: summary} over the Steps of LOAD items, steps of one concurrency merged across runs
+    merged = {}
+    runs = {}
+    for item in items:
+        for raw in item['Steps']:
+            step = LoadStep.from_dict(raw)
+            if step.concurrency not in merged:
+                merged[step.concurrency] = LoadStep(step.concurrency)
+            merged[step.concurrency].merge(step)
+            runs[step.concurrency] = runs.get(step.concurrency, 0) + 1
+    # DynamoDB map keys must be strings
+    return {str(concurrency): dict(merged[concurrency].summary(), Runs=runs[concurrency]) for concurrency in sorted(merged)}
@@ -0,0 +1,128 @@
+import contextlib
+import json
+import threading
+import time
+
+# CloudWatch namespace of the pipeline's own metrics, read by the stack's dashboard and
+# alarms in cold_start_benchmark/cold_start_benchmark_stack.py, keep the two in sync
+NAMESPACE = 'ColdStartBenchmark'
+DIMENSIONS = ('Function', 'Action')
+# always emitted, so that a run without calls reads as zeros rather than as missing data
+API_COUNTS = ('ApiCalls', 'ApiAttempts', 'ApiRetries', 'ApiThrottles', 'ApiErrors')
+
+# error codes botocore treats as throttling
+THROTTLE_ERROR_CODES = {
+    'Throttling',
+    'ThrottlingException',
+    'ThrottledException',
+    'TooManyRequestsException',
+    'ProvisionedThroughputExceededException',
+    'RequestLimitExceeded',
+    'RequestThrottled',
+    'RequestThrottledException',
+    'SlowDown',
+}
+
+
+class PipelineMetrics(object):
+    # phase timings and AWS API call counts of one handler invocation, written to the function's
+    # log as one Embedded Metric Format line that CloudWatch turns into metrics, see emit.
+    # Phases, counts and properties may be added from any thread.
+    __slots__ = ('function', 'action', 'start', 'times', 'counts', 'operations', 'properties', 'lock')
+
+    def __init__(self, function):
+        self.function = function
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self, action='Run'):
+        self.action = action
+        self.start = time.perf_counter()
+        # {phase: seconds}, {metric: count}, {service.Operation: calls}
+        self.times = {}
+        self.counts = {}
+        self.operations = {}
+        # {name: JSON value} logged with the metrics but not turned into any
+        self.properties = {}
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        # seconds spent inside, summed over every entry of the same phase
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name, seconds):
+        with self.lock:
+            self.times[name] = self.times.get(name, 0.0) + seconds
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.counts[name] = self.counts.get(name, 0) + value
+
+    def set_property(self, name, value):
+        with self.lock:
+            self.properties[name] = value
+
+    def instrument(self, *clients):
+        # count the calls, HTTP attempts, throttles and errors of boto3 clients through botocore's event hooks
+        for client in clients:
+            client.meta.events.register('before-call', self.on_call, unique_id='pipeline-metrics-call')
+            client.meta.events.register('before-send', self.on_send, unique_id='pipeline-metrics-send')
+            client.meta.events.register('needs-retry', self.on_attempt, unique_id='pipeline-metrics-attempt')
+
+    def on_call(self, model, **kwargs):
+        operation = model.service_model.service_name + '.' + model.name
+        with self.lock:
+            self.operations[operation] = self.operations.get(operation, 0) + 1
+        self.count('ApiCalls')
+
+    def on_send(self, **kwargs):
+        # once per HTTP attempt, so attempts beyond the calls are botocore's own retries
+        self.count('ApiAttempts')
+
+    def on_attempt(self, response=None, caught_exception=None, **kwargs):
+        # after every attempt, before botocore decides whether to retry it
+        if caught_exception is not None:
+            self.count('ApiErrors')
+            return None
+        if response is None:
+            return None
+        http_response, parsed = response
+        code = parsed.get('Error', {}).get('Code')
+        if code in THROTTLE_ERROR_CODES or http_response.status_code == 429:
+            self.count('ApiThrottles')
+        elif code is not None or http_response.status_code >= 500:
+            self.count('ApiErrors')
+        return None
+
+    def emit(self):
+        # print the invocation's metrics as one EMF line and return it as a dict. The
+        # per-operation call counts and the properties are plain properties, for Logs
+        # Insights rather than metrics
+        with self.lock:
+            times = dict(self.times, Total=time.perf_counter() - self.start)
+            counts = dict(self.counts)
+            operations = dict(self.operations)
+            properties = dict(self.properties)
+        for name in API_COUNTS:
+            counts.setdefault(name, 0)
+        counts['ApiRetries'] = max(0, counts['ApiAttempts'] - counts['ApiCalls'])
+        metrics = [{'Name': name + 'Time', 'Unit': 'Seconds'} for name in sorted(times)] + \
+            [{'Name': name, 'Unit': 'Count'} for name in sorted(counts)]
+        line = dict(properties)
+        line.update({
+            '_aws': {
+                'Timestamp': int(time.time() * 1000),
+                'CloudWatchMetrics': [{'Namespace': NAMESPACE, 'Dimensions': [list(DIMENSIONS)], 'Metrics': metrics}]
+            },
+            'Function': self.function,
+            'Action': self.action,
+            'Operations': operations
+        })
+        line.update((name + 'Time', seconds) for name, seconds in times.items())
+        line.update(counts)
+        print(json.dumps(line))
+        return line
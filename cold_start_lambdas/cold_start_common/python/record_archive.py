@@ -0,0 +1,254 @@
+import concurrent.futures
+import datetime
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.fs as fs
+import pyarrow.parquet as pq
+
+from benchmark_targets import DEFAULT_PROVIDER, configs_provider
+from record_columns import TIMESTAMP_LABELS, TRACE_ID_LABEL, is_cold
+
+# archive/provider=AWS/runtime=python3.8/memory=128/dt=2020-12-03/hourly-17-1607014800000.parquet,
+# the compaction job merges a day's hourly files into daily.parquet in the same partition
+ARCHIVE_PREFIX = 'archive/'
+HOURLY_FILE_PREFIX = 'hourly-'
+DAILY_FILE = 'daily.parquet'
+COMPRESSION = 'zstd'
+
+# partition columns (provider, runtime, memory, dt) come from the path, not from the files
+ARCHIVE_SCHEMA = pa.schema(
+    [
+        pa.field('run_timestamp', pa.float64()),
+        pa.field('sample', pa.int32()),
+        pa.field('forced_cold', pa.bool_()),
+        pa.field('cold', pa.bool_()),
+        pa.field('function_arn', pa.string()),
+        pa.field('code_size', pa.int64()),
+        pa.field('trace_id', pa.string()),
+        pa.field('client_latency', pa.float64()),
+        pa.field('attempts', pa.int32()),
+        # Configs.Workload of the workload variants, null for the hello-world functions
+        pa.field('workload', pa.string()),
+        pa.field('padding_mb', pa.int32()),
+        pa.field('init_imports', pa.int32()),
+        pa.field('payload_kb', pa.int32()),
+        # Configs.Mitigation of the mitigated twins, null for every other function
+        pa.field('mitigation', pa.string()),
+        pa.field('mitigation_type', pa.string()),
+        pa.field('provisioned_concurrency', pa.int32()),
+    ] +
+    # absolute epoch seconds as in the Records maps, null where the label is missing
+    [pa.field(label, pa.float64()) for label in TIMESTAMP_LABELS])
+
+PARTITION_SCHEMA = pa.schema([
+    pa.field('provider', pa.string()),
+    pa.field('runtime', pa.string()),
+    pa.field('memory', pa.int32()),
+    pa.field('dt', pa.string())
+])
+
+# operators of the (column, op, value) filters taken by read_archive
+FILTER_OPERATORS = {
+    '=': lambda field, value: field == value,
+    '==': lambda field, value: field == value,
+    '!=': lambda field, value: field != value,
+    '<': lambda field, value: field < value,
+    '<=': lambda field, value: field <= value,
+    '>': lambda field, value: field > value,
+    '>=': lambda field, value: field >= value,
+    'in': lambda field, value: field.isin(value),
+    'not in': lambda field, value: ~field.isin(value)
+}
+
+
+def partition_prefix(provider, runtime, memory_size, day):
+    return ARCHIVE_PREFIX + 'provider=' + provider + '/runtime=' + runtime + '/memory=' + str(memory_size) + '/dt=' + day.isoformat() + '/'
+
+
+def hourly_key(prefix, run_timestamp, suffix=''):
+    # zero padded so that the keys of a day sort by time
+    hour = datetime.datetime.fromtimestamp(run_timestamp).hour
+    return prefix + HOURLY_FILE_PREFIX + '%02d-%013d%s.parquet' % (hour, int(run_timestamp * 1000), suffix)
+
+
+def report_rows(report_artifect_dict, run_timestamp):
+    # one row per sample of a caller report, grouped by partition: {(provider, runtime, memory): [row]}
+    partitions = {}
+    for report in report_artifect_dict.values():
+        records = report["Records"]
+        invocation = report["Invocation"]
+        row = {
+            'run_timestamp': run_timestamp,
+            'sample': invocation.get("Sample", 0),
+            'forced_cold': invocation.get("ForcedCold", False),
+            'cold': is_cold(records),
+            'function_arn': report["Configs"]["FunctionArn"],
+            'code_size': report["Configs"]["CodeSize"],
+            'trace_id': records.get(TRACE_ID_LABEL),
+            'client_latency': invocation.get("ClientLatency"),
+            'attempts': invocation.get("Attempts")
+        }
+        workload = report["Configs"].get("Workload") or {}
+        row['workload'] = workload.get("Name")
+        row['padding_mb'] = workload.get("PaddingMB")
+        row['init_imports'] = workload.get("InitImports")
+        row['payload_kb'] = workload.get("PayloadKB")
+        mitigation = report["Configs"].get("Mitigation") or {}
+        row['mitigation'] = mitigation.get("Name")
+        row['mitigation_type'] = mitigation.get("Type")
+        row['provisioned_concurrency'] = mitigation.get("ProvisionedConcurrency")
+        for label in TIMESTAMP_LABELS:
+            row[label] = records.get(label)
+        partitions.setdefault((configs_provider(report["Configs"]), report["Configs"]["Runtime"], report["Configs"]["MemorySize"]), []).append(row)
+    return partitions
+
+
+def row_report(row, provider, runtime, memory_size):
+    # the caller report entry a row was made from, provider, runtime and memory size come from its partition
+    records = {label: row[label] for label in TIMESTAMP_LABELS if row[label] is not None}
+    records[TRACE_ID_LABEL] = row['trace_id']
+    configs = {
+        "FunctionArn": row['function_arn'],
+        "Runtime": runtime,
+        "CodeSize": row['code_size'],
+        "MemorySize": memory_size
+    }
+    if provider != DEFAULT_PROVIDER:
+        configs["Provider"] = provider
+    if row['workload'] is not None:
+        configs["Workload"] = {
+            "Name": row['workload'],
+            "PaddingMB": row['padding_mb'],
+            "InitImports": row['init_imports'],
+            "PayloadKB": row['payload_kb']
+        }
+    if row['mitigation'] is not None:
+        configs["Mitigation"] = {
+            "Name": row['mitigation'],
+            "Type": row['mitigation_type'],
+            "ProvisionedConcurrency": row['provisioned_concurrency']
+        }
+    return {
+        "Records": records,
+        "Configs": configs,
+        "Invocation": {
+            "ClientLatency": row['client_latency'],
+            "Attempts": row['attempts'],
+            "Sample": row['sample'],
+            "ForcedCold": row['forced_cold']
+        }
+    }
+
+
+def rows_to_table(rows):
+    rows = sorted(rows, key=lambda row: (row['run_timestamp'], row['function_arn'], row['sample']))
+    return pa.Table.from_arrays([pa.array([row[field.name] for row in rows], type=field.type) for field in ARCHIVE_SCHEMA], schema=ARCHIVE_SCHEMA)
+
+
+def table_rows(table):
+    columns = table.to_pydict()
+    return [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+
+def table_to_bytes(table):
+    sink = pa.BufferOutputStream()
+    pq.write_table(table, sink, compression=COMPRESSION)
+    return sink.getvalue().to_pybytes()
+
+
+def bytes_to_table(data):
+    return conform(pq.read_table(pa.BufferReader(data)))
+
+
+def conform(table):
+    # files written before a column existed get it as nulls
+    return pa.Table.from_arrays(
+        [table.column(field.name) if field.name in table.column_names else pa.nulls(table.num_rows, field.type) for field in ARCHIVE_SCHEMA],
+        schema=ARCHIVE_SCHEMA)
+
+
+def write_report(s3_client, bucket, report_artifect_dict, current_timestamp, suffix='', max_workers=8):
+    # one hourly file per partition of the report; returns the keys written
+    run_timestamp = current_timestamp.timestamp()
+    objects = []
+    for (provider, runtime, memory_size), rows in report_rows(report_artifect_dict, run_timestamp).items():
+        key = hourly_key(partition_prefix(provider, runtime, memory_size, current_timestamp.date()), run_timestamp, suffix)
+        objects.append((key, table_to_bytes(rows_to_table(rows))))
+    if not objects:
+        return []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(objects)))) as executor:
+        list(executor.map(lambda obj: s3_client.put_object(Body=obj[1], Bucket=bucket, Key=obj[0]), objects))
+    return [key for key, _ in objects]
+
+
+def list_keys(s3_client, bucket, prefix, delimiter=None):
+    # (keys, common prefixes) under prefix
+    keys = []
+    prefixes = []
+    request = {'Bucket': bucket, 'Prefix': prefix}
+    if delimiter is not None:
+        request['Delimiter'] = delimiter
+    while True:
+        response = s3_client.list_objects_v2(**request)
+        keys.extend(obj['Key'] for obj in response.get('Contents', []))
+        prefixes.extend(common['Prefix'] for common in response.get('CommonPrefixes', []))
+        if not response.get('IsTruncated'):
+            break
+        request['ContinuationToken'] = response['NextContinuationToken']
+    return keys, prefixes
+
+
+def list_partition_prefixes(s3_client, bucket):
+    # every provider=/runtime=/memory= prefix of the archive
+    prefixes = [ARCHIVE_PREFIX]
+    for _ in ('provider', 'runtime', 'memory'):
+        prefixes = [child for prefix in prefixes for child in list_keys(s3_client, bucket, prefix, '/')[1]]
+    return prefixes
+
+
+def list_partitions(s3_client, bucket, day, partition_prefixes=None):
+    # every dt= partition prefix for day that holds files
+    if partition_prefixes is None:
+        partition_prefixes = list_partition_prefixes(s3_client, bucket)
+    dt = 'dt=' + day.isoformat() + '/'
+    return [prefix + dt for prefix in partition_prefixes if list_keys(s3_client, bucket, prefix + dt, '/')[0]]
+
+
+def compact_partition(s3_client, bucket, prefix):
+    # merge the hourly files of one dt= partition into daily.parquet, then delete them.
+    # Rows are deduplicated by trace id, so a compaction that died before deleting
+    # its hourly files is repaired by the next one. Returns the number of files merged.
+    keys, _ = list_keys(s3_client, bucket, prefix)
+    hourly = sorted(key for key in keys if key[len(prefix):].startswith(HOURLY_FILE_PREFIX))
+    if not hourly:
+        return 0
+    sources = hourly + ([prefix + DAILY_FILE] if prefix + DAILY_FILE in keys else [])
+    tables = [bytes_to_table(s3_client.get_object(Bucket=bucket, Key=key)['Body'].read()) for key in sources]
+    rows = {}
+    for row in table_rows(pa.concat_tables(tables)):
+        rows[row['trace_id']] = row
+    s3_client.put_object(Body=table_to_bytes(rows_to_table(list(rows.values()))), Bucket=bucket, Key=prefix + DAILY_FILE)
+    # DeleteObjects takes at most 1000 keys
+    for i in range(0, len(hourly), 1000):
+        s3_client.delete_objects(Bucket=bucket, Delete={'Objects': [{'Key': key} for key in hourly[i:i + 1000]], 'Quiet': True})
+    return len(hourly)
+
+
+def read_archive(path, filters=None, columns=None, filesystem=None):
+    # path is a local copy of the archive/ prefix, or "<bucket>/archive" with
+    # filesystem=pyarrow.fs.S3FileSystem(). Filters are (column, op, value) tuples that
+    # must all hold; on the partition columns, e.g. [('runtime', '=', 'java11'),
+    # ('dt', '>=', '2020-12-01')], they skip whole files before anything is read and
+    # columns limits the bytes read from the ones left. Local files are memory-mapped.
+    # The schema is fixed rather than taken from the first file found, so columns
+    # added since older files were written read as nulls there.
+    if filesystem is None:
+        filesystem = fs.LocalFileSystem(use_mmap=True)
+    dataset = ds.dataset(path, schema=pa.schema(list(ARCHIVE_SCHEMA) + list(PARTITION_SCHEMA)), format='parquet',
+                         filesystem=filesystem, partitioning=ds.partitioning(PARTITION_SCHEMA, flavor='hive'))
+    expression = None
+    for column, op, value in filters or ():
+        condition = FILTER_OPERATORS[op](ds.field(column), value)
+        expression = condition if expression is None else expression & condition
+    return dataset.to_table(columns=columns, filter=expression)
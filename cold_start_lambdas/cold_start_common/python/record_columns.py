@@ -0,0 +1,74 @@
+START_LABEL = 'AWS::Lambda::start'
+# only present on records of invocations that prepared a new execution environment
+COLD_LABEL = 'AWS::Lambda::Function::Initialization::start'
+# in place of Initialization when the environment was restored from a SnapStart snapshot
+RESTORE_LABEL = 'AWS::Lambda::Function::Restore::start'
+COLD_LABELS = (COLD_LABEL, RESTORE_LABEL)
+TRACE_ID_LABEL = 'AWS::X-Ray::Trace-id'
+# the caller's own clock around lambda:Invoke, from sending the request to reading the response
+CLIENT_START_LABEL = 'Client::Invoke::start'
+CLIENT_END_LABEL = 'Client::Invoke::end'
+
+TIMESTAMP_LABELS = (
+    'AWS::Lambda::start',
+    'AWS::Lambda::Function::Initialization::start',
+    'AWS::Lambda::Function::Initialization::end',
+    'AWS::Lambda::Function::Restore::start',
+    'AWS::Lambda::Function::Restore::end',
+    'AWS::Lambda::Function::start',
+    'AWS::Lambda::Function::Invocation::start',
+    'AWS::Lambda::Function::Invocation::end',
+    'AWS::Lambda::Function::Overhead::start',
+    'AWS::Lambda::Function::Overhead::end',
+    'AWS::Lambda::Function::end',
+    'AWS::Lambda::end',
+    'Client::Invoke::start',
+    'Client::Invoke::end'
+)
+
+# segments and subsegments whose start/end pair gives a duration
+PHASES = (
+    'AWS::Lambda',
+    'AWS::Lambda::Function',
+    'AWS::Lambda::Function::Initialization',
+    'AWS::Lambda::Function::Restore',
+    'AWS::Lambda::Function::Invocation',
+    'AWS::Lambda::Function::Overhead',
+    'Client::Invoke'
+)
+
+# latency components that are not a single phase, as (column, minuend, subtrahend) of the columns above.
+# With the phase durations of Initialization, Invocation and Overhead they split up what the caller sees.
+COMPONENTS = (
+    # request and response transfer between the caller and the Lambda service. Both terms
+    # are read off one clock each, so skew between the caller's clock and X-Ray's cancels out
+    ('Client::Overhead::duration', 'Client::Invoke::duration', 'AWS::Lambda::duration'),
+    # inside the Lambda service before the function segment starts: routing, placement, queueing
+    ('AWS::Lambda::Queueing::duration', 'AWS::Lambda::Function::start', 'AWS::Lambda::start')
+)
+
+# one column per label offset from AWS::Lambda::start, then one per phase duration, then the components.
+# The client label offsets include the skew between the caller's clock and X-Ray's.
+COLUMN_NAMES = TIMESTAMP_LABELS + tuple(phase + '::duration' for phase in PHASES) + tuple(column for column, _, _ in COMPONENTS)
+
+
+def is_cold(records):
+    return COLD_LABEL in records or RESTORE_LABEL in records
+
+
+def record_values(records):
+    # {column: seconds} for one Records map, columns whose labels are missing are left out
+    start = records[START_LABEL]
+    values = {}
+    for label in TIMESTAMP_LABELS:
+        if label in records:
+            values[label] = records[label] - start
+    for phase in PHASES:
+        phase_start = records.get(phase + '::start')
+        phase_end = records.get(phase + '::end')
+        if phase_start is not None and phase_end is not None:
+            values[phase + '::duration'] = phase_end - phase_start
+    for column, minuend, subtrahend in COMPONENTS:
+        if minuend in values and subtrahend in values:
+            values[column] = values[minuend] - values[subtrahend]
+    return values
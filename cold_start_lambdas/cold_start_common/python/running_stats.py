@@ -0,0 +1,204 @@
+import math
+
+from record_columns import COLUMN_NAMES, is_cold, record_values
+
+# relative error of the quantiles returned by QuantileSketch
+DEFAULT_RELATIVE_ACCURACY = 0.01
+# values closer to zero than this are counted in a single zero bucket
+MIN_INDEXABLE_VALUE = 1e-9
+
+PERCENTILES = (50, 90, 99)
+
+
+class QuantileSketch(object):
+    # DDSketch: logarithmically sized buckets, so quantiles are within relative_accuracy
+    # of the true value and two sketches merge by adding their bucket counts
+    __slots__ = ('relative_accuracy', 'gamma', 'log_gamma', 'positive', 'negative', 'zero_count', 'count')
+
+    def __init__(self, relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        # {bucket index: count}, bucket i holds values in (gamma^(i-1), gamma^i]
+        self.positive = {}
+        self.negative = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def add(self, value, count=1):
+        if value > MIN_INDEXABLE_VALUE:
+            index = self.index(value)
+            self.positive[index] = self.positive.get(index, 0) + count
+        elif value < -MIN_INDEXABLE_VALUE:
+            index = self.index(-value)
+            self.negative[index] = self.negative.get(index, 0) + count
+        else:
+            self.zero_count += count
+        self.count += count
+
+    def index(self, value):
+        return int(math.ceil(math.log(value) / self.log_gamma))
+
+    def bucket_value(self, index):
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def merge(self, other):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches with relative accuracy " + repr(self.relative_accuracy) + " and " + repr(other.relative_accuracy))
+        for index, count in other.positive.items():
+            self.positive[index] = self.positive.get(index, 0) + count
+        for index, count in other.negative.items():
+            self.negative[index] = self.negative.get(index, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+
+    def quantile(self, q):
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        # most negative first
+        for index in sorted(self.negative, reverse=True):
+            seen += self.negative[index]
+            if seen > rank:
+                return -self.bucket_value(index)
+        seen += self.zero_count
+        if seen > rank:
+            return 0.0
+        for index in sorted(self.positive):
+            seen += self.positive[index]
+            if seen > rank:
+                return self.bucket_value(index)
+        return self.bucket_value(max(self.positive))
+
+    def to_dict(self):
+        # DynamoDB map keys must be strings
+        return {
+            'RelativeAccuracy': self.relative_accuracy,
+            'Positive': {str(index): count for index, count in self.positive.items()},
+            'Negative': {str(index): count for index, count in self.negative.items()},
+            'Zero': self.zero_count
+        }
+
+    @classmethod
+    def from_dict(cls, raw):
+        sketch = cls(raw['RelativeAccuracy'])
+        sketch.positive = {int(index): count for index, count in raw['Positive'].items()}
+        sketch.negative = {int(index): count for index, count in raw['Negative'].items()}
+        sketch.zero_count = raw['Zero']
+        sketch.count = sketch.zero_count + sum(sketch.positive.values()) + sum(sketch.negative.values())
+        return sketch
+
+
+class RunningStats(object):
+    # mergeable count/sum/sum of squares/min/max plus a quantile sketch of one column
+    __slots__ = ('count', 'total', 'total_squares', 'minimum', 'maximum', 'sketch')
+
+    def __init__(self, relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+        self.count = 0
+        self.total = 0.0
+        self.total_squares = 0.0
+        self.minimum = None
+        self.maximum = None
+        self.sketch = QuantileSketch(relative_accuracy)
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        self.total_squares += value * value
+        if self.minimum is None or value < self.minimum:
+            self.minimum = value
+        if self.maximum is None or value > self.maximum:
+            self.maximum = value
+        self.sketch.add(value)
+
+    def merge(self, other):
+        if other.count == 0:
+            return
+        self.count += other.count
+        self.total += other.total
+        self.total_squares += other.total_squares
+        self.minimum = other.minimum if self.minimum is None else min(self.minimum, other.minimum)
+        self.maximum = other.maximum if self.maximum is None else max(self.maximum, other.maximum)
+        self.sketch.merge(other.sketch)
+
+    def stats(self):
+        # same fields as the summarizer's exact statistics; percentiles come from the sketch
+        mean = self.total / self.count
+        stats = {
+            'Count': self.count,
+            'Mean': mean,
+            # population standard deviation, as numpy.nanstd
+            'StdDev': math.sqrt(max(0.0, self.total_squares / self.count - mean * mean)),
+            'Min': self.minimum,
+            'Max': self.maximum
+        }
+        for percentile in PERCENTILES:
+            # quantiles are clamped to the exact range
+            stats['P' + str(percentile)] = min(self.maximum, max(self.minimum, self.sketch.quantile(percentile / 100.0)))
+        return stats
+
+    def to_dict(self):
+        return {
+            'Count': self.count,
+            'Sum': self.total,
+            'SumSquares': self.total_squares,
+            'Min': self.minimum,
+            'Max': self.maximum,
+            'Sketch': self.sketch.to_dict()
+        }
+
+    @classmethod
+    def from_dict(cls, raw):
+        running = cls(raw['Sketch']['RelativeAccuracy'])
+        running.count = raw['Count']
+        running.total = float(raw['Sum'])
+        running.total_squares = float(raw['SumSquares'])
+        running.minimum = raw['Min']
+        running.maximum = raw['Max']
+        running.sketch = QuantileSketch.from_dict(raw['Sketch'])
+        return running
+
+
+class PartitionAggregate(object):
+    # RunningStats of every column, split into cold and warm invocations
+    __slots__ = ('relative_accuracy', 'cold', 'warm')
+
+    def __init__(self, relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.cold = {}
+        self.warm = {}
+
+    def add_records(self, records):
+        columns = self.cold if is_cold(records) else self.warm
+        for column, value in record_values(records).items():
+            if column not in columns:
+                columns[column] = RunningStats(self.relative_accuracy)
+            columns[column].add(value)
+
+    def merge(self, other):
+        for columns, other_columns in ((self.cold, other.cold), (self.warm, other.warm)):
+            for column, running in other_columns.items():
+                if column not in columns:
+                    columns[column] = RunningStats(self.relative_accuracy)
+                columns[column].merge(running)
+
+    def summary(self):
+        # {'Cold': {column: stats}, 'Warm': {column: stats}} in column order, like summarize_records
+        return {
+            'Cold': {column: self.cold[column].stats() for column in COLUMN_NAMES if column in self.cold},
+            'Warm': {column: self.warm[column].stats() for column in COLUMN_NAMES if column in self.warm}
+        }
+
+    def to_dict(self):
+        return {
+            'Cold': {column: running.to_dict() for column, running in self.cold.items()},
+            'Warm': {column: running.to_dict() for column, running in self.warm.items()}
+        }
+
+    @classmethod
+    def from_dict(cls, raw, relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+        aggregate = cls(relative_accuracy)
+        aggregate.cold = {column: RunningStats.from_dict(running) for column, running in raw.get('Cold', {}).items()}
+        aggregate.warm = {column: RunningStats.from_dict(running) for column, running in raw.get('Warm', {}).items()}
+        return aggregate
@@ -0,0 +1,131 @@
+import datetime
+
+from benchmark_targets import DEFAULT_PROVIDER, configs_partition_suffix, configs_provider
+from cost_model import PRICES, partition_cost
+from dynamodb_codec import marshal
+from record_columns import TIMESTAMP_LABELS
+
+# Marshalled RECORD, SUMMARY and DASHBOARD items, built the same way by the caller, the
+# summarizer and tools/replay_backups.py, which rebuilds them from the S3 backups. Timestamps
+# may be naive, as in Lambda where local time is UTC, or timezone aware.
+
+# the samples of one run are stored this far apart in SK
+SAMPLE_SK_STEP = 0.001
+RECORD_RETENTION = datetime.timedelta(days=60)
+
+# summary partition key prefix and length of each summary period
+PERIODS = {
+    'day': ('SUMMARY', datetime.timedelta(days=1)),
+    'week': ('SUMMARY_WEEKLY', datetime.timedelta(days=7)),
+    'month': ('SUMMARY_MONTHLY', datetime.timedelta(days=30))
+}
+SUMMARY_RETENTION = datetime.timedelta(days=3*365)
+# runtime/memory sizes per DASHBOARD item, keeps a snapshot item well below the 400 KB item
+# limit, and the SK step between the pages of one snapshot
+DASHBOARD_PARTITIONS_PER_ITEM = 40
+DASHBOARD_PAGE_SK_STEP = 0.001
+
+
+def record_items(report_artifect_dict, current_timestamp, expiration_timestamp=None):
+    # RECORD items of one caller run
+    if expiration_timestamp is None:
+        expiration_timestamp = current_timestamp + RECORD_RETENTION
+    items = []
+    for key in report_artifect_dict:
+        item = {
+            "PK": 'RECORD|' + configs_partition_suffix(report_artifect_dict[key]["Configs"]),
+            # samples of one run follow each other 1 ms apart, the first one keeps the run's SK
+            "SK": current_timestamp.timestamp() + report_artifect_dict[key]["Invocation"]["Sample"] * SAMPLE_SK_STEP,
+            "Type": "RECORD",
+            "Records": report_artifect_dict[key]["Records"],
+            "Configs": report_artifect_dict[key]["Configs"],
+            "Invocation": report_artifect_dict[key]["Invocation"],
+            "TTL": expiration_timestamp.timestamp()
+        }
+        items.append(marshal(item))
+    return items
+
+
+def build_summary_items(period, partition_stats, current_timestamp, load_summaries=None, pricing=PRICES):
+    # SUMMARY items of every partition and the period's DASHBOARD pages of every provider.
+    # partition_stats is [(stats, configs)].
+    # load_summaries is {partition: summarize_load result} of the partitions load tested in the period
+    pk_prefix = PERIODS[period][0]
+    summary_items = []
+    # {provider: snapshot pages}
+    snapshots = {}
+    for stats, configs in partition_stats:
+        summaries = {
+            # mean offset of every timestamp from AWS::Lambda::start, in seconds
+            'Cold': {label: stats['Cold'][label]['Mean'] for label in TIMESTAMP_LABELS if label in stats['Cold']},
+            'Warm': {label: stats['Warm'][label]['Mean'] for label in TIMESTAMP_LABELS if label in stats['Warm']},
+            'ColdStats': stats['Cold'],
+            'WarmStats': stats['Warm'],
+            # USD per 1000 invocations, provisioned environments included; pricing is Lambda's
+            'Cost': partition_cost(stats, configs, pricing) if configs_provider(configs) == DEFAULT_PROVIDER else None
+        }
+        if load_summaries and configs_partition_suffix(configs) in load_summaries:
+            # per concurrency step, keyed by the concurrency
+            summaries['Load'] = load_summaries[configs_partition_suffix(configs)]
+        summary_items.append(summary_to_item(
+            pk_prefix,
+            summaries,
+            configs,
+            current_timestamp
+        ))
+        snapshot_pages = snapshots.setdefault(configs_provider(configs), [])
+        if not snapshot_pages or len(snapshot_pages[-1]['Configs']) >= DASHBOARD_PARTITIONS_PER_ITEM:
+            snapshot_pages.append({'Configs': {}, 'Cold': {}, 'Warm': {}, 'ColdStats': {}, 'WarmStats': {}, 'Cost': {}})
+        add_to_snapshot(snapshot_pages[-1], summaries, configs)
+    for provider in sorted(snapshots):
+        summary_items.extend(snapshot_to_items(period, provider, snapshots[provider], current_timestamp))
+    return summary_items
+
+
+def summary_to_item(pk_prefix, summary, configs, current_timestamp):
+    expiration_timestamp = current_timestamp + SUMMARY_RETENTION
+    item = {
+        "PK": pk_prefix + '|' + configs_partition_suffix(configs),
+        "SK": current_timestamp.timestamp(),
+        "Type": "SUMMARY",
+        "Summary": summary,
+        "Configs": configs,
+        "TTL": expiration_timestamp.timestamp()
+    }
+    return marshal(item)
+
+
+def add_to_snapshot(snapshot, summaries, configs):
+    # one map per field, keyed by runtime|memory size[|workload or mitigation], so the API can project single fields
+    key = configs_partition_suffix(configs)[len(configs_provider(configs) + '|'):]
+    snapshot['Configs'][key] = configs
+    snapshot['Cold'][key] = summaries['Cold']
+    snapshot['Warm'][key] = summaries['Warm']
+    snapshot['Cost'][key] = summaries['Cost']
+    # phase durations only, full statistics of every column would not fit in one item
+    snapshot['ColdStats'][key] = {column: stats for column, stats in summaries['ColdStats'].items() if column.endswith('::duration')}
+    snapshot['WarmStats'][key] = {column: stats for column, stats in summaries['WarmStats'].items() if column.endswith('::duration')}
+
+
+def dashboard_pk(provider, period):
+    # one snapshot per provider and period, the API's listDashboardSnapshots defaults to AWS
+    return 'DASHBOARD|' + provider + '|' + period
+
+
+def snapshot_to_items(period, provider, snapshot_pages, current_timestamp):
+    # a snapshot too large for one item is split into pages 1 ms apart, a single page keeps the run's SK
+    expiration_timestamp = current_timestamp + SUMMARY_RETENTION
+    items = []
+    for page, snapshot in enumerate(snapshot_pages):
+        item = {
+            "PK": dashboard_pk(provider, period),
+            "SK": current_timestamp.timestamp() + page * DASHBOARD_PAGE_SK_STEP,
+            "Type": "DASHBOARD",
+            "SnapshotSK": current_timestamp.timestamp(),
+            "Page": page,
+            "Pages": len(snapshot_pages),
+            "TTL": expiration_timestamp.timestamp()
+        }
+        item.update(snapshot)
+        items.append(marshal(item))
+    return items
@@ -0,0 +1,45 @@
+import boto3
+import concurrent.futures
+import datetime
+import os
+
+from pipeline_metrics import PipelineMetrics
+from record_archive import compact_partition, list_partitions
+
+COMPACTION_PARALLELISM = int(os.environ.get('COMPACTION_PARALLELISM', '16'))
+# deferred runs are stored up to a day late, so every day is compacted twice
+COMPACTION_DAYS = int(os.environ.get('COMPACTION_DAYS', '2'))
+
+s3_client = boto3.client('s3')
+# phase timings and API call counts, one Embedded Metric Format line per invocation
+metrics = PipelineMetrics('ArchiveCompactor')
+metrics.instrument(s3_client)
+
+def lambda_handler(event, context):
+    # failed invocations get their metrics line too
+    metrics.reset('Compact')
+    try:
+        return compact_days(event)
+    finally:
+        metrics.emit()
+
+def compact_days(event):
+    # {"Days": ["2020-12-03"]} compacts the given days, otherwise the last COMPACTION_DAYS full days
+    if "Days" in event:
+        days = [datetime.date.fromisoformat(day) for day in event["Days"]]
+    else:
+        today = datetime.datetime.now().date()
+        days = [today - datetime.timedelta(days=offset) for offset in range(1, COMPACTION_DAYS + 1)]
+
+    metrics.set_property('Days', [day.isoformat() for day in days])
+    bucket = os.environ['BACKUP_BUCKET_NAME']
+    with metrics.phase('List'):
+        prefixes = [prefix for day in days for prefix in list_partitions(s3_client, bucket, day)]
+    merged = 0
+    with metrics.phase('Compact'):
+        if prefixes:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=min(COMPACTION_PARALLELISM, len(prefixes))) as executor:
+                merged = sum(executor.map(lambda prefix: compact_partition(s3_client, bucket, prefix), prefixes))
+    metrics.count('Partitions', len(prefixes))
+    metrics.count('MergedFiles', merged)
+    return {"Days": [day.isoformat() for day in days], "Partitions": len(prefixes), "Merged": merged}
@@ -1,150 +1,146 @@
 import boto3
 import datetime
+import json
 import os
+from botocore.config import Config
 
-dynamodb_client = boto3.client('dynamodb')
+from aggregate_store import BUCKET_SECONDS, aggregate_pk, bucket_start, merge_aggregates
+from benchmark_targets import discover_emulator_targets, discover_targets, partition_suffix
+from cost_model import PRICES
+from dynamodb_codec import unmarshal
+from dynamodb_reader import query_partitions
+from dynamodb_writer import batch_write_items
+from load_stats import LOAD_TYPE, summarize_load
+from pipeline_metrics import PipelineMetrics
+from summary_stats import summarize_records
+from table_items import PERIODS, build_summary_items
+
+QUERY_PARALLELISM = int(os.environ.get('QUERY_PARALLELISM', '8'))
+# 'records' recomputes the daily summary from raw records, 'aggregates' merges the hourly aggregates
+SUMMARY_SOURCE = os.environ.get('SUMMARY_SOURCE', 'records')
+# JSON overrides of cost_model.PRICES, e.g. another region's prices
+PRICING = dict(PRICES, **json.loads(os.environ.get('PRICING', '{}')))
+# the function emulator the caller also benchmarks, see tools/function_emulator.py
+EMULATOR_ENDPOINT_URL = os.environ.get('EMULATOR_ENDPOINT_URL')
+
+# DYNAMODB_ENDPOINT_URL points the client at DynamoDB Local for testing
+dynamodb_client = boto3.client('dynamodb', endpoint_url=os.environ.get('DYNAMODB_ENDPOINT_URL'),
+    config=Config(max_pool_connections=QUERY_PARALLELISM))
+tagging_client = boto3.client('resourcegroupstaggingapi')
+# phase timings and API call counts, one Embedded Metric Format line per invocation
+metrics = PipelineMetrics('ColdStartSummarizer')
+metrics.instrument(dynamodb_client, tagging_client)
+
+# the only attributes the summary needs from RECORD and AGGREGATE items
+RECORD_PROJECTION = ('Records', 'Configs')
+AGGREGATE_PROJECTION = ('Cold', 'Warm', 'Configs')
+LOAD_PROJECTION = ('Steps', 'Configs')
 
 def lambda_handler(event, context):
-    memory_size_list = ["128", "512", "1024", "2048"]
-    runtime_list = ['python3.8', 'nodejs12.x', 'java11', 'go1.x', 'ruby2.7', 'dotnetcore3.1']
-    provider_list = ['AWS']
-
-    # partition key
-    dynamodb_pk = []
-    for provider in provider_list:
-        for mem in memory_size_list:
-            for runtime in runtime_list:
-                dynamodb_pk.append('RECORD|' + provider + '|' + runtime + '|' + mem)
-    
+    # scheduled rules pass {"Period": "week"} or {"Period": "month"}, the daily rule passes nothing
+    period = (event or {}).get('Period', 'day')
+    # the period is the metrics' Action, failed invocations get their metrics line too
+    metrics.reset(period)
+    try:
+        summarize_period(period)
+    finally:
+        metrics.emit()
+
+def summarize_period(period):
+    period_length = PERIODS[period][1]
+
+    # partition key, without its RECORD|/AGGREGATE| prefix
+    with metrics.phase('Discover'):
+        targets = discover_targets(tagging_client, os.environ['BENCHMARK_MATRIX'])
+        if EMULATOR_ENDPOINT_URL:
+            targets += discover_emulator_targets(EMULATOR_ENDPOINT_URL, os.environ['BENCHMARK_MATRIX'])
+        partition_list = sorted({partition_suffix(target) for target in targets})
+
     # sort key
     current_timestamp = datetime.datetime.now()
-    one_day_ago_timestamp = current_timestamp - datetime.timedelta(days=1)
-
-    summaries = {}
-    cold_timestamp_label = [
-        'AWS::Lambda::start',
-        'AWS::Lambda::Function::Initialization::start',
-        'AWS::Lambda::Function::Initialization::end',
-        'AWS::Lambda::Function::start',
-        'AWS::Lambda::Function::Invocation::start',
-        'AWS::Lambda::Function::Invocation::end',
-        'AWS::Lambda::Function::Overhead::start',
-        'AWS::Lambda::Function::Overhead::end',
-        'AWS::Lambda::Function::end',
-        'AWS::Lambda::end'
-    ]
-    warm_timestamp_label = [
-        'AWS::Lambda::start',
-        'AWS::Lambda::Function::start',
-        'AWS::Lambda::Function::Invocation::start',
-        'AWS::Lambda::Function::Invocation::end',
-        'AWS::Lambda::Function::Overhead::start',
-        'AWS::Lambda::Function::Overhead::end',
-        'AWS::Lambda::Function::end',
-        'AWS::Lambda::end'
-    ]
+    period_start_timestamp = current_timestamp - period_length
+
+    # only a daily summary can be recomputed from raw records, longer periods always merge aggregates
+    with metrics.phase('Summarize'):
+        if period == 'day' and SUMMARY_SOURCE == 'records':
+            partition_stats = summarize_partition_records(partition_list, period_start_timestamp, current_timestamp)
+        else:
+            partition_stats = summarize_partition_aggregates(partition_list, period_start_timestamp, current_timestamp)
+    with metrics.phase('LoadSummarize'):
+        load_summaries = summarize_partition_load(partition_list, period_start_timestamp, current_timestamp)
+
+    summary_items = build_summary_items(period, partition_stats, current_timestamp, load_summaries, PRICING)
+    with metrics.phase('DynamoDBWrite'):
+        store_data_to_dynamodb(summary_items)
+    metrics.count('Partitions', len(partition_stats))
+    metrics.count('SummaryItems', len(summary_items))
+
+def summarize_partition_records(partition_list, start_timestamp, end_timestamp):
+    # exact statistics over every raw record of the period
+    dynamodb_pk = ['RECORD|' + partition for partition in partition_list]
+    partitions = query_partitions(
+        dynamodb_client, os.environ['TABLE_NAME'], dynamodb_pk,
+        sk_range=(start_timestamp.timestamp(), end_timestamp.timestamp()),
+        projection=RECORD_PROJECTION,
+        max_workers=QUERY_PARALLELISM)
+    record_partition_metrics(dynamodb_pk, partitions)
+
+    partition_stats = []
     for pk in dynamodb_pk:
-        result = dynamodb_client.query(
-            TableName=os.environ['TABLE_NAME'],
-            KeyConditionExpression="#pk = :pk and #sk BETWEEN :start and :end",
-            ExpressionAttributeNames={
-                "#pk": "PK",
-                "#sk": "SK"
-            },
-            ExpressionAttributeValues={
-                ":pk": { "S" : pk },
-                ":start": { "N" : str(one_day_ago_timestamp.timestamp()) },
-                ":end": { "N" : str(current_timestamp.timestamp()) }
-            }
-        )
-        if result['Count'] == 0:
+        if not partitions[pk].items:
             continue
-        cold_item_data_sum = {}
-        warm_item_data_sum = {}
-        cold_item_count = 0
-        warm_item_count = 0
-        for item in result['Items']:
-            start_timestamp = timestamp_extract(item, 'AWS::Lambda::start')
-            if 'AWS::Lambda::Function::Initialization::start' in item['Records']['M']:
-                cold_item_count += 1
-                for label in cold_timestamp_label:
-                    cold_item_data_sum[label] = cold_item_data_sum.get(label, datetime.timedelta(0)) + (timestamp_extract(item, label) - start_timestamp)
-            else:
-                warm_item_count += 1
-                for label in warm_timestamp_label:
-                    warm_item_data_sum[label] = warm_item_data_sum.get(label, datetime.timedelta(0)) + (timestamp_extract(item, label) - start_timestamp)
-        for label in cold_item_data_sum:
-            cold_item_data_sum[label] /= cold_item_count
-        for label in warm_item_data_sum:
-            warm_item_data_sum[label] /= warm_item_count
-        summaries['Cold'] = cold_item_data_sum
-        summaries['Warm'] = warm_item_data_sum
-        store_data_to_dynamodb(
-            summaries,
-            result['Items'][0]['Configs']['M']['Runtime']['S'],
-            str(result['Items'][0]['Configs']['M']['MemorySize']['N']),
-            result['Items'][0]['Configs']
-        )
-        
-
-def store_data_to_dynamodb(summary, runtime, memory_size, configs):
-    current_timestamp = datetime.datetime.now()
-    expiration_timestamp = current_timestamp + datetime.timedelta(days=3*365)
-    item = {
-        "PK": 'SUMMARY|AWS|' + runtime + '|' + memory_size,
-        "SK": current_timestamp.timestamp(),
-        "Type": "SUMMARY",
-        "Summary": summary,
-        "Configs": configs,
-        "TTL": expiration_timestamp.timestamp()
-    }
-    dynamodb_client.put_item(
-        TableName=os.environ['TABLE_NAME'],
-        Item=dict_to_item(item)
-    )
-
-
-
-def timestamp_extract(item, key):
-    try:
-        return datetime.datetime.fromtimestamp(float(item['Records']['M'][key]['N']))
-    except:
-        return datetime.datetime.fromtimestamp(float(item['Records']['M']["AWS::Lambda::start"]['N']))
-
-def dict_to_item(raw):
-    if type(raw) is dict:
-        resp = {}
-        for k,v in raw.items():
-            if type(v) is str:
-                resp[k] = {
-                    'S': v
-                }
-            elif type(v) is int or type(v) is float:
-                resp[k] = {
-                    'N': str(v)
-                }
-            elif type(v) is dict:
-                resp[k] = {
-                    'M': dict_to_item(v)
-                }
-            elif type(v) is list:
-                resp[k] = []
-                for i in v:
-                    resp[k].append(dict_to_item(i))
-            elif type(v) is datetime.timedelta:
-                resp[k] = {
-                    'N': str(v.total_seconds())
-                }
-        return resp
-    elif type(raw) is str:
-        return {
-            'S': raw
-        }
-    elif type(raw) is int or type(raw) is float:
-        return {
-            'N': str(raw)
-        }
-    
+        items = [unmarshal(item) for item in partitions[pk].items]
+        partition_stats.append((summarize_records([item['Records'] for item in items]), items[0]['Configs']))
+    return partition_stats
+
+def summarize_partition_aggregates(partition_list, start_timestamp, end_timestamp):
+    # merge the hourly aggregates of the period, percentiles are sketch estimates
+    dynamodb_pk = [aggregate_pk(partition) for partition in partition_list]
+    # hours that started inside the period
+    first_bucket = bucket_start(start_timestamp.timestamp() + BUCKET_SECONDS - 1)
+    partitions = query_partitions(
+        dynamodb_client, os.environ['TABLE_NAME'], dynamodb_pk,
+        sk_range=(first_bucket, end_timestamp.timestamp()),
+        projection=AGGREGATE_PROJECTION,
+        max_workers=QUERY_PARALLELISM)
+    record_partition_metrics(dynamodb_pk, partitions)
+
+    partition_stats = []
+    for pk in dynamodb_pk:
+        if not partitions[pk].items:
+            continue
+        items = [unmarshal(item) for item in partitions[pk].items]
+        # the latest hour carries the current configuration
+        partition_stats.append((merge_aggregates(items).summary(), items[-1]['Configs']))
+    return partition_stats
+
+def summarize_partition_load(partition_list, start_timestamp, end_timestamp):
+    # {partition: {concurrency: step summary}} over the LOAD items of the period, see cold_start_caller/load_runner.py
+    dynamodb_pk = [LOAD_TYPE + '|' + partition for partition in partition_list]
+    partitions = query_partitions(
+        dynamodb_client, os.environ['TABLE_NAME'], dynamodb_pk,
+        sk_range=(start_timestamp.timestamp(), end_timestamp.timestamp()),
+        projection=LOAD_PROJECTION,
+        max_workers=QUERY_PARALLELISM)
+
+    load_summaries = {}
+    for partition, pk in zip(partition_list, dynamodb_pk):
+        if partitions[pk].items:
+            load_summaries[partition] = summarize_load([unmarshal(item) for item in partitions[pk].items])
+    return load_summaries
+
+def record_partition_metrics(dynamodb_pk, partitions):
+    # totals of the partition reads as metrics, each partition's reads as a property of the
+    # invocation's metrics line
+    for pk in dynamodb_pk:
+        metrics.count('QueryItems', len(partitions[pk].items))
+        metrics.count('QueryPages', partitions[pk].pages)
+        metrics.count('QueryConsumedCapacity', partitions[pk].consumed_capacity)
+    metrics.set_property('PartitionReads', [partitions[pk].metrics() for pk in dynamodb_pk])
+
+def store_data_to_dynamodb(summary_items):
+    batch_write_items(dynamodb_client, os.environ['TABLE_NAME'], summary_items)
+
 
 if __name__ == "__main__":
     lambda_handler(None, None)
\ No newline at end of file
@@ -0,0 +1,58 @@
+import numpy as np
+
+from record_columns import COLD_LABELS, COLUMN_NAMES, COMPONENTS, PHASES, START_LABEL, TIMESTAMP_LABELS
+
+PERCENTILES = (50, 90, 99)
+
+START_COLUMN = TIMESTAMP_LABELS.index(START_LABEL)
+COLD_COLUMNS = [TIMESTAMP_LABELS.index(label) for label in COLD_LABELS]
+PHASE_START_COLUMNS = [TIMESTAMP_LABELS.index(phase + '::start') for phase in PHASES]
+PHASE_END_COLUMNS = [TIMESTAMP_LABELS.index(phase + '::end') for phase in PHASES]
+MINUEND_COLUMNS = [COLUMN_NAMES.index(minuend) for _, minuend, _ in COMPONENTS]
+SUBTRAHEND_COLUMNS = [COLUMN_NAMES.index(subtrahend) for _, _, subtrahend in COMPONENTS]
+
+
+def records_matrix(records_list):
+    # items x labels array of epoch seconds, NaN where a record has no such label
+    nan = np.nan
+    return np.array(
+        [[records.get(label, nan) for label in TIMESTAMP_LABELS] for records in records_list],
+        dtype=np.float64).reshape(len(records_list), len(TIMESTAMP_LABELS))
+
+
+def summarize_records(records_list):
+    # returns {'Cold': {column: stats}, 'Warm': {column: stats}} in seconds
+    timestamps = records_matrix(records_list)
+    offsets = timestamps - timestamps[:, START_COLUMN, np.newaxis]
+    durations = timestamps[:, PHASE_END_COLUMNS] - timestamps[:, PHASE_START_COLUMNS]
+    values = np.hstack((offsets, durations))
+    values = np.hstack((values, values[:, MINUEND_COLUMNS] - values[:, SUBTRAHEND_COLUMNS]))
+    cold = ~np.isnan(timestamps[:, COLD_COLUMNS]).all(axis=1)
+    return {
+        'Cold': column_stats(values[cold]),
+        'Warm': column_stats(values[~cold])
+    }
+
+
+def column_stats(values):
+    # statistics of every column that has at least one value, NaNs are ignored
+    counts = np.count_nonzero(~np.isnan(values), axis=0)
+    present = np.flatnonzero(counts)
+    if present.size == 0:
+        return {}
+    values = values[:, present]
+    percentiles = np.nanpercentile(values, PERCENTILES, axis=0)
+    columns = {
+        'Count': counts[present],
+        'Mean': np.nanmean(values, axis=0),
+        'StdDev': np.nanstd(values, axis=0),
+        'Min': np.nanmin(values, axis=0),
+        'Max': np.nanmax(values, axis=0)
+    }
+    for percentile, row in zip(PERCENTILES, percentiles):
+        columns['P' + str(percentile)] = row
+    columns = {stat: column.tolist() for stat, column in columns.items()}
+    return {
+        COLUMN_NAMES[column]: {stat: columns[stat][i] for stat in columns}
+        for i, column in enumerate(present.tolist())
+    }
@@ -0,0 +1,19 @@
+# The Lambda code is not a package: put the layer, the caller, the local stand-ins and the
+# tools on the path the way the Lambda runtime and benchmarks/bench_pipeline.py do.
+
+import os
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'cold_start_lambdas', 'cold_start_caller'))
+sys.path.insert(0, os.path.join(ROOT, 'cold_start_lambdas', 'cold_start_common', 'python'))
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+sys.path.insert(0, os.path.join(ROOT, 'tools'))
+
+# the handlers read their settings at import time
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ['TABLE_NAME'] = 'cold_start_benchmark_table'
+os.environ['BACKUP_BUCKET_NAME'] = 'cold-start-benchmark-backup'
+os.environ['BENCHMARK_MATRIX'] = 'cold-start-benchmark'
+os.environ['XRAY_INITIAL_DELAY_SECONDS'] = '0'
+os.environ['XRAY_WAIT_SECONDS'] = '5'
@@ -0,0 +1,104 @@
+import itertools
+
+import pytest
+
+from aggregate_store import AggregateConflictError, aggregate_pk, fold_records
+from dynamodb_codec import marshal, unmarshal
+from local_aws import LocalDynamoDB
+from record_columns import TRACE_ID_LABEL
+from running_stats import PartitionAggregate
+
+TABLE_NAME = 'cold_start_benchmark_table'
+PK = aggregate_pk('AWS|python3.8|128')
+SK = 1606780800
+CONFIGS = {'FunctionArn': 'arn:aws:lambda:us-east-1:123456789012:function:bench-python38-128', 'Runtime': 'python3.8', 'CodeSize': 299, 'MemorySize': 128}
+
+
+class ConflictingDynamoDB(LocalDynamoDB):
+    # before each of the next `conflicts` put_item calls, competing(self) writes first, as another
+    # caller folding into the same hour would. The competitor's own writes go through untouched
+    def __init__(self, competing, conflicts=1):
+        super().__init__()
+        self.competing = competing
+        self.conflicts = conflicts
+        self.interfering = False
+
+    def put_item(self, **kwargs):
+        if self.conflicts and not self.interfering:
+            self.conflicts -= 1
+            self.interfering = True
+            try:
+                self.competing(self)
+            finally:
+                self.interfering = False
+        return super().put_item(**kwargs)
+
+
+def warm_records(*trace_ids):
+    return [{TRACE_ID_LABEL: trace_id, 'AWS::Lambda::start': 0.0, 'AWS::Lambda::end': 0.05} for trace_id in trace_ids]
+
+
+def fold(dynamodb, records, **kwargs):
+    return fold_records(dynamodb, TABLE_NAME, [(PK, SK, CONFIGS, records)], 1609459200.0, base_delay=0.0, **kwargs)
+
+
+def stored_aggregate(dynamodb):
+    item = unmarshal(dynamodb.get_item(TableName=TABLE_NAME, Key=marshal({'PK': PK, 'SK': SK}))['Item'])
+    return item, PartitionAggregate.from_dict(item)
+
+
+def test_records_are_folded_into_a_new_aggregate():
+    dynamodb = LocalDynamoDB()
+    assert fold(dynamodb, warm_records('1-a', '1-b')) == 1
+    item, aggregate = stored_aggregate(dynamodb)
+    assert item['Version'] == 1
+    assert item['TraceIds'] == {'1-a', '1-b'}
+    assert aggregate.warm['AWS::Lambda::duration'].count == 2
+
+
+def test_folding_the_same_records_again_changes_nothing():
+    dynamodb = LocalDynamoDB()
+    fold(dynamodb, warm_records('1-a', '1-b'))
+    assert fold(dynamodb, warm_records('1-a', '1-b')) == 0
+    assert fold(dynamodb, warm_records('1-b', '1-c')) == 1
+    item, aggregate = stored_aggregate(dynamodb)
+    assert item['Version'] == 2
+    assert aggregate.warm['AWS::Lambda::duration'].count == 3
+
+
+def test_a_conflicting_create_rereads_and_folds_again():
+    dynamodb = ConflictingDynamoDB(lambda competitor: fold(competitor, warm_records('1-x')))
+    assert fold(dynamodb, warm_records('1-a', '1-b')) == 1
+    item, aggregate = stored_aggregate(dynamodb)
+    # the competitor created the aggregate, the retry folded on top of it
+    assert item['Version'] == 2
+    assert item['TraceIds'] == {'1-a', '1-b', '1-x'}
+    assert aggregate.warm['AWS::Lambda::duration'].count == 3
+
+
+def test_a_conflicting_update_rereads_and_folds_again():
+    dynamodb = ConflictingDynamoDB(lambda competitor: fold(competitor, warm_records('1-x', '1-y')), conflicts=0)
+    fold(dynamodb, warm_records('1-a'))
+    dynamodb.conflicts = 1
+    assert fold(dynamodb, warm_records('1-b')) == 1
+    item, aggregate = stored_aggregate(dynamodb)
+    assert item['Version'] == 3
+    assert item['TraceIds'] == {'1-a', '1-b', '1-x', '1-y'}
+    assert aggregate.warm['AWS::Lambda::duration'].count == 4
+
+
+def test_records_the_competitor_already_folded_are_not_counted_twice():
+    dynamodb = ConflictingDynamoDB(lambda competitor: fold(competitor, warm_records('1-a')))
+    assert fold(dynamodb, warm_records('1-a', '1-b')) == 1
+    item, aggregate = stored_aggregate(dynamodb)
+    assert item['TraceIds'] == {'1-a', '1-b'}
+    assert aggregate.warm['AWS::Lambda::duration'].count == 2
+
+
+def test_an_aggregate_that_keeps_changing_raises():
+    trace_ids = itertools.count()
+    dynamodb = ConflictingDynamoDB(lambda competitor: fold(competitor, warm_records('1-x%d' % next(trace_ids))), conflicts=3)
+    with pytest.raises(AggregateConflictError):
+        fold(dynamodb, warm_records('1-a'), max_attempts=3)
+    item, _ = stored_aggregate(dynamodb)
+    assert '1-a' not in item['TraceIds']
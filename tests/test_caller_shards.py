@@ -0,0 +1,113 @@
+import collections
+import datetime
+import os
+
+import pytest
+
+import ColdStartCaller
+from config_cache import ConfigCache
+from dynamodb_codec import unmarshal
+from local_aws import LocalCallerStateMachine, LocalDynamoDB, LocalLambda, LocalS3, LocalTagging, LocalXRay, function_arn
+
+RUNTIMES = {'python3.8': 299, 'nodejs12.x': 291, 'java11': 1803, 'go1.x': 2486547}
+MEMORY_SIZES = (128, 512, 1024)
+
+
+@pytest.fixture
+def caller(monkeypatch):
+    # the caller's clients swapped for stand-ins over 12 functions, one per runtime and memory size
+    functions = {
+        'bench-%s-%d' % (runtime.replace('.', ''), memory_size): {'Runtime': runtime, 'MemorySize': memory_size, 'CodeSize': code_size}
+        for runtime, code_size in RUNTIMES.items() for memory_size in MEMORY_SIZES
+    }
+    xray = LocalXRay()
+    lambda_ = LocalLambda(functions, xray)
+    dynamodb = LocalDynamoDB()
+    for name, client in (('lambda_client', lambda_), ('lambda_invoke_client', lambda_), ('xray_client', xray),
+                         ('tagging_client', LocalTagging(lambda_, os.environ['BENCHMARK_MATRIX'])), ('dynamodb_client', dynamodb), ('s3_client', LocalS3())):
+        monkeypatch.setattr(ColdStartCaller, name, client)
+    monkeypatch.setattr(ColdStartCaller, 'config_cache', ConfigCache(ColdStartCaller.CONFIG_MANIFEST_KEY))
+    monkeypatch.setattr(ColdStartCaller, 'EMULATOR_ENDPOINT_URL', None)
+    monkeypatch.setattr(ColdStartCaller, 'SHARD_SIZE', 5)
+    return functions, dynamodb
+
+
+def items_of_type(dynamodb, item_type):
+    table = dynamodb.tables[os.environ['TABLE_NAME']]
+    return [unmarshal(item) for partition in table.values() for item in partition.values() if item['Type']['S'] == item_type]
+
+
+def test_plan_splits_the_matrix_into_enough_shards(caller):
+    plan = ColdStartCaller.lambda_handler({'Action': 'Plan'}, None)
+    # 12 functions at 5 per shard
+    assert [shard['Index'] for shard in plan['Shards']] == [0, 1, 2]
+    assert {shard['Count'] for shard in plan['Shards']} == {3}
+    assert {shard['RunTimestamp'] for shard in plan['Shards']} == {plan['RunTimestamp']}
+
+
+def test_shards_cover_every_target_exactly_once(caller):
+    functions, dynamodb = caller
+    plan = ColdStartCaller.lambda_handler({'Action': 'Plan'}, None)
+    statuses = [ColdStartCaller.lambda_handler(shard, None) for shard in plan['Shards']]
+    assert sorted(status['Functions'] for status in statuses) == [4, 4, 4]
+    invoked = collections.Counter(item['Configs']['FunctionArn'] for item in items_of_type(dynamodb, 'RECORD'))
+    assert invoked == collections.Counter(function_arn(name) for name in functions)
+
+
+def test_shards_spread_runtimes_instead_of_splitting_them_in_blocks(caller):
+    _, dynamodb = caller
+    plan = ColdStartCaller.lambda_handler({'Action': 'Plan'}, None)
+    shard = ColdStartCaller.lambda_handler(plan['Shards'][0], None)
+    runtimes = {item['Configs']['Runtime'] for item in items_of_type(dynamodb, 'RECORD')}
+    assert shard['Functions'] == 4
+    assert len(runtimes) > 1
+
+
+def test_finish_stores_the_totals_of_every_shard(caller):
+    functions, dynamodb = caller
+    status = LocalCallerStateMachine(ColdStartCaller.lambda_handler).start_execution()
+    assert status['Shards'] == 3
+    assert status['Functions'] == status['Collected'] == len(functions)
+    assert status['Failed'] == 0 and status['FailedShards'] == {}
+    [run] = items_of_type(dynamodb, 'RUN')
+    assert run['Functions'] == len(functions)
+
+
+def test_a_failed_shard_still_reaches_finish(caller, monkeypatch):
+    functions, dynamodb = caller
+    run_benchmark = ColdStartCaller.run_benchmark
+
+    def failing_shard(targets, current_timestamp, deferred_suffix="", s3_suffix=""):
+        if deferred_suffix == '|1':
+            raise RuntimeError('shard 1 crashed')
+        return run_benchmark(targets, current_timestamp, deferred_suffix, s3_suffix)
+
+    monkeypatch.setattr(ColdStartCaller, 'run_benchmark', failing_shard)
+    # Finish records the run, then fails it so the error alarm fires
+    with pytest.raises(RuntimeError, match='Shard\\(s\\) failed'):
+        LocalCallerStateMachine(ColdStartCaller.lambda_handler).start_execution()
+    [run] = items_of_type(dynamodb, 'RUN')
+    assert run['FailedShards'] == {'1': 'RuntimeError'}
+    assert run['Shards'] == 3
+    # the other shards' results are kept
+    assert run['Functions'] == run['Collected'] == len(functions) - 4
+    assert len(items_of_type(dynamodb, 'RECORD')) == len(functions) - 4
+
+
+def test_samples_of_a_deleted_function_are_dropped_with_their_deferred_run(caller):
+    functions, dynamodb = caller
+    lambda_ = ColdStartCaller.lambda_client
+    # a run deferred before bench-go1x-1024 was deleted, its trace arrived since
+    response = lambda_.invoke(FunctionName=function_arn('bench-go1x-1024'))
+    trace_id = response['ResponseMetadata']['HTTPHeaders']['x-amzn-trace-id'][len('Root='):].split(';')[0]
+    del functions['bench-go1x-1024']
+    invocation = {'Function': function_arn('bench-go1x-1024'), 'Sample': 0, 'ForcedCold': True, 'TraceId': trace_id,
+                  'ClientLatency': 0.5, 'Sent': 0.0, 'Received': 0.5, 'Attempts': 1}
+    deferred_pk = ColdStartCaller.DEFERRED_PK_PREFIX + 'AWS'
+    ColdStartCaller.store_deferred_run(deferred_pk, datetime.datetime.now() - datetime.timedelta(minutes=10), {function_arn('bench-go1x-1024') + '|0': invocation})
+
+    ColdStartCaller.lambda_handler({}, None)
+
+    invoked = {item['Configs']['FunctionArn'] for item in items_of_type(dynamodb, 'RECORD')}
+    assert invoked == {function_arn(name) for name in functions}
+    assert items_of_type(dynamodb, 'DEFERRED') == []
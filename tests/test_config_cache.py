@@ -0,0 +1,107 @@
+import json
+
+from benchmark_targets import BenchmarkTarget
+from config_cache import ConfigCache
+from local_aws import LocalLambda, LocalS3, LocalXRay, function_arn
+
+BUCKET_NAME = 'cold-start-benchmark-backup'
+MANIFEST_KEY = 'config/functions.json'
+
+
+def local_lambda():
+    # two benchmark targets, a workload variant among them, and a function of someone else
+    return LocalLambda({
+        'bench-python38-128': {'Runtime': 'python3.8', 'MemorySize': 128, 'CodeSize': 299},
+        'bench-python38-128-pad10': {'Runtime': 'python3.8', 'MemorySize': 128, 'CodeSize': 10486059, 'Environment': {'Variables': {
+            'WORKLOAD_NAME': 'pad10', 'WORKLOAD_PADDING_MB': '10', 'COLD_START_NONCE': 'abc'}}},
+        'billing-api': {'Runtime': 'nodejs12.x', 'MemorySize': 512, 'CodeSize': 1024, 'Environment': {'Variables': {'DB_PASSWORD': 'secret'}}}
+    }, LocalXRay())
+
+
+def target(name, memory_size=128, code_digest='v1'):
+    return BenchmarkTarget(function_arn(name), 'AWS', 'python3.8', memory_size, '', 0, '', code_digest)
+
+
+def discovered(*targets):
+    return [t.function_arn for t in targets], {t.function_arn: t for t in targets}
+
+
+def test_the_listing_keeps_only_the_targets_and_their_benchmark_variables():
+    lambda_, s3 = local_lambda(), LocalS3()
+    functions, targets = discovered(target('bench-python38-128'), target('bench-python38-128-pad10'))
+    configs = ConfigCache(MANIFEST_KEY).lookup(lambda_, s3, BUCKET_NAME, functions, targets)
+    assert configs[function_arn('bench-python38-128-pad10')]['Environment'] == {'Variables': {'WORKLOAD_NAME': 'pad10', 'WORKLOAD_PADDING_MB': '10'}}
+    assert 'Environment' not in configs[function_arn('bench-python38-128')]
+    manifest = s3.objects[(BUCKET_NAME, MANIFEST_KEY)]
+    assert sorted(json.loads(manifest)['Configs']) == sorted(functions)
+    assert b'billing-api' not in manifest and b'secret' not in manifest
+
+
+def test_a_covered_lookup_makes_no_calls():
+    lambda_, s3 = local_lambda(), LocalS3()
+    functions, targets = discovered(target('bench-python38-128'))
+    cache = ConfigCache(MANIFEST_KEY)
+    cache.lookup(lambda_, s3, BUCKET_NAME, functions, targets)
+    calls = sum(lambda_.calls.values()) + sum(s3.calls.values())
+    cache.lookup(lambda_, s3, BUCKET_NAME, functions, targets)
+    assert sum(lambda_.calls.values()) + sum(s3.calls.values()) == calls
+
+
+def test_a_redeployed_target_is_listed_again():
+    lambda_, s3 = local_lambda(), LocalS3()
+    cache = ConfigCache(MANIFEST_KEY)
+    cache.lookup(lambda_, s3, BUCKET_NAME, *discovered(target('bench-python38-128')))
+    lambda_.functions['bench-python38-128'].update(MemorySize=256, CodeSize=512)
+    configs = cache.lookup(lambda_, s3, BUCKET_NAME, *discovered(target('bench-python38-128', memory_size=256, code_digest='v2')))
+    assert lambda_.calls['ListFunctions'] == 2
+    assert configs[function_arn('bench-python38-128')]['MemorySize'] == 256
+    assert configs[function_arn('bench-python38-128')]['CodeSize'] == 512
+
+
+def test_new_code_is_listed_again_at_the_same_memory_size():
+    lambda_, s3 = local_lambda(), LocalS3()
+    cache = ConfigCache(MANIFEST_KEY)
+    cache.lookup(lambda_, s3, BUCKET_NAME, *discovered(target('bench-python38-128')))
+    cache.lookup(lambda_, s3, BUCKET_NAME, *discovered(target('bench-python38-128', code_digest='v2')))
+    cache.lookup(lambda_, s3, BUCKET_NAME, *discovered(target('bench-python38-128', code_digest='v2')))
+    assert lambda_.calls['ListFunctions'] == 2
+
+
+def test_a_function_missing_from_the_listing_is_not_listed_again():
+    lambda_, s3 = local_lambda(), LocalS3()
+    cache = ConfigCache(MANIFEST_KEY)
+    functions, targets = discovered(target('bench-python38-128'))
+    cache.lookup(lambda_, s3, BUCKET_NAME, functions, targets)
+    # e.g. a deferred run of a function deleted since
+    functions.append(function_arn('bench-python38-512'))
+    assert not cache.covers(functions, targets)
+    cache.refresh(lambda_, s3, BUCKET_NAME, functions, targets)
+    assert cache.missing == {function_arn('bench-python38-512')}
+    assert cache.covers(functions, targets)
+    # marked in the manifest for the other shards too
+    shard_cache = ConfigCache(MANIFEST_KEY)
+    shard_cache.load(s3, BUCKET_NAME)
+    assert shard_cache.covers(functions, targets)
+    assert lambda_.calls['ListFunctions'] == 2
+
+
+def test_a_manifest_of_an_earlier_version_is_ignored():
+    s3 = LocalS3()
+    s3.put_object(Body=json.dumps({'Refreshed': 4102444800.0, 'Configs': {}}).encode('UTF-8'), Bucket=BUCKET_NAME, Key=MANIFEST_KEY)
+    cache = ConfigCache(MANIFEST_KEY)
+    cache.load(s3, BUCKET_NAME)
+    assert cache.refreshed == 0.0
+
+
+def test_a_deleted_function_is_left_out_of_the_lookup():
+    lambda_, s3 = local_lambda(), LocalS3()
+    cache = ConfigCache(MANIFEST_KEY)
+    functions, targets = discovered(target('bench-python38-128'))
+    deleted = function_arn('bench-python38-512')
+    configs = cache.lookup(lambda_, s3, BUCKET_NAME, functions + [deleted], targets)
+    assert list(configs) == functions
+    assert cache.missing == {deleted}
+    # asked for again on its own every time, still without listing again
+    assert list(cache.lookup(lambda_, s3, BUCKET_NAME, functions + [deleted], targets)) == functions
+    assert lambda_.calls['ListFunctions'] == 1
+    assert lambda_.calls['GetFunctionConfiguration'] == 2
@@ -0,0 +1,151 @@
+import base64
+import decimal
+import enum
+
+import pytest
+from boto3.dynamodb.types import Binary, TypeDeserializer, TypeSerializer
+
+from dynamodb_codec import marshal, marshal_value, unmarshal, unmarshal_value
+
+
+class Color(enum.IntEnum):
+    RED = 1
+
+
+def sorted_sets(value):
+    # a marshalled value with set members in a stable order, sets do not keep one
+    for tag in ('SS', 'NS', 'BS'):
+        if tag in value:
+            return {tag: sorted(value[tag])}
+    if 'M' in value:
+        return {'M': {key: sorted_sets(inner) for key, inner in value['M'].items()}}
+    if 'L' in value:
+        return {'L': [sorted_sets(inner) for inner in value['L']]}
+    return value
+
+
+def plain(value):
+    # TypeDeserializer output with Binary unwrapped
+    if isinstance(value, Binary):
+        return value.value
+    if isinstance(value, dict):
+        return {key: plain(inner) for key, inner in value.items()}
+    if isinstance(value, list):
+        return [plain(inner) for inner in value]
+    if isinstance(value, set):
+        return {plain(inner) for inner in value}
+    return value
+
+
+# values boto3 can serialize too: no floats
+BOTO3_VALUES = [
+    'Hello from Lambda!',
+    '',
+    0,
+    -17,
+    2 ** 63,
+    decimal.Decimal('0.1'),
+    decimal.Decimal('1.10'),
+    decimal.Decimal('-1.5E+10'),
+    decimal.Decimal('123456789012345678901234567890.12345678'),
+    True,
+    False,
+    None,
+    b'\x00\xffbinary',
+    bytearray(b'mutable'),
+    [],
+    {},
+    [1, 'a', None, [True, {'x': []}]],
+    {'Configs': {'Runtime': 'python3.8', 'MemorySize': 128, 'Workload': {'PaddingMB': 50}}, 'Empty': {}},
+    {'a', 'b'},
+    {1, 2, decimal.Decimal('2.5')},
+    {b'a', b'b'},
+    frozenset({'c'}),
+    (1, 2),
+]
+
+
+@pytest.mark.parametrize('value', BOTO3_VALUES, ids=repr)
+def test_marshalling_matches_boto3(value):
+    assert sorted_sets(marshal_value(value)) == sorted_sets(TypeSerializer().serialize(value))
+
+
+@pytest.mark.parametrize('value', BOTO3_VALUES, ids=repr)
+def test_unmarshalling_matches_boto3(value):
+    raw = TypeSerializer().serialize(value)
+    assert unmarshal_value(raw, number=decimal.Decimal) == plain(TypeDeserializer().deserialize(raw))
+
+
+def test_bool_is_not_a_number():
+    assert marshal_value(True) == {'BOOL': True}
+    assert marshal_value(False) == {'BOOL': False}
+    assert marshal_value(1) == {'N': '1'}
+    assert unmarshal_value({'BOOL': False}) is False
+    with pytest.raises(TypeError):
+        marshal_value({True, False})
+
+
+def test_none_is_null():
+    assert marshal_value(None) == {'NULL': True}
+    assert unmarshal_value({'NULL': True}) is None
+    assert unmarshal({'Configs': {'M': {'Workload': {'NULL': True}}}}) == {'Configs': {'Workload': None}}
+
+
+def test_floats_keep_their_precision():
+    for value in (0.1, 1 / 3, 1e-300, 1.7976931348623157e308, -2.5e-7, 1606980000.123456):
+        raw = marshal_value(value)
+        assert unmarshal_value(raw) == value
+        assert type(unmarshal_value(raw)) is float
+    assert marshal_value(0.1) == {'N': '0.1'}
+
+
+def test_numbers_without_fraction_read_back_as_int():
+    assert unmarshal_value({'N': '128'}) == 128 and type(unmarshal_value({'N': '128'})) is int
+    assert unmarshal_value({'N': str(2 ** 70)}) == 2 ** 70
+    assert type(unmarshal_value({'N': '1E+3'})) is float
+
+
+def test_decimals_read_back_exactly():
+    value = decimal.Decimal('3.14159265358979323846264338327950288')
+    assert unmarshal_value(marshal_value(value), number=decimal.Decimal) == value
+    assert unmarshal({'Sum': {'M': {'Latency': {'N': '0.30000000000000004'}}}}, number=decimal.Decimal) == {
+        'Sum': {'Latency': decimal.Decimal('0.30000000000000004')}}
+
+
+@pytest.mark.parametrize('value', [float('nan'), float('inf'), -float('inf'), decimal.Decimal('NaN'), decimal.Decimal('Infinity')], ids=repr)
+def test_non_finite_numbers_are_rejected(value):
+    with pytest.raises(ValueError):
+        marshal_value(value)
+
+
+def test_empty_and_mixed_sets_are_rejected():
+    with pytest.raises(ValueError):
+        marshal_value(set())
+    with pytest.raises(TypeError):
+        marshal_value({'a', 1})
+
+
+def test_sets_round_trip():
+    assert unmarshal_value(marshal_value({'a', 'b'})) == {'a', 'b'}
+    assert unmarshal_value(marshal_value({1, 2.5})) == {1, 2.5}
+    assert unmarshal_value(marshal_value(frozenset({b'a', b'b'}))) == {b'a', b'b'}
+    assert unmarshal_value({'NS': ['1', '2.5']}, number=decimal.Decimal) == {decimal.Decimal('1'), decimal.Decimal('2.5')}
+
+
+def test_binary_from_json_is_base64():
+    # raw JSON from the API and the S3 backups carries base64
+    assert unmarshal_value({'B': base64.b64encode(b'\x00\xff').decode('ascii')}) == b'\x00\xff'
+    assert unmarshal_value({'BS': [base64.b64encode(b'a').decode('ascii')]}) == {b'a'}
+
+
+def test_nested_containers_round_trip():
+    item = {'PK': 'RECORD|AWS|python3.8|128', 'SK': 1606980000.5, 'List': [[], [{}], [1, [2, [3]]]],
+            'Map': {'Empty': {}, 'Deep': {'Deeper': {'Value': 'x', 'Tags': {'a'}}}}, 'Flag': True, 'Nothing': None}
+    assert unmarshal(marshal(item)) == item
+
+
+def test_subclasses_use_their_base_encoder():
+    assert marshal_value(Color.RED) == {'N': '1'}
+    assert marshal_value(type('Name', (str,), {})('x')) == {'S': 'x'}
+    with pytest.raises(TypeError):
+        marshal_value(object())
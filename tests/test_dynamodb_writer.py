@@ -0,0 +1,72 @@
+import pytest
+
+from dynamodb_codec import marshal
+from dynamodb_writer import MAX_ITEMS_PER_BATCH, UnprocessedItemsError, batch_delete_keys, batch_write_items
+from local_aws import LocalDynamoDB
+
+TABLE_NAME = 'cold_start_benchmark_table'
+
+
+def record_items(count):
+    return [marshal({'PK': 'RECORD|AWS|python3.8|128', 'SK': float(index), 'Type': 'RECORD'}) for index in range(count)]
+
+
+def stored_sks(dynamodb):
+    return sorted(sk for partition in dynamodb.tables[TABLE_NAME].values() for sk in partition)
+
+
+def test_items_are_written_in_batches_of_25():
+    dynamodb = LocalDynamoDB()
+    calls = batch_write_items(dynamodb, TABLE_NAME, record_items(60))
+    # the stand-in rejects batches over 25 requests like DynamoDB
+    assert calls == 3 == -(-60 // MAX_ITEMS_PER_BATCH)
+    assert stored_sks(dynamodb) == [float(index) for index in range(60)]
+
+
+def test_no_items_make_no_calls():
+    dynamodb = LocalDynamoDB()
+    assert batch_write_items(dynamodb, TABLE_NAME, []) == 0
+    assert dynamodb.calls['BatchWriteItem'] == 0
+
+
+def test_unprocessed_items_are_retried_until_written():
+    dynamodb = LocalDynamoDB(batch_write_limit=10)
+    calls = batch_write_items(dynamodb, TABLE_NAME, record_items(25), base_delay=0.0)
+    # 10 of the 25 requests get through per call
+    assert calls == 3
+    assert stored_sks(dynamodb) == [float(index) for index in range(25)]
+
+
+def test_unprocessed_items_of_concurrent_batches_are_retried():
+    dynamodb = LocalDynamoDB(batch_write_limit=7)
+    calls = batch_write_items(dynamodb, TABLE_NAME, record_items(100), max_workers=4, base_delay=0.0)
+    # four batches of 25 requests take four calls each
+    assert calls == 16
+    assert stored_sks(dynamodb) == [float(index) for index in range(100)]
+
+
+def test_items_still_unprocessed_after_the_last_attempt_raise():
+    dynamodb = LocalDynamoDB(batch_write_limit=10)
+    with pytest.raises(UnprocessedItemsError) as raised:
+        batch_write_items(dynamodb, TABLE_NAME, record_items(25), max_attempts=2, base_delay=0.0)
+    assert raised.value.table_name == TABLE_NAME
+    assert [request['PutRequest']['Item']['SK']['N'] for request in raised.value.unprocessed_items] == ['20.0', '21.0', '22.0', '23.0', '24.0']
+    assert len(stored_sks(dynamodb)) == 20
+
+
+def test_unprocessed_items_of_every_concurrent_batch_are_reported_together():
+    dynamodb = LocalDynamoDB(batch_write_limit=20)
+    with pytest.raises(UnprocessedItemsError) as raised:
+        batch_write_items(dynamodb, TABLE_NAME, record_items(50), max_workers=2, max_attempts=1, base_delay=0.0)
+    assert len(raised.value.unprocessed_items) == 10
+
+
+def test_deletes_are_batched_and_retried_like_puts():
+    dynamodb = LocalDynamoDB()
+    batch_write_items(dynamodb, TABLE_NAME, record_items(40))
+    dynamodb.batch_write_limit = 15
+    keys = [{'PK': item['PK'], 'SK': item['SK']} for item in record_items(30)]
+    calls = batch_delete_keys(dynamodb, TABLE_NAME, keys, base_delay=0.0)
+    # 25 deletes in two calls, then the remaining 5 in one
+    assert calls == 3
+    assert stored_sks(dynamodb) == [float(index) for index in range(30, 40)]
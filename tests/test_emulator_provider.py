@@ -0,0 +1,192 @@
+import http.server
+import socket
+import threading
+
+import pytest
+
+import invoker
+import providers
+from benchmark_targets import EMULATOR_PROVIDER
+from function_emulator import ARN_PREFIX, FunctionEmulator, emulated_functions, start_emulator
+from invoker import InvocationResult
+from providers import EMULATOR_TRACES_PER_REQUEST, EmulatorProvider
+
+MATRIX_NAME = 'cold-start-benchmark'
+FUNCTION = ARN_PREFIX + 'emulator-python38-128'
+
+
+class StatusHandler(http.server.BaseHTTPRequestHandler):
+    # answers every request with self.server.status, drops the connection when it is None
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        if self.server.status is None:
+            self.close_connection = True
+            return
+        self.send_response(self.server.status)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'{}')
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def emulator():
+    # an in-process emulator taking no wall time
+    emulator = FunctionEmulator(emulated_functions(['python3.8', 'java11'], [128, 1024]), MATRIX_NAME, time_scale=0.0, seed=1)
+    server = start_emulator(emulator, poll_interval=0.01)
+    yield emulator, EmulatorProvider('http://%s:%d' % server.server_address, timeout=10)
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def answering():
+    # provider of an endpoint that answers every request with the status given
+    servers = []
+
+    def provider(status):
+        server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), StatusHandler)
+        server.status = status
+        threading.Thread(target=server.serve_forever, args=(0.01,), daemon=True).start()
+        servers.append(server)
+        return EmulatorProvider('http://%s:%d' % server.server_address, timeout=10)
+
+    yield provider
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def unreachable():
+    # provider of a port nothing listens on
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    return EmulatorProvider('http://127.0.0.1:%d' % port, timeout=10)
+
+
+@pytest.fixture
+def delays(monkeypatch):
+    # the attempts retry_invocation backed off after, without the wait
+    backed_off = []
+    monkeypatch.setattr(invoker, 'backoff_delay', lambda attempt, base_delay, max_delay: backed_off.append(attempt) or 0.0)
+    return backed_off
+
+
+def test_an_invocation_returns_its_trace(emulator):
+    _, provider = emulator
+    result = InvocationResult(FUNCTION)
+    assert provider.invoke_once(FUNCTION, None, result) is False
+    assert result.succeeded and result.status_code == 200
+    assert result.latency > 0 and result.sent <= result.received
+
+
+@pytest.mark.parametrize('status', sorted(providers.RETRYABLE_STATUS_CODES))
+def test_throttling_and_server_errors_are_retryable(answering, status):
+    result = InvocationResult(FUNCTION)
+    assert answering(status).invoke_once(FUNCTION, None, result) is True
+    assert result.error == 'HTTP%d' % status and not result.succeeded
+    assert result.latency is not None
+
+
+@pytest.mark.parametrize('status', [400, 403, 404, 413])
+def test_client_errors_are_terminal(answering, status):
+    result = InvocationResult(FUNCTION)
+    assert answering(status).invoke_once(FUNCTION, None, result) is False
+    assert result.error == 'HTTP%d' % status
+
+
+def test_an_answer_without_trace_id_is_no_sample(answering):
+    result = InvocationResult(FUNCTION)
+    assert answering(200).invoke_once(FUNCTION, None, result) is False
+    assert result.error == 'MissingTraceId'
+
+
+def test_an_unreachable_emulator_is_retryable(unreachable):
+    result = InvocationResult(FUNCTION)
+    assert unreachable.invoke_once(FUNCTION, None, result) is True
+    assert result.error == 'URLError'
+
+
+def test_a_dropped_connection_is_retryable(answering):
+    result = InvocationResult(FUNCTION)
+    assert answering(None).invoke_once(FUNCTION, None, result) is True
+    assert result.error == 'RemoteDisconnected'
+
+
+def test_a_throttled_invocation_is_retried(emulator, delays):
+    hosted, provider = emulator
+    hosted.concurrency_limit = 1
+    hosted.in_flight['emulator-python38-128'] = 1
+    samples = provider.sample([FUNCTION], warm_samples=1, max_attempts=3)
+    [sample] = samples.values()
+    assert sample.result.error == 'HTTP429' and sample.result.attempts == 3
+    assert delays == [1, 2]
+    # once the invocation in flight returns
+    hosted.in_flight['emulator-python38-128'] = 0
+    [sample] = provider.sample([FUNCTION], warm_samples=1).values()
+    assert sample.result.succeeded and sample.result.attempts == 1
+
+
+def test_samples_are_collected_in_batches(emulator, monkeypatch):
+    hosted, provider = emulator
+    functions = [target.function_arn for target in provider.discover(MATRIX_NAME)]
+    assert len(functions) == 4
+    requests = []
+    get_traces = hosted.get_traces
+    monkeypatch.setattr(hosted, 'get_traces', lambda trace_ids: requests.append(len(trace_ids)) or get_traces(trace_ids))
+    samples = provider.sample(functions, cold_samples=1, warm_samples=2)
+    trace_ids = [sample.result.trace_id for sample in samples.values()]
+    # enough unknown ones for a third batch
+    unknown = ['1-00000000-%024x' % index for index in range(2 * EMULATOR_TRACES_PER_REQUEST - len(trace_ids) + 1)]
+    complete, pending = provider.collect(trace_ids + unknown)
+    assert requests == [EMULATOR_TRACES_PER_REQUEST, EMULATOR_TRACES_PER_REQUEST, 1]
+    assert sorted(complete) == sorted(trace_ids)
+    assert pending == set(unknown)
+    # the forced cold samples initialized, the warm ones did not
+    for sample in samples.values():
+        phases = [phase[0] for phase in complete[sample.result.trace_id].phases]
+        assert ('Initialization' in phases) == sample.forced
+
+
+def test_collecting_nothing_makes_no_requests(emulator, monkeypatch):
+    hosted, provider = emulator
+    monkeypatch.setattr(hosted, 'get_traces', None)
+    assert provider.collect([]) == ({}, set())
+
+
+def test_a_recycle_forces_a_cold_start(emulator):
+    hosted, provider = emulator
+    provider.sample([FUNCTION], warm_samples=1)
+    assert provider.force_cold_start(FUNCTION) is None
+    assert hosted.idle['emulator-python38-128'] == []
+
+
+def test_recycle_errors_are_returned(emulator, answering, unreachable):
+    _, provider = emulator
+    assert provider.force_cold_start(ARN_PREFIX + 'emulator-python38-256') == 'HTTP404'
+    assert answering(503).force_cold_start(FUNCTION) == 'HTTP503'
+    assert unreachable.force_cold_start(FUNCTION) == 'URLError'
+    assert answering(None).force_cold_start(FUNCTION) == 'RemoteDisconnected'
+
+
+def test_a_failed_recycle_skips_its_cold_sample(emulator, monkeypatch):
+    hosted, provider = emulator
+    monkeypatch.setattr(provider, 'endpoint_url', provider.endpoint_url + '/unknown')
+    [sample] = provider.sample([FUNCTION], cold_samples=1, warm_samples=0).values()
+    assert sample.forced and sample.result.error == 'HTTP404'
+    assert hosted.invocations == 0
+
+
+def test_configs_leave_out_functions_no_longer_hosted(emulator):
+    _, provider = emulator
+    gone = ARN_PREFIX + 'emulator-python38-256'
+    configs = provider.configs([FUNCTION, gone])
+    assert list(configs) == [FUNCTION]
+    assert configs[FUNCTION]['Provider'] == EMULATOR_PROVIDER
+    assert configs[FUNCTION]['MemorySize'] == 128
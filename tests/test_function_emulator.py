@@ -0,0 +1,104 @@
+import json
+import urllib.error
+import urllib.request
+
+import pytest
+
+from function_emulator import ARN_PREFIX, FunctionEmulator, emulated_functions, start_emulator
+
+MATRIX_NAME = 'cold-start-benchmark'
+
+
+@pytest.fixture
+def served(request):
+    # an in-process emulator taking no wall time, and its endpoint
+    options = getattr(request, 'param', {})
+    emulator = FunctionEmulator(emulated_functions(['python3.8', 'java11'], [128, 1024]), MATRIX_NAME, time_scale=0.0, seed=1, **options)
+    server = start_emulator(emulator, poll_interval=0.01)
+    yield emulator, 'http://%s:%d' % server.server_address
+    server.shutdown()
+    server.server_close()
+
+
+def call(endpoint_url, method, path, body=None):
+    # (status, headers, JSON payload) of one request
+    data = None if body is None else json.dumps(body).encode('UTF-8')
+    request = urllib.request.Request(endpoint_url + path, data=data, method=method)
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status, response.headers, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers, json.loads(e.read())
+
+
+def test_the_listing_names_every_function_with_its_matrix(served):
+    _, endpoint_url = served
+    status, _, payload = call(endpoint_url, 'GET', '/functions')
+    assert status == 200
+    assert [function['FunctionName'] for function in payload['Functions']] == [
+        'emulator-java11-1024', 'emulator-java11-128', 'emulator-python38-1024', 'emulator-python38-128']
+    [function] = [function for function in payload['Functions'] if function['FunctionName'] == 'emulator-python38-128']
+    assert function == {'FunctionName': 'emulator-python38-128', 'FunctionArn': ARN_PREFIX + 'emulator-python38-128',
+                        'Matrix': MATRIX_NAME, 'Runtime': 'python3.8', 'MemorySize': 128, 'CodeSize': 299}
+
+
+def test_an_idle_environment_is_reused_until_recycled(served):
+    emulator, endpoint_url = served
+    phases = []
+    for path in ('invocations', 'invocations', 'recycle', 'invocations'):
+        status, headers, _ = call(endpoint_url, 'POST', '/functions/emulator-python38-128/' + path)
+        assert status == 200
+        if path == 'invocations':
+            _, _, payload = call(endpoint_url, 'POST', '/traces', {'TraceIds': [headers['X-Emulator-Trace-Id']]})
+            phases.append([phase[0] for phase in payload['Traces'][0]['Phases']])
+    assert phases == [['Initialization', 'Invocation', 'Overhead'], ['Invocation', 'Overhead'], ['Initialization', 'Invocation', 'Overhead']]
+    assert (emulator.invocations, emulator.cold_starts) == (3, 2)
+
+
+@pytest.mark.parametrize('served', [{'keep_alive': 0.0}], indirect=True)
+def test_an_environment_idle_past_keep_alive_is_gone(served):
+    emulator, endpoint_url = served
+    for _ in range(3):
+        call(endpoint_url, 'POST', '/functions/emulator-java11-128/invocations')
+    assert emulator.cold_starts == 3
+
+
+def test_a_trace_spans_its_phases(served):
+    _, endpoint_url = served
+    _, headers, _ = call(endpoint_url, 'POST', '/functions/emulator-java11-1024/invocations')
+    _, _, payload = call(endpoint_url, 'POST', '/traces', {'TraceIds': [headers['X-Emulator-Trace-Id'], '1-00000000-000000000000000000000000']})
+    # unknown trace ids are left out
+    [trace] = payload['Traces']
+    assert trace['Id'] == headers['X-Emulator-Trace-Id']
+    assert trace['Start'] <= trace['FunctionStart'] <= trace['Phases'][0][1]
+    assert trace['Phases'][-1][2] <= trace['FunctionEnd'] <= trace['End']
+
+
+@pytest.mark.parametrize('served', [{'concurrency_limit': 1}], indirect=True)
+def test_invocations_past_the_concurrency_limit_are_throttled(served):
+    emulator, endpoint_url = served
+    # one invocation in flight
+    emulator.in_flight['emulator-python38-128'] = 1
+    status, headers, _ = call(endpoint_url, 'POST', '/functions/emulator-python38-128/invocations')
+    assert status == 429 and 'X-Emulator-Trace-Id' not in headers
+    # other functions have their own limit
+    assert call(endpoint_url, 'POST', '/functions/emulator-python38-1024/invocations')[0] == 200
+
+
+def test_the_oldest_traces_make_room(served):
+    emulator, endpoint_url = served
+    emulator.max_traces = 2
+    trace_ids = [call(endpoint_url, 'POST', '/functions/emulator-python38-128/invocations')[1]['X-Emulator-Trace-Id'] for _ in range(3)]
+    _, _, payload = call(endpoint_url, 'POST', '/traces', {'TraceIds': trace_ids})
+    assert [trace['Id'] for trace in payload['Traces']] == trace_ids[1:]
+
+
+@pytest.mark.parametrize('method, path', [
+    ('GET', '/traces'),
+    ('POST', '/functions/emulator-python38-256/invocations'),
+    ('POST', '/functions/emulator-python38-128/versions'),
+    ('POST', '/functions/emulator-python38-128'),
+])
+def test_unknown_paths_and_functions_are_not_found(served, method, path):
+    _, endpoint_url = served
+    assert call(endpoint_url, method, path, {} if method == 'POST' else None)[0] == 404
@@ -0,0 +1,107 @@
+import io
+
+import pytest
+from botocore.exceptions import ReadTimeoutError
+
+import invoker
+from backoff import backoff_delay
+from invoker import invoke_with_retry
+from local_aws import client_error
+
+FUNCTION = 'arn:aws:lambda:us-east-1:123456789012:function:bench-python38-128'
+
+
+class ScriptedLambda(object):
+    # answers every invoke with the next outcome: an exception to raise, or a response
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.invocations = 0
+
+    def invoke(self, **request):
+        self.invocations += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+def response(trace_id='1-5fc8a2b0-0123456789abcdef01234567', function_error=None):
+    headers = {} if trace_id is None else {'x-amzn-trace-id': 'Root=' + trace_id + ';Sampled=1'}
+    result = {'StatusCode': 200, 'Payload': io.BytesIO(b'"Hello from Lambda!"'), 'ResponseMetadata': {'HTTPHeaders': headers}}
+    if function_error is not None:
+        result['FunctionError'] = function_error
+    return result
+
+
+@pytest.fixture
+def delays(monkeypatch):
+    slept = []
+    monkeypatch.setattr(invoker.time, 'sleep', slept.append)
+    return slept
+
+
+def test_a_successful_invocation_takes_one_attempt(delays):
+    result = invoke_with_retry(ScriptedLambda(response()), FUNCTION)
+    assert result.succeeded
+    assert result.attempts == 1
+    assert result.trace_id == '1-5fc8a2b0-0123456789abcdef01234567'
+    assert result.sent <= result.received
+    assert delays == []
+
+
+def test_a_function_error_is_no_sample(delays):
+    result = invoke_with_retry(ScriptedLambda(response(function_error='Unhandled')), FUNCTION)
+    assert not result.succeeded
+    assert result.error == 'FunctionUnhandled'
+    # the function ran, invoking it again would not help
+    assert result.attempts == 1
+    assert result.latency is not None
+
+
+def test_a_response_without_trace_id_is_no_sample(delays):
+    result = invoke_with_retry(ScriptedLambda(response(trace_id=None)), FUNCTION)
+    assert result.error == 'MissingTraceId'
+    assert result.attempts == 1
+
+
+def test_throttles_are_retried_until_one_succeeds(delays):
+    lambda_ = ScriptedLambda(client_error('TooManyRequestsException', 'Invoke'), client_error('ServiceException', 'Invoke'), response())
+    result = invoke_with_retry(lambda_, FUNCTION, max_attempts=3)
+    assert result.succeeded
+    assert result.attempts == 3
+    assert len(delays) == 2
+
+
+def test_retryable_errors_give_up_after_max_attempts(delays):
+    lambda_ = ScriptedLambda(*[client_error('TooManyRequestsException', 'Invoke')] * 4)
+    result = invoke_with_retry(lambda_, FUNCTION, max_attempts=4)
+    assert result.error == 'TooManyRequestsException'
+    assert result.attempts == lambda_.invocations == 4
+    # no sleep after the last attempt
+    assert len(delays) == 3
+    # the failed attempt is timed too
+    assert result.latency is not None and result.sent <= result.received
+
+
+def test_connection_errors_are_retried(delays):
+    lambda_ = ScriptedLambda(ReadTimeoutError(endpoint_url='https://lambda.us-east-1.amazonaws.com'), response())
+    result = invoke_with_retry(lambda_, FUNCTION)
+    assert result.succeeded
+    assert result.attempts == 2
+
+
+def test_terminal_errors_are_not_retried(delays):
+    lambda_ = ScriptedLambda(client_error('ResourceNotFoundException', 'Invoke'))
+    result = invoke_with_retry(lambda_, FUNCTION)
+    assert result.error == 'ResourceNotFoundException'
+    assert result.attempts == lambda_.invocations == 1
+    assert result.latency is not None
+    assert delays == []
+
+
+def test_backoff_doubles_up_to_the_cap():
+    for attempt, cap in ((1, 0.2), (2, 0.4), (3, 0.8), (8, 5.0)):
+        delays = [backoff_delay(attempt, 0.2, 5.0) for _ in range(200)]
+        assert 0.0 <= min(delays) and max(delays) <= cap
+        # full jitter spreads the delays over the whole range
+        assert max(delays) > cap / 2
@@ -0,0 +1,102 @@
+import calendar
+import datetime
+import json
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from dynamodb_codec import marshal
+from local_aws import LocalDynamoDB, LocalS3, function_arn
+from record_archive import write_report
+from replay_backups import Replay
+from table_items import record_items
+
+BUCKET_NAME = 'cold-start-benchmark-backup'
+TABLE_NAME = 'cold_start_benchmark_table'
+PARTITION = 'AWS|python3.8|128'
+DAY = datetime.date(2020, 12, 3)
+UTC = datetime.timezone.utc
+
+
+def epoch(*utc_time):
+    return float(calendar.timegm(datetime.datetime(*utc_time).timetuple()))
+
+
+def report(trace_id, start):
+    records = {
+        'AWS::X-Ray::Trace-id': trace_id,
+        'AWS::Lambda::start': start,
+        'AWS::Lambda::Function::start': start + 0.02,
+        'AWS::Lambda::Function::Invocation::start': start + 0.021,
+        'AWS::Lambda::Function::Invocation::end': start + 0.024,
+        'AWS::Lambda::Function::end': start + 0.025,
+        'AWS::Lambda::end': start + 0.026
+    }
+    configs = {'FunctionArn': function_arn('bench-python38-128'), 'Runtime': 'python3.8', 'CodeSize': 299, 'MemorySize': 128}
+    return {'bench-python38-128': {'Records': records, 'Configs': configs, 'Invocation': {'Sample': 0}}}
+
+
+def stored_sks(dynamodb, pk):
+    return sorted(dynamodb.tables[TABLE_NAME][pk])
+
+
+@pytest.fixture
+def non_utc_host(monkeypatch):
+    # a workstation eight hours behind UTC, where every naive timestamp would be off
+    monkeypatch.setenv('TZ', 'America/Los_Angeles')
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def test_replayed_days_are_utc_days_on_any_host(non_utc_host):
+    s3, dynamodb = LocalS3(), LocalDynamoDB()
+    # early in the UTC day, from the archive, and late in it, from a legacy report
+    archive_run = datetime.datetime(2020, 12, 3, 0, 15, tzinfo=UTC)
+    write_report(s3, BUCKET_NAME, report('1-5fc82d14-000000000000000000000001', archive_run.timestamp()), archive_run)
+    legacy_run = epoch(2020, 12, 3, 23, 30)
+    s3.put_object(Body=json.dumps(report('1-5fc97548-000000000000000000000002', legacy_run)).encode('UTF-8'), Bucket=BUCKET_NAME, Key='AWS/2020/12/3/23/30.json')
+    # live items: one of the replayed UTC day, one of the next that shares the host's local day
+    replaced, kept = epoch(2020, 12, 3, 4, 0), epoch(2020, 12, 4, 3, 0)
+    for run in (replaced, kept):
+        dynamodb.batch_write_item(RequestItems={TABLE_NAME: [
+            {'PutRequest': {'Item': item}} for item in record_items(report('1-live', run), datetime.datetime.fromtimestamp(run, tz=UTC))]})
+
+    result = Replay(s3, dynamodb, BUCKET_NAME, TABLE_NAME, replace=True).replay_day(DAY)
+
+    assert result['Samples'] == 2
+    assert stored_sks(dynamodb, 'RECORD|' + PARTITION) == [epoch(2020, 12, 3, 0, 15), legacy_run, kept]
+    # summaries of a day get the SK of the following UTC midnight
+    assert stored_sks(dynamodb, 'SUMMARY|' + PARTITION) == [epoch(2020, 12, 4)]
+    assert stored_sks(dynamodb, 'DASHBOARD|AWS|day') == [epoch(2020, 12, 4)]
+
+
+def test_a_second_replay_replaces_the_first(non_utc_host):
+    s3, dynamodb = LocalS3(), LocalDynamoDB()
+    run = datetime.datetime(2020, 12, 3, 23, 45, tzinfo=UTC)
+    write_report(s3, BUCKET_NAME, report('1-5fc97931-000000000000000000000003', run.timestamp()), run)
+    replay = Replay(s3, dynamodb, BUCKET_NAME, TABLE_NAME, replace=True)
+    replay.replay_day(DAY)
+    replay.replay_day(DAY)
+    assert stored_sks(dynamodb, 'RECORD|' + PARTITION) == [run.timestamp()]
+    assert stored_sks(dynamodb, 'SUMMARY|' + PARTITION) == [epoch(2020, 12, 4)]
+
+
+def test_the_tool_imports_without_aws_settings():
+    # no handler modules, so no clients built and no region needed at import time
+    env = {name: value for name, value in os.environ.items() if not name.startswith('AWS_')}
+    tools = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tools')
+    output = subprocess.check_output(
+        [sys.executable, '-c', "import sys, replay_backups; print(sorted(name for name in sys.modules if name.startswith('ColdStart')))"],
+        cwd=tools, env=env)
+    assert output.strip() == b'[]'
+
+
+def test_marshalled_items_carry_the_replayed_run_time():
+    run = datetime.datetime(2020, 12, 3, 23, 30, tzinfo=UTC)
+    [item] = record_items(report('1-5fc97548-000000000000000000000002', run.timestamp()), run)
+    assert item['SK'] == marshal({'SK': epoch(2020, 12, 3, 23, 30)})['SK']
@@ -0,0 +1,138 @@
+import pytest
+
+import sampler
+from invoker import InvocationResult
+from local_aws import LocalLambda, LocalXRay, client_error, function_arn
+from sampler import COLD_START_NONCE_VARIABLE, UPDATE_MAX_ATTEMPTS, force_cold_start, sample_function, wait_for_update
+
+FUNCTION = function_arn('bench-python38-128')
+
+
+class FakeClock(object):
+    # monotonic time that only moves when the sampler sleeps
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class ScriptedLambda(object):
+    # update_function_configuration raises the errors in order, then succeeds; every
+    # get_function_configuration after an update reports the next of statuses, the last one
+    # for good
+    def __init__(self, update_errors=(), statuses=('Successful',)):
+        self.update_errors = list(update_errors)
+        self.statuses = list(statuses)
+        self.updates = 0
+
+    def get_function_configuration(self, FunctionName):
+        status = self.statuses.pop(0) if len(self.statuses) > 1 else self.statuses[0]
+        return {'FunctionArn': FunctionName, 'Environment': {'Variables': {}}, 'LastUpdateStatus': status}
+
+    def update_function_configuration(self, FunctionName, Environment):
+        self.updates += 1
+        if self.update_errors:
+            raise client_error(self.update_errors.pop(0), 'UpdateFunctionConfiguration')
+        return {}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(sampler, 'time', clock)
+    return clock
+
+
+def test_a_new_nonce_retires_the_environments(clock):
+    lambda_ = LocalLambda({'bench-python38-128': {'Runtime': 'python3.8', 'MemorySize': 128, 'Environment': {'Variables': {'WORKLOAD_NAME': 'pad10'}}}}, LocalXRay())
+    lambda_.invoke(FunctionName=FUNCTION)
+    assert lambda_.idle['bench-python38-128'] == 1
+    assert force_cold_start(lambda_, FUNCTION) is None
+    variables = lambda_.functions['bench-python38-128']['Environment']['Variables']
+    nonce = variables[COLD_START_NONCE_VARIABLE]
+    # the function's own variables stay
+    assert variables['WORKLOAD_NAME'] == 'pad10'
+    assert lambda_.idle['bench-python38-128'] == 0
+    assert force_cold_start(lambda_, FUNCTION) is None
+    assert lambda_.functions['bench-python38-128']['Environment']['Variables'][COLD_START_NONCE_VARIABLE] != nonce
+
+
+def test_an_update_in_progress_is_retried(clock):
+    lambda_ = ScriptedLambda(update_errors=['ResourceConflictException', 'ResourceConflictException'])
+    assert force_cold_start(lambda_, FUNCTION) is None
+    assert lambda_.updates == 3
+    assert len(clock.sleeps) == 2
+
+
+def test_throttled_updates_get_a_larger_budget_than_invokes(clock):
+    lambda_ = ScriptedLambda(update_errors=['TooManyRequestsException'] * (UPDATE_MAX_ATTEMPTS - 1))
+    assert force_cold_start(lambda_, FUNCTION) is None
+    assert lambda_.updates == UPDATE_MAX_ATTEMPTS > 3
+
+
+def test_updates_give_up_after_max_attempts(clock):
+    lambda_ = ScriptedLambda(update_errors=['TooManyRequestsException'] * 5)
+    assert force_cold_start(lambda_, FUNCTION, max_attempts=4) == 'TooManyRequestsException'
+    assert lambda_.updates == 4
+    assert len(clock.sleeps) == 3
+
+
+def test_terminal_update_errors_are_not_retried(clock):
+    lambda_ = ScriptedLambda(update_errors=['AccessDeniedException'])
+    assert force_cold_start(lambda_, FUNCTION) == 'AccessDeniedException'
+    assert lambda_.updates == 1
+    assert clock.sleeps == []
+
+
+def test_the_update_is_polled_until_successful(clock):
+    lambda_ = ScriptedLambda(statuses=('InProgress', 'InProgress', 'InProgress', 'Successful'))
+    assert force_cold_start(lambda_, FUNCTION, poll_interval=0.5) is None
+    assert clock.sleeps == [0.5, 0.5]
+
+
+def test_a_failed_update_is_an_error(clock):
+    lambda_ = ScriptedLambda(statuses=('Successful', 'InProgress', 'Failed'))
+    assert force_cold_start(lambda_, FUNCTION) == 'UpdateFailed'
+
+
+def test_an_update_that_never_completes_times_out(clock):
+    lambda_ = ScriptedLambda(statuses=('InProgress',))
+    assert wait_for_update(lambda_, FUNCTION, timeout=10.0, poll_interval=0.5) == 'UpdateTimeout'
+    assert clock.now <= 10.0
+
+
+def test_a_failed_force_skips_its_invocation():
+    invoked = []
+    errors = ['UpdateTimeout', None]
+
+    def invoke(function, payload):
+        invoked.append(function)
+        result = InvocationResult(function)
+        result.trace_id = '1-5fc8a2b0-%024x' % len(invoked)
+        return result
+
+    samples = sample_function(invoke, lambda function: errors.pop(0), FUNCTION, cold_samples=2, warm_samples=1)
+    assert [sample.forced for sample in samples] == [True, True, False]
+    assert samples[0].result.error == 'UpdateTimeout' and not samples[0].result.succeeded
+    # the second cold sample and the warm one still run
+    assert [sample.result.succeeded for sample in samples[1:]] == [True, True]
+    assert len(invoked) == 2
+
+
+def test_unforced_functions_take_their_cold_samples_as_they_are():
+    forced = []
+
+    def invoke(function, payload):
+        result = InvocationResult(function)
+        result.trace_id = '1-5fc8a2b0-000000000000000000000001'
+        return result
+
+    samples = sample_function(invoke, forced.append, FUNCTION, cold_samples=2, warm_samples=1, force=False)
+    assert forced == []
+    assert [sample.forced for sample in samples] == [False, False, False]
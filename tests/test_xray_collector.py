@@ -0,0 +1,100 @@
+import pytest
+
+import xray_collector
+from local_aws import synthetic_segments
+from xray_collector import MAX_TRACE_IDS_PER_REQUEST, collect_traces
+
+DURATIONS = {'queue': 0.02, 'init': 0.4, 'restore': None, 'invocation': 0.003, 'overhead': 0.001}
+
+
+class FakeClock(object):
+    # monotonic time that only moves when the collector sleeps
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class PollingXRay(object):
+    # a trace is complete from its poll on, before that only the AWS::Lambda segment is in;
+    # None never completes. Pages hold page_size traces
+    def __init__(self, complete_from, page_size=2):
+        self.complete_from = complete_from
+        self.page_size = page_size
+        self.requests = []
+        self.polls = {}
+
+    def batch_get_traces(self, TraceIds, NextToken=None):
+        self.requests.append(list(TraceIds))
+        if len(TraceIds) > MAX_TRACE_IDS_PER_REQUEST:
+            raise ValueError('too many trace ids')
+        traces = []
+        for trace_id in TraceIds:
+            if NextToken is None:
+                self.polls[trace_id] = self.polls.get(trace_id, 0) + 1
+            segments = synthetic_segments(trace_id, 'bench-python38-128', 1606980000.0, DURATIONS)
+            complete_from = self.complete_from[trace_id]
+            if complete_from is None or self.polls[trace_id] < complete_from:
+                segments = segments[:1]
+            traces.append({'Id': trace_id, 'Segments': segments})
+        start = int(NextToken or 0)
+        response = {'Traces': traces[start:start + self.page_size]}
+        if start + self.page_size < len(traces):
+            response['NextToken'] = str(start + self.page_size)
+        return response
+
+
+def trace_ids(count):
+    return ['1-5fc8a2b0-%024x' % index for index in range(count)]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(xray_collector, 'time', clock)
+    return clock
+
+
+def test_trace_ids_are_requested_in_batches_of_5(clock):
+    ids = trace_ids(12)
+    xray = PollingXRay(dict.fromkeys(ids, 1))
+    complete, pending = collect_traces(xray, ids)
+    assert sorted(complete) == ids and pending == set()
+    # one poll, 3 batches, each paged by NextToken
+    batches = {tuple(request) for request in xray.requests}
+    assert sorted(len(batch) for batch in batches) == [2, 5, 5]
+    assert sorted(trace_id for batch in batches for trace_id in batch) == ids
+
+
+def test_polling_continues_until_every_trace_is_complete(clock):
+    ids = trace_ids(3)
+    xray = PollingXRay({ids[0]: 1, ids[1]: 2, ids[2]: 4})
+    complete, pending = collect_traces(xray, ids, timeout=60, initial_delay=1.0, max_delay=8.0)
+    assert sorted(complete) == ids and pending == set()
+    assert clock.sleeps == [1.0, 2.0, 4.0, 8.0]
+    # complete traces are not asked for again
+    assert xray.polls == {ids[0]: 1, ids[1]: 2, ids[2]: 4}
+
+
+def test_incomplete_traces_are_returned_at_the_deadline(clock):
+    ids = trace_ids(4)
+    xray = PollingXRay({ids[0]: 1, ids[1]: 1, ids[2]: None, ids[3]: None})
+    complete, pending = collect_traces(xray, ids, timeout=10, initial_delay=1.0, max_delay=8.0)
+    assert sorted(complete) == ids[:2]
+    # left for the caller to defer to the next run
+    assert pending == set(ids[2:])
+    # the last sleep is cut short by the deadline
+    assert clock.sleeps == [1.0, 2.0, 4.0, 3.0]
+    assert clock.now == 10
+
+
+def test_no_trace_ids_make_no_calls(clock):
+    xray = PollingXRay({})
+    assert collect_traces(xray, []) == ({}, set())
+    assert xray.requests == [] and clock.sleeps == []
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# A function emulator for the caller's Emulator provider (cold_start_caller/providers.py): hosts
+# a synthetic hello-world function per runtime and memory size over plain HTTP and keeps its
+# execution environments the way a serverless platform does. An invocation that finds no idle
+# environment brings up a new one, which adds an Initialization phase and stays idle for
+# --keep-alive seconds after it returns. Every invocation is timed with the phases of Lambda's
+# X-Ray segments, so the caller stores the emulator's results like Lambda's.
+#
+#   python tools/function_emulator.py --port 9000 --runtimes python3.8,java11 --memory 128,1024
+#
+# then set EMULATOR_ENDPOINT_URL=http://<host>:9000 on the caller and the summarizer.
+#
+#   GET  /functions                     the hosted functions and their configurations
+#   POST /functions/<name>/invocations  invokes, X-Emulator-Trace-Id names the invocation's trace
+#   POST /functions/<name>/recycle      retires the idle environments, the next invocation is cold
+#   POST /traces {"TraceIds": [...]}    the traces of earlier invocations
+
+import argparse
+import collections
+import http.server
+import json
+import math
+import random
+import threading
+import time
+import urllib.parse
+import uuid
+
+# median seconds of a new environment's initialization and of one invocation at full CPU, and
+# the code size reported for the runtime's hello-world function
+RUNTIMES = {
+    'python3.8': (0.12, 0.002, 299),
+    'nodejs12.x': (0.15, 0.002, 291),
+    'ruby2.7': (0.20, 0.003, 271),
+    'go1.x': (0.07, 0.001, 2486547),
+    'java11': (0.45, 0.008, 1803),
+    'dotnetcore3.1': (0.35, 0.006, 138451)
+}
+# Lambda gives a function a full vCPU at 1769 MB and a proportional share below. Phases are
+# slowed down by the square root of the share, as they are not all CPU bound
+FULL_CPU_MEMORY_SIZE = 1769
+# median seconds before the function segment starts, on an idle environment and on a new one
+PLACEMENT = (0.002, 0.03)
+OVERHEAD = 0.001
+ARN_PREFIX = 'arn:emulator:function:'
+
+
+class FunctionEmulator(object):
+    # the hosted functions, their idle environments and the traces of past invocations.
+    # Phase durations are lognormal around the medians above, scaled by time_scale
+    def __init__(self, functions, matrix_name, keep_alive=600.0, concurrency_limit=0, time_scale=1.0, sigma=0.3, max_traces=100000, seed=None):
+        # {name: {'Runtime': ..., 'MemorySize': ..., 'CodeSize': ...}}
+        self.functions = functions
+        self.matrix_name = matrix_name
+        self.keep_alive = keep_alive
+        # in-flight invocations per function before it answers 429, 0 for no limit
+        self.concurrency_limit = concurrency_limit
+        self.time_scale = time_scale
+        self.sigma = sigma
+        self.max_traces = max_traces
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        # {name: monotonic times the idle environments were last used}, {name: invocations in flight}
+        self.idle = {name: [] for name in functions}
+        self.in_flight = collections.Counter()
+        # {trace id: trace}, oldest first
+        self.traces = collections.OrderedDict()
+        self.cold_starts = 0
+        self.invocations = 0
+
+    def listing(self):
+        return [
+            dict(config, FunctionName=name, FunctionArn=ARN_PREFIX + name, Matrix=self.matrix_name)
+            for name, config in sorted(self.functions.items())
+        ]
+
+    def recycle(self, name):
+        with self.lock:
+            self.idle[name] = []
+
+    def invoke(self, name):
+        # runs one invocation in the calling thread; returns its trace id, None when throttled
+        start = time.time()
+        cold = self.acquire(name)
+        if cold is None:
+            return None
+        try:
+            init, invocation, speed = self.profile(name)
+            self.sleep(PLACEMENT[1] if cold else PLACEMENT[0])
+            function_start = time.time()
+            phases = []
+            if cold:
+                phases.append(self.phase('Initialization', init / speed))
+            phases.append(self.phase('Invocation', invocation / speed))
+            phases.append(self.phase('Overhead', OVERHEAD))
+            function_end = time.time()
+        finally:
+            self.release(name)
+        trace = {
+            'Id': '1-%08x-%s' % (int(start), uuid.uuid4().hex[:24]),
+            'Start': start,
+            'End': time.time(),
+            'FunctionStart': function_start,
+            'FunctionEnd': function_end,
+            'Phases': phases
+        }
+        with self.lock:
+            self.traces[trace['Id']] = trace
+            while len(self.traces) > self.max_traces:
+                self.traces.popitem(last=False)
+        return trace['Id']
+
+    def acquire(self, name):
+        # True when the invocation needs a new environment, None when it is throttled
+        with self.lock:
+            if self.concurrency_limit and self.in_flight[name] >= self.concurrency_limit:
+                return None
+            self.in_flight[name] += 1
+            self.invocations += 1
+            now = time.monotonic()
+            idle = [last_used for last_used in self.idle[name] if now - last_used < self.keep_alive]
+            cold = not idle
+            if cold:
+                self.cold_starts += 1
+            else:
+                idle.pop()
+            self.idle[name] = idle
+            return cold
+
+    def release(self, name):
+        with self.lock:
+            self.in_flight[name] -= 1
+            self.idle[name].append(time.monotonic())
+
+    def profile(self, name):
+        # (median init seconds, median invocation seconds, speed relative to a full CPU) of a function
+        config = self.functions[name]
+        init, invocation, _ = RUNTIMES[config['Runtime']]
+        return init, invocation, math.sqrt(min(config['MemorySize'], FULL_CPU_MEMORY_SIZE) / FULL_CPU_MEMORY_SIZE)
+
+    def phase(self, name, median):
+        start = time.time()
+        self.sleep(median)
+        return [name, start, time.time()]
+
+    def sleep(self, median):
+        with self.lock:
+            seconds = self.rng.lognormvariate(math.log(median), self.sigma)
+        time.sleep(seconds * self.time_scale)
+
+    def get_traces(self, trace_ids):
+        with self.lock:
+            return [self.traces[trace_id] for trace_id in trace_ids if trace_id in self.traces]
+
+
+class EmulatorHandler(http.server.BaseHTTPRequestHandler):
+    # self.server.emulator is the FunctionEmulator served
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        if self.path == '/functions':
+            return self.reply(200, {'Functions': self.server.emulator.listing()})
+        self.reply(404, {'Message': 'Not found'})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        emulator = self.server.emulator
+        if self.path == '/traces':
+            return self.reply(200, {'Traces': emulator.get_traces(json.loads(body)['TraceIds'])})
+        parts = self.path.strip('/').split('/')
+        if len(parts) != 3 or parts[0] != 'functions' or urllib.parse.unquote(parts[1]) not in emulator.functions:
+            return self.reply(404, {'Message': 'Not found'})
+        name = urllib.parse.unquote(parts[1])
+        if parts[2] == 'recycle':
+            emulator.recycle(name)
+            return self.reply(200, {})
+        if parts[2] == 'invocations':
+            trace_id = emulator.invoke(name)
+            if trace_id is None:
+                return self.reply(429, {'Message': 'Too many requests'})
+            return self.reply(200, {'statusCode': 200, 'body': 'Hello from ' + name}, {'X-Emulator-Trace-Id': trace_id})
+        self.reply(404, {'Message': 'Not found'})
+
+    def reply(self, status, payload, headers=None):
+        data = json.dumps(payload).encode('UTF-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def emulated_functions(runtimes, memory_sizes):
+    # one hello-world function per runtime and memory size, named like the stack's targets
+    functions = {}
+    for runtime in runtimes:
+        for memory_size in memory_sizes:
+            functions['emulator-%s-%d' % (runtime.replace('.', ''), memory_size)] = {
+                'Runtime': runtime, 'MemorySize': memory_size, 'CodeSize': RUNTIMES[runtime][2]}
+    return functions
+
+
+def start_emulator(emulator, host='127.0.0.1', port=0, verbose=False, poll_interval=0.5):
+    # serves emulator from a daemon thread; returns the server, whose server_address has the port.
+    # server.shutdown() waits up to poll_interval seconds
+    server = http.server.ThreadingHTTPServer((host, port), EmulatorHandler)
+    server.daemon_threads = True
+    server.emulator = emulator
+    server.verbose = verbose
+    threading.Thread(target=server.serve_forever, args=(poll_interval,), daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9000)
+    parser.add_argument('--matrix', default='cold-start-benchmark', help='matrix name of the hosted functions, as in configurations/config.json')
+    parser.add_argument('--runtimes', default=','.join(RUNTIMES), help='comma separated, any of ' + ', '.join(RUNTIMES))
+    parser.add_argument('--memory', default='128,512,1024,2048', help='comma separated memory sizes in MB')
+    parser.add_argument('--keep-alive', type=float, default=600.0, help='seconds an idle environment is kept for the next invocation')
+    parser.add_argument('--concurrency-limit', type=int, default=0, help='in-flight invocations per function before 429, 0 for no limit')
+    parser.add_argument('--time-scale', type=float, default=1.0, help='factor on every emulated duration')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--verbose', action='store_true', help='log every request')
+    args = parser.parse_args()
+
+    functions = emulated_functions(args.runtimes.split(','), [int(size) for size in args.memory.split(',')])
+    emulator = FunctionEmulator(functions, args.matrix, keep_alive=args.keep_alive, concurrency_limit=args.concurrency_limit,
+                                time_scale=args.time_scale, seed=args.seed)
+    server = start_emulator(emulator, args.host, args.port, args.verbose)
+    print('Serving %d function(s) on http://%s:%d' % (len(functions), server.server_address[0], server.server_address[1]))
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# Rebuilds RECORD and daily SUMMARY/DASHBOARD items from the caller's S3 backups: the legacy
+# AWS/Y/M/D/H/MIN[suffix].json reports and the Parquet archive. Days are replayed one at a
+# time and archive partitions one at a time within a day, so memory stays flat however long
+# the range. Writes are held to a write capacity budget.
+#
+#   python tools/replay_backups.py --bucket <backup bucket> --table <table> \
+#       --start 2020-12-01 --end 2021-11-30 --write-capacity 200 --replace
+#
+# Replayed days are UTC calendar days, as the caller's keys and dt= partitions are, and their
+# summaries get the SK of the following midnight.
+# Legacy JSON reports only carry their run time to the minute, so their RECORD items do not
+# overwrite the live ones of the same run; use --replace while those have not expired yet.
+
+import argparse
+import collections
+import concurrent.futures
+import datetime
+import json
+import os
+import re
+import sys
+
+LAMBDAS = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'cold_start_lambdas')
+sys.path.insert(0, os.path.join(LAMBDAS, 'cold_start_summarizer'))
+sys.path.insert(0, os.path.join(LAMBDAS, 'cold_start_common', 'python'))
+
+import boto3  # noqa: E402
+
+from benchmark_targets import configs_partition_suffix, configs_provider  # noqa: E402
+from cost_model import PRICES  # noqa: E402
+from dynamodb_reader import query_partitions  # noqa: E402
+from dynamodb_writer import WriteBudget, batch_delete_keys, batch_write_items  # noqa: E402
+from record_archive import bytes_to_table, list_keys, list_partition_prefixes, row_report, table_rows  # noqa: E402
+from record_columns import TRACE_ID_LABEL  # noqa: E402
+from summary_stats import summarize_records  # noqa: E402
+from table_items import build_summary_items, dashboard_pk, record_items  # noqa: E402
+
+LEGACY_KEY_PATTERN = re.compile(r'^AWS/(\d+)/(\d+)/(\d+)/(\d+)/(\d+)(?:-[^/]*)?\.json$')
+ARCHIVE_PARTITION_PATTERN = re.compile(r'/provider=([^/]+)/runtime=([^/]+)/memory=(\d+)/dt=')
+# replayed RECORD items are kept this long from the replay, not from the original run
+RECORD_RETENTION = datetime.timedelta(days=60)
+# the summarizer's PRICING variable, the summaries of replayed days are priced the same way
+PRICING = dict(PRICES, **json.loads(os.environ.get('PRICING', '{}')))
+
+
+class Replay(object):
+    # one replay over a range of days, see replay_day
+    def __init__(self, s3_client, dynamodb_client, bucket, table, sources=('json', 'archive'), records=True,
+                 summaries=True, replace=False, budget=None, fetch_parallelism=16, write_parallelism=4, dry_run=False):
+        self.s3_client = s3_client
+        self.dynamodb_client = dynamodb_client
+        self.bucket = bucket
+        self.table = table
+        self.sources = sources
+        self.records = records
+        self.summaries = summaries
+        self.replace = replace
+        self.budget = budget
+        self.fetch_parallelism = fetch_parallelism
+        self.write_parallelism = write_parallelism
+        self.dry_run = dry_run
+        self.partition_prefixes = None
+
+    def replay_day(self, day):
+        day_start = datetime.datetime.combine(day, datetime.time(), tzinfo=datetime.timezone.utc)
+        day_end = day_start + datetime.timedelta(days=1)
+        result = {"Day": day.isoformat(), "Partitions": 0, "Samples": 0, "RecordItems": 0, "SummaryItems": 0}
+
+        # legacy reports mix every partition, so they are the only thing held for the whole day
+        legacy = collections.defaultdict(dict)
+        if 'json' in self.sources:
+            for run_timestamp, report_artifect_dict in self.legacy_runs(day):
+                for key, report in report_artifect_dict.items():
+                    partition = configs_partition_suffix(report["Configs"])
+                    legacy[partition].setdefault(run_timestamp, {})[key] = report
+
+        partition_stats = []
+        archive = self.archive_partitions(day) if 'archive' in self.sources else iter(())
+        for partitions in archive:
+            for partition in sorted(partitions):
+                partition_stats.append(self.replay_partition(partition, [partitions[partition], legacy.pop(partition, {})], day_start, day_end, result))
+        for partition in sorted(legacy):
+            partition_stats.append(self.replay_partition(partition, [legacy[partition]], day_start, day_end, result))
+
+        if self.summaries and partition_stats:
+            if self.replace:
+                for provider in sorted({configs_provider(configs) for _, configs in partition_stats}):
+                    self.delete_range(dashboard_pk(provider, 'day'), day_end, day_end + datetime.timedelta(days=1))
+            summary_items = build_summary_items('day', partition_stats, day_end, pricing=PRICING)
+            self.write(summary_items)
+            result["SummaryItems"] = len(summary_items)
+        return result
+
+    def replay_partition(self, partition, sources, day_start, day_end, result):
+        # RECORD items of one runtime/memory size partition, returns its (stats, configs) for the summaries.
+        # sources are {run timestamp: report_artifect_dict} in order of preference: a sample found
+        # in both formats keeps the archive's exact run time rather than the legacy report's minute
+        seen_traces = set()
+        runs = collections.defaultdict(dict)
+        for source in sources:
+            for run_timestamp, reports in source.items():
+                for key, report in reports.items():
+                    trace_id = report["Records"].get(TRACE_ID_LABEL)
+                    if trace_id not in seen_traces:
+                        seen_traces.add(trace_id)
+                        runs[run_timestamp][key] = report
+
+        records_list = []
+        items = []
+        configs = None
+        expiration_timestamp = datetime.datetime.now(datetime.timezone.utc) + RECORD_RETENTION
+        for run_timestamp in sorted(runs):
+            for report in runs[run_timestamp].values():
+                records_list.append(report["Records"])
+                configs = report["Configs"]
+            if self.records:
+                items.extend(record_items(runs[run_timestamp], run_timestamp, expiration_timestamp))
+
+        if self.replace:
+            if self.records:
+                self.delete_range('RECORD|' + partition, day_start, day_end)
+            if self.summaries:
+                self.delete_range('SUMMARY|' + partition, day_end, day_end + datetime.timedelta(days=1))
+        self.write(items)
+        result["Partitions"] += 1
+        result["Samples"] += len(records_list)
+        result["RecordItems"] += len(items)
+        return summarize_records(records_list), configs
+
+    def legacy_runs(self, day):
+        # (run timestamp, report_artifect_dict) of every legacy JSON report stored for day
+        keys, _ = list_keys(self.s3_client, self.bucket, 'AWS/%d/%d/%d/' % (day.year, day.month, day.day))
+        keys = sorted(key for key in keys if LEGACY_KEY_PATTERN.match(key))
+        for key, body in self.fetch_objects(keys):
+            year, month, day_of_month, hour, minute = (int(part) for part in LEGACY_KEY_PATTERN.match(key).groups())
+            report_artifect_dict = json.loads(body)
+            # reports written before samples and invocation metadata existed
+            for report in report_artifect_dict.values():
+                report.setdefault("Invocation", {})
+                report["Invocation"].setdefault("Sample", 0)
+            yield datetime.datetime(year, month, day_of_month, hour, minute, tzinfo=datetime.timezone.utc), report_artifect_dict
+
+    def archive_partitions(self, day):
+        # {partition: {run timestamp: report_artifect_dict}} for every archive partition of day, in order.
+        # The workload variants of a runtime and memory size share one archive partition
+        if self.partition_prefixes is None:
+            self.partition_prefixes = list_partition_prefixes(self.s3_client, self.bucket)
+        dt = 'dt=' + day.isoformat() + '/'
+        keys = []
+        for prefix in self.partition_prefixes:
+            keys.extend(key for key in list_keys(self.s3_client, self.bucket, prefix + dt)[0] if key.endswith('.parquet'))
+        # sorted keys keep the files of a partition together
+        archive_partition = None
+        partitions = {}
+        for key, body in self.fetch_objects(sorted(keys)):
+            provider, runtime, memory_size = ARCHIVE_PARTITION_PATTERN.search(key).groups()
+            if (provider, runtime, memory_size) != archive_partition:
+                if archive_partition is not None:
+                    yield partitions
+                archive_partition, partitions = (provider, runtime, memory_size), {}
+            for row in table_rows(bytes_to_table(body)):
+                report = row_report(row, provider, runtime, int(memory_size))
+                report_key = report["Configs"]["FunctionArn"] + ('#' + str(row['sample']) if row['sample'] else '')
+                runs = partitions.setdefault(configs_partition_suffix(report["Configs"]), {})
+                runs.setdefault(datetime.datetime.fromtimestamp(row['run_timestamp'], tz=datetime.timezone.utc), {})[report_key] = report
+        if archive_partition is not None:
+            yield partitions
+
+    def fetch_objects(self, keys):
+        # (key, body) in key order with at most fetch_parallelism objects in flight
+        window = collections.deque()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.fetch_parallelism) as executor:
+            for key in keys:
+                window.append((key, executor.submit(self.get_object, key)))
+                if len(window) >= self.fetch_parallelism:
+                    yield window[0][0], window.popleft()[1].result()
+            while window:
+                yield window[0][0], window.popleft()[1].result()
+
+    def get_object(self, key):
+        return self.s3_client.get_object(Bucket=self.bucket, Key=key)['Body'].read()
+
+    def write(self, items):
+        if items and not self.dry_run:
+            batch_write_items(self.dynamodb_client, self.table, items, max_workers=self.write_parallelism, budget=self.budget)
+
+    def delete_range(self, pk, start, end):
+        # existing items the replay is about to rewrite
+        if self.dry_run:
+            return
+        result = query_partitions(self.dynamodb_client, self.table, [pk], sk_range=(start.timestamp(), end.timestamp() - 0.000001),
+                                  projection=('PK', 'SK'), max_workers=1)
+        batch_delete_keys(self.dynamodb_client, self.table, result[pk].items, max_workers=self.write_parallelism, budget=self.budget)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--bucket', required=True, help='backup bucket of the stack')
+    parser.add_argument('--table', required=True, help='DynamoDB table of the stack')
+    parser.add_argument('--start', required=True, help='first day to replay, YYYY-MM-DD')
+    parser.add_argument('--end', required=True, help='last day to replay, YYYY-MM-DD')
+    parser.add_argument('--sources', default='json,archive', help='comma separated: json (legacy reports), archive (Parquet)')
+    parser.add_argument('--no-records', action='store_true', help='only rebuild the daily summaries')
+    parser.add_argument('--no-summaries', action='store_true', help='only rebuild the RECORD items')
+    parser.add_argument('--replace', action='store_true', help='delete the existing items of every replayed day and partition first')
+    parser.add_argument('--write-capacity', type=float, default=100.0, help='write capacity units per second to stay under')
+    parser.add_argument('--fetch-parallelism', type=int, default=16)
+    parser.add_argument('--write-parallelism', type=int, default=4)
+    parser.add_argument('--dry-run', action='store_true', help='read and summarize, but write nothing')
+    args = parser.parse_args()
+
+    replay = Replay(
+        boto3.client('s3'),
+        boto3.client('dynamodb', endpoint_url=os.environ.get('DYNAMODB_ENDPOINT_URL')),
+        args.bucket, args.table,
+        sources=args.sources.split(','),
+        records=not args.no_records,
+        summaries=not args.no_summaries,
+        replace=args.replace,
+        budget=WriteBudget(args.write_capacity),
+        fetch_parallelism=args.fetch_parallelism,
+        write_parallelism=args.write_parallelism,
+        dry_run=args.dry_run)
+    day = datetime.date.fromisoformat(args.start)
+    end = datetime.date.fromisoformat(args.end)
+    while day <= end:
+        print(json.dumps(replay.replay_day(day)))
+        day += datetime.timedelta(days=1)
+
+
+if __name__ == '__main__':
+    main()